@@ -0,0 +1,154 @@
+# Copyright (C) 2025 ETH Zurich and University of Bologna
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# startup time and private memory of worker processes getting the
+# instruction map of a large synthetic binary, by unpickling a dict (the
+# previous cache format) or by mapping the shared instruction table, and
+# the lookup speed of both
+# the private memory is the dirty private pages in /proc/self/smaps_rollup
+# (Linux): the clean pages of the table are page cache, shared by all
+#
+# usage (from the decoder directory):
+#   python3 benchmarks/instruction_table.py [--instructions N]
+
+# imports
+import argparse
+import multiprocessing
+import os
+import pickle
+import random
+import sys
+import tempfile
+
+from time import perf_counter
+
+DECODER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DECODER_DIR)
+
+from src.services.instruction_table import (
+    open_instruction_table,
+    write_instruction_table,
+)
+
+MNEMONICS = [
+    ("addi", "a0, a0, 1"),
+    ("c.addi", "sp, -16"),
+    ("beq", "a0, a1, 0x24"),
+    ("jal", "0x1f0"),
+    ("c.lw", "a5, 8(a0)"),
+]
+
+
+def _private_bytes():
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            return sum(
+                int(line.split()[1]) * 1024
+                for line in f
+                if line.startswith("Private_Dirty")
+            )
+    except OSError:
+        return 0
+
+
+def _worker(path, kind, lookups, results):
+    before = _private_bytes()
+    start = perf_counter()
+    if kind == "pickle":
+        with open(path, "rb") as f:
+            instruction_map = pickle.load(f)
+    else:
+        instruction_map = open_instruction_table(path)
+    loaded = perf_counter() - start
+    for address in lookups:
+        if address in instruction_map:
+            instruction_map[address]
+    results.put((loaded, _private_bytes() - before))
+
+
+def _run(path, kind, workers, lookups):
+    # fresh interpreters: forked workers would dirty the pages of the
+    # parent's heap they reuse, whatever map they load
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    processes = [
+        context.Process(target=_worker, args=(path, kind, lookups, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    measures = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    startup = max(loaded for loaded, _ in measures)
+    private = sum(memory for _, memory in measures)
+    print(
+        f"{kind:>6} {workers:>2} workers: startup {startup * 1e3:8.1f} ms,"
+        f" private memory {private / 1e6:8.1f} MB"
+    )
+
+
+def _lookup_speed(instruction_map, lookups, name):
+    start = perf_counter()
+    for address in lookups:
+        instruction_map[address]
+    elapsed = perf_counter() - start
+    print(f"{name}: {elapsed / len(lookups) * 1e9:.0f} ns per lookup")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="instruction table against a pickled instruction map"
+    )
+    parser.add_argument("--instructions", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=20_000)
+    args = parser.parse_args()
+
+    instruction_map = {
+        0x80000000 + 4 * i: MNEMONICS[i % len(MNEMONICS)]
+        for i in range(args.instructions)
+    }
+    rng = random.Random(0)
+    lookups = rng.sample(sorted(instruction_map), args.lookups)
+    with tempfile.TemporaryDirectory() as tmp:
+        pickle_path = os.path.join(tmp, "map.pickle")
+        with open(pickle_path, "wb") as f:
+            pickle.dump(instruction_map, f, protocol=pickle.HIGHEST_PROTOCOL)
+        table_path = os.path.join(tmp, "map.table")
+        write_instruction_table(instruction_map, table_path)
+        del instruction_map
+        # written back, the pages of the table are not dirty in the cache
+        os.sync()
+        print(
+            f"{args.instructions} instructions: pickle "
+            f"{os.path.getsize(pickle_path) / 1e6:.1f} MB, table "
+            f"{os.path.getsize(table_path) / 1e6:.1f} MB"
+        )
+        for workers in (1, 2, 4, 8):
+            for kind in ("pickle", "table"):
+                _run(
+                    pickle_path if kind == "pickle" else table_path,
+                    kind,
+                    workers,
+                    lookups,
+                )
+        with open(pickle_path, "rb") as f:
+            _lookup_speed(pickle.load(f), lookups, "dict")
+        table = open_instruction_table(table_path)
+        _lookup_speed(table, lookups, "table, first lookup")
+        _lookup_speed(table, lookups, "table, decoded")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# Copyright (C) 2025 ETH Zurich and University of Bologna
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# packet parse cache benchmark
+# parses a capture with and without the cache of identical payloads and
+# prints the hit rate and the speedup; besides the given captures it
+# builds a loop-heavy one by repeating a window of frames of the first
+#
+# usage (from the decoder directory):
+#   python3 benchmarks/parse_cache.py [capture.bin ...]
+
+# imports
+import argparse
+import io
+import os
+import sys
+
+from time import perf_counter
+
+DECODER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DECODER_DIR)
+
+from src.services.packet_parser import iter_packets, PacketCache
+from src.domain.encoder_profile import DEFAULT_PROFILE
+
+
+def _parse_time(data, cache, runs):
+    best = None
+    for _ in range(runs):
+        if cache is not None:
+            cache = PacketCache(cache.max_entries)
+        start = perf_counter()
+        for _ in iter_packets(io.BytesIO(data), cache=cache):
+            pass
+        elapsed = perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, cache
+
+
+def _loop_capture(data, window, repetitions):
+    # the same `window` frames emitted `repetitions` times, as for a loop
+    frame = DEFAULT_PROFILE.chunk_size
+    start = len(data) // frame // 2 * frame
+    body = data[start : start + window * frame]
+    return data[:start] + body * repetitions
+
+
+def _report(name, data, runs, cache_size):
+    plain, _ = _parse_time(data, None, runs)
+    cached, cache = _parse_time(data, PacketCache(cache_size), runs)
+    stats = cache.stats()
+    frames = len(data) // DEFAULT_PROFILE.chunk_size
+    print(
+        f"{name}: {frames} frames, hit rate {stats['hit_rate']:.1%}, "
+        f"{plain * 1e3:.1f} ms -> {cached * 1e3:.1f} ms "
+        f"(x{plain / cached:.2f})"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="packet parse cache benchmark"
+    )
+    parser.add_argument(
+        "captures", nargs="*", default=["tests/gpios_all/packets.bin"]
+    )
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--cache-size", type=int, default=4096)
+    parser.add_argument("--loop-window", type=int, default=8)
+    parser.add_argument("--loop-repetitions", type=int, default=20000)
+    args = parser.parse_args()
+
+    for path in args.captures:
+        with open(path, "rb") as f:
+            data = f.read()
+        _report(path, data, args.runs, args.cache_size)
+
+    with open(args.captures[0], "rb") as f:
+        data = f.read()
+    loop = _loop_capture(data, args.loop_window, args.loop_repetitions)
+    _report("synthetic loop", loop, args.runs, args.cache_size)
+
+
+if __name__ == "__main__":
+    main()
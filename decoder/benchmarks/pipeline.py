@@ -0,0 +1,135 @@
+# Copyright (C) 2025 ETH Zurich and University of Bologna
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# end to end time of the serial and of the pipelined decode of a capture,
+# whose traces must be the same
+# the capture repeats the l1 test, encoded by the reference encoder, about
+# --size MB; it is decoded with --recover, each repetition ends its trace
+# the pipeline only pays off with a free core per stage
+#
+# usage (from the decoder directory):
+#   python3 benchmarks/pipeline.py [--size MB] [--capture FILE --elf FILE]
+
+# imports
+import argparse
+import filecmp
+import os
+import subprocess
+import sys
+import tempfile
+
+from time import perf_counter
+
+DECODER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DECODER_DIR)
+
+from src.services.elf_disassembler import get_instruction_map
+from src.services.reference_encoder import ReferenceEncoder, blocks_from_pcs
+
+TEST_CAPTURE = "tests/l1_test/packets.bin"
+TEST_ELF = "tests/l1_test/l1.riscv"
+
+MODES = [
+    ("serial", []),
+    ("pipeline", ["--pipeline"]),
+    ("pipeline -j 2", ["--pipeline", "-j", "2"]),
+]
+
+
+def _decode(capture, elf, output, output_format, cache_dir, options):
+    start = perf_counter()
+    subprocess.run(
+        [
+            sys.executable,
+            "main.py",
+            capture,
+            elf,
+            "-f",
+            output_format,
+            "-o",
+            output,
+            "--cache-dir",
+            cache_dir,
+            "--recover",
+            *options,
+        ],
+        cwd=DECODER_DIR,
+        check=True,
+        capture_output=True,
+    )
+    return perf_counter() - start
+
+
+def _write_capture(path, size):
+    # the test trace encoded again and repeated
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, "trace.pc")
+        subprocess.run(
+            [sys.executable, "main.py", TEST_CAPTURE, TEST_ELF]
+            + ["-f", "pc", "-o", output, "--no-cache"],
+            cwd=DECODER_DIR,
+            check=True,
+            capture_output=True,
+        )
+        with open(output) as f:
+            pcs = [int(line, 16) for line in f]
+    blocks = blocks_from_pcs(pcs, get_instruction_map(TEST_ELF))
+    encoder = ReferenceEncoder()
+    copy_size = len(b"".join(encoder.frames(blocks)))
+    with open(path, "wb") as f:
+        encoder.write_repeated(
+            blocks, f, max(1, int(size * 1e6) // copy_size)
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="serial against pipelined decode"
+    )
+    parser.add_argument("--size", type=float, default=40, help="MB")
+    parser.add_argument("--capture", help="capture to decode instead")
+    parser.add_argument("--elf", default=TEST_ELF)
+    parser.add_argument("--format", default="text", choices=["text", "pc"])
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} cores")
+    with tempfile.TemporaryDirectory() as tmp:
+        capture = args.capture
+        if capture is None:
+            capture = os.path.join(tmp, "capture.bin")
+            _write_capture(capture, args.size)
+        print(f"{capture}: {os.path.getsize(capture) / 1e6:.1f} MB")
+        cache_dir = os.path.join(tmp, "cache")
+        failed = False
+        serial = None
+        for name, options in MODES:
+            output = os.path.join(tmp, f"{name}.trace")
+            elapsed = _decode(
+                capture, args.elf, output, args.format, cache_dir, options
+            )
+            if serial is None:
+                serial, reference = elapsed, output
+                same = True
+            else:
+                same = filecmp.cmp(reference, output, shallow=False)
+                failed |= not same
+            print(
+                f"{name:>14}: {elapsed:6.2f} s, "
+                f"{serial / elapsed:.2f}x, {'OK' if same else 'DIFF'}"
+            )
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
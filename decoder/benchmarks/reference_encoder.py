@@ -0,0 +1,120 @@
+# Copyright (C) 2025 ETH Zurich and University of Bologna
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# round trip and throughput of the reference encoder
+# for every test the capture is decoded, the trace turned back into
+# retirement blocks and encoded again, and the new capture decoded: the two
+# traces must be the same, as checked by tests/test_round_trip.py; then
+# the encoding speed is measured, and with --output a capture of about
+# --size MB is written for load tests
+#
+# usage (from the decoder directory):
+#   python3 benchmarks/reference_encoder.py [--output FILE --size MB]
+
+# imports
+import argparse
+import io
+import os
+import subprocess
+import sys
+import tempfile
+
+from time import perf_counter
+
+DECODER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DECODER_DIR)
+
+from src.services.elf_disassembler import get_instruction_map
+from src.services.reference_encoder import ReferenceEncoder, blocks_from_pcs
+
+TESTS = [
+    (
+        "tests/hello_culsans/packets.bin",
+        "tests/hello_culsans/hello_culsans.riscv",
+    ),
+    ("tests/l1_test/packets.bin", "tests/l1_test/l1.riscv"),
+]
+
+
+def _decode_pcs(capture, elf, tmp):
+    output = os.path.join(tmp, "trace.pc")
+    subprocess.run(
+        [sys.executable, "main.py", capture, elf, "-f", "pc", "-o", output]
+        + ["--cache-dir", os.path.join(tmp, "cache")],
+        cwd=DECODER_DIR,
+        check=True,
+        capture_output=True,
+    )
+    with open(output) as f:
+        return [int(line, 16) for line in f]
+
+
+def _round_trip(capture, elf, tmp):
+    pcs = _decode_pcs(capture, elf, tmp)
+    blocks = blocks_from_pcs(pcs, get_instruction_map(elf))
+    encoded = os.path.join(tmp, "encoded.bin")
+    with open(encoded, "wb") as f:
+        frames = ReferenceEncoder().write(blocks, f)
+    same = _decode_pcs(encoded, elf, tmp) == pcs
+    print(
+        f"{capture}: {len(pcs)} pcs, {len(blocks)} blocks, {frames} frames,"
+        f" round trip {'OK' if same else 'DIFF'}"
+    )
+    return same, blocks
+
+
+def _throughput(blocks, repeat):
+    start = perf_counter()
+    output = io.BytesIO()
+    frames = ReferenceEncoder().write(blocks * repeat, output)
+    encoded = perf_counter() - start
+    start = perf_counter()
+    output = io.BytesIO()
+    ReferenceEncoder().write_repeated(blocks, output, repeat)
+    repeated = perf_counter() - start
+    size = len(output.getvalue()) / 1e6
+    print(
+        f"{len(blocks) * repeat} blocks, {frames} frames: encoded at "
+        f"{size / encoded:.1f} MB/s, repeated at {size / repeated:.1f} MB/s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="reference encoder round trip and throughput"
+    )
+    parser.add_argument("--repeat", type=int, default=500)
+    parser.add_argument("--output", help="capture written for load tests")
+    parser.add_argument("--size", type=float, default=1024, help="MB")
+    args = parser.parse_args()
+
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        for capture, elf in TESTS:
+            same, blocks = _round_trip(capture, elf, tmp)
+            failed |= not same
+    _throughput(blocks, args.repeat)
+
+    if args.output:
+        encoder = ReferenceEncoder()
+        copy_size = len(b"".join(encoder.frames(blocks)))
+        repeat = max(1, int(args.size * 1e6) // copy_size)
+        with open(args.output, "wb") as f:
+            frames = encoder.write_repeated(blocks, f, repeat)
+        print(f"{args.output}: {frames} frames")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# Copyright (C) 2025 ETH Zurich and University of Bologna
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# startup time benchmark of the decoder CLI
+# measures `main.py --help` and a run served by the instruction map cache,
+# and fails when the median time is above the budget or when --help loads
+# one of the heavy dependencies
+#
+# usage (from the decoder directory):
+#   python3 benchmarks/startup.py [--help-budget S] [--cached-budget S] [--runs N]
+
+# imports
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from time import perf_counter
+
+DECODER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("capstone", "elftools", "yaml", "tabulate")
+
+# prints the heavy modules imported by `main.py --help`
+IMPORT_PROBE = f"""
+import runpy, sys
+sys.argv = ["main.py", "--help"]
+try:
+    runpy.run_path("main.py", run_name="__main__")
+except SystemExit:
+    pass
+loaded = [m for m in {HEAVY_MODULES!r} if m in sys.modules]
+print("loaded:" + ",".join(loaded), file=sys.stderr)
+"""
+
+
+def _median_time(command, runs, env):
+    times = []
+    for _ in range(runs):
+        start = perf_counter()
+        subprocess.run(
+            command,
+            cwd=DECODER_DIR,
+            env=env,
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        times.append(perf_counter() - start)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="startup time benchmark of the decoder CLI"
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--help-budget", type=float, default=0.15)
+    parser.add_argument("--cached-budget", type=float, default=0.3)
+    parser.add_argument("--test", default="hello_culsans")
+    args = parser.parse_args()
+
+    failed = False
+
+    # --help must not load the heavy dependencies
+    probe = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE],
+        cwd=DECODER_DIR,
+        capture_output=True,
+        text=True,
+    )
+    loaded = [
+        line[len("loaded:"):]
+        for line in probe.stderr.splitlines()
+        if line.startswith("loaded:")
+    ]
+    if not loaded or loaded[-1]:
+        print(f"FAIL --help imports: {loaded[-1] if loaded else probe.stderr}")
+        failed = True
+
+    help_time = _median_time(
+        [sys.executable, "main.py", "--help"], args.runs, os.environ
+    )
+    status = "ok" if help_time <= args.help_budget else "FAIL"
+    failed |= status == "FAIL"
+    print(f"{status} --help: {help_time:.3f}s (budget {args.help_budget}s)")
+
+    test_dir = os.path.join("tests", args.test)
+    packets = os.path.join(test_dir, "packets.bin")
+    compiled = next(
+        os.path.join(test_dir, f)
+        for f in os.listdir(os.path.join(DECODER_DIR, test_dir))
+        if f.endswith(".riscv")
+    )
+    with tempfile.TemporaryDirectory() as cache_dir:
+        command = [
+            sys.executable, "main.py", packets, compiled,
+            "--cache-dir", cache_dir,
+        ]
+        # first run fills the cache
+        cold_time = _median_time(command, 1, os.environ)
+        cached_time = _median_time(command, args.runs, os.environ)
+    status = "ok" if cached_time <= args.cached_budget else "FAIL"
+    failed |= status == "FAIL"
+    print(f"   cold run: {cold_time:.3f}s")
+    print(
+        f"{status} cached run: {cached_time:.3f}s "
+        f"(budget {args.cached_budget}s)"
+    )
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
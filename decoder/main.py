@@ -15,45 +15,414 @@
 # Authors: Umberto Laghi (umberto.laghi2@unibo.it), Samuele Righi (samuele.righi@studio.unibo.it)
 
 # imports
-import os
+import argparse
 import sys
 
 #
 from os import path
-from src.controller.trace_decoder import decoder
+
+# the domain package only holds plain classes and constants, importing it
+# keeps the startup fast
+from src.domain.const import (
+    DEFAULT_PATH_CACHE_SIZE,
+    DEFAULT_PACKET_CACHE_SIZE,
+    DEFAULT_CHECKPOINT_INTERVAL,
+)
+from src.domain.decode_options import (
+    DecodeOptions,
+    OUTPUT_FORMATS,
+    PRIVILEGES,
+)
 
 # this controller works as the main orchestrator of the whole system:
 # 1. reads the path of both the compiled code and the one containg the packets from terminal
 # 2. starts the process of creating a trace
 # 3. outputs the result
 
-# checks if exactly two args are provided
-if len(sys.argv) != 3:
-    print("Usage: python3 decoder.py <packets.bin> <compiled.riscv>")
-    sys.exit(1)
+
+def parse_range(value):
+    # parses "START:END" where both ends are optional, e.g. "100:", ":0x2000"
+    try:
+        start, end = value.split(":")
+        return (
+            int(start, 0) if start else None,
+            int(end, 0) if end else None,
+        )
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"invalid range {value!r}, expected START:END"
+        )
+
+
+def parse_source_elf(value):
+    # parses "ID=FILE", the compiled file of the source ID
+    source, separator, file_path = value.partition("=")
+    try:
+        if not separator or not file_path:
+            raise ValueError
+        return int(source, 0), file_path
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"invalid source {value!r}, expected ID=FILE"
+        )
+
+
+def parse_privileges(value):
+    # parses a comma separated list of privilege levels, e.g. "U,S"
+    names = [name.strip().upper() for name in value.split(",")]
+    for name in names:
+        if name not in PRIVILEGES:
+            raise argparse.ArgumentTypeError(
+                f"invalid privilege {name!r}, expected "
+                f"{', '.join(PRIVILEGES)}"
+            )
+    return names
+
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError("must be at least 1")
+    return number
+
+
+def non_negative_int(value):
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError("must be at least 0")
+    return number
+
+
+parser = argparse.ArgumentParser(
+    prog="main.py", description="RISC-V Efficient Trace decoder"
+)
+parser.add_argument(
+    "packets_path", help="binary file with the packets, - for stdin"
+)
+parser.add_argument(
+    "compiled_path",
+    nargs="?",
+    help="RISC-V compiled file, not needed by -f packets and -f stats "
+    "nor with --demux when --source-elf covers every source",
+)
+
+# outputs
+outputs = parser.add_argument_group("output")
+outputs.add_argument(
+    "-o",
+    "--output",
+    default="execution_trace",
+    help="file the trace is written to, - for stdout "
+    "(default: execution_trace)",
+)
+outputs.add_argument(
+    "-f",
+    "--format",
+    choices=OUTPUT_FORMATS,
+    default="text",
+    help="text: pc, mnemonic and operands; pc: pc only; coverage: bitmap "
+    "of the executed instructions; functions: instructions and calls per "
+    "function; callgraph: calls between functions, as DOT or as JSON if "
+    "the output ends in .json; columnar: the pcs with their packet, "
+    "timestamp and privilege in a columnar file; packets: the parsed "
+    "packets in a columnar file, without decoding; stats: packets per "
+    "format, payload lengths, branches, address widths and resyncs, as "
+    "JSON if the output ends in .json (default: text)",
+)
+outputs.add_argument(
+    "--lcov",
+    metavar="FILE",
+    help="with -f coverage, also write the executed functions and basic "
+    "blocks to FILE in the lcov format",
+)
+outputs.add_argument(
+    "--retired",
+    metavar="COUNT",
+    type=positive_int,
+    help="with -f stats, instructions retired during the capture, e.g. "
+    "from minstret, to report the bytes per retired instruction",
+)
+
+# inputs
+inputs = parser.add_argument_group("input")
+inputs.add_argument(
+    "--config",
+    metavar="YAML",
+    help="disassembler configuration "
+    "(default: disassembler_config.yaml next to main.py)",
+)
+inputs.add_argument(
+    "--encoder",
+    metavar="PROFILE",
+    help="encoder parameters (XLEN, call counter and return stack sizes...) "
+    "as YAML, see encoder_config.yaml, or read from the te_pkg.sv "
+    "of the RTL (default: 64 bit, values in src/domain/const.py)",
+)
+inputs.add_argument(
+    "--packets",
+    metavar="START:END",
+    type=parse_range,
+    help="decode only the packets with index in [START, END)",
+)
+inputs.add_argument(
+    "--time",
+    metavar="START:END",
+    type=parse_range,
+    help="decode only the packets with timestamp in [START, END]",
+)
+
+inputs.add_argument(
+    "--recover",
+    action="store_true",
+    help="on an inconsistent or corrupted packet, log the error with its "
+    "offset on stderr and continue from the next sync packet instead of "
+    "stopping; the errors are summarized at the end",
+)
+
+inputs.add_argument(
+    "--demux",
+    action="store_true",
+    help="the capture interleaves the frames of several sources (harts), "
+    "told apart by the source id in the frame header: each is decoded by "
+    "its own process to the output with {source} replaced by its id, or "
+    "with the id appended",
+)
+inputs.add_argument(
+    "--source-elf",
+    metavar="ID=FILE",
+    type=parse_source_elf,
+    action="append",
+    default=[],
+    help="with --demux, compiled file of the source ID, the other sources "
+    "use compiled_path (repeatable)",
+)
+
+# filters
+filters = parser.add_argument_group("filters")
+filters.add_argument(
+    "--address-range",
+    metavar="START:END",
+    type=parse_range,
+    action="append",
+    help="write only the pcs in [START, END) (repeatable)",
+)
+filters.add_argument(
+    "--function",
+    metavar="NAME",
+    action="append",
+    help="write only the pcs inside the functions matching NAME, "
+    "wildcards allowed, e.g. 'uart_*' (repeatable)",
+)
+filters.add_argument(
+    "--privilege",
+    metavar="LEVELS",
+    type=parse_privileges,
+    help="write only the pcs retired at these privilege levels, "
+    "e.g. U or U,S",
+)
+
+# sampling
+sampling = parser.add_argument_group("sampling")
+sampling.add_argument(
+    "--sample",
+    metavar="K",
+    type=positive_int,
+    help="with -f functions, decode only one resync segment (from a sync "
+    "packet to the next) every K and extrapolate the counts of the whole "
+    "capture, with a 95%% confidence interval",
+)
+sampling.add_argument(
+    "--sample-seed",
+    metavar="SEED",
+    type=int,
+    help="with --sample, decode each segment with a probability of 1/K "
+    "instead of one every K, drawn from SEED",
+)
+
+# performance
+performance = parser.add_argument_group("performance")
+performance.add_argument(
+    "-j",
+    "--workers",
+    type=positive_int,
+    default=1,
+    help="processes parsing the packets (default: 1)",
+)
+performance.add_argument(
+    "--pipeline",
+    action="store_true",
+    help="parse the frames, reconstruct the execution and write the text "
+    "or pc trace in three processes working in parallel, for multi-core "
+    "machines; with -j the parser process uses the workers",
+)
+performance.add_argument(
+    "--path-cache",
+    metavar="ENTRIES",
+    type=non_negative_int,
+    default=DEFAULT_PATH_CACHE_SIZE,
+    help="execution path segments memoized to replay loops, "
+    f"0 disables the cache (default: {DEFAULT_PATH_CACHE_SIZE})",
+)
+performance.add_argument(
+    "--packet-cache",
+    metavar="ENTRIES",
+    type=non_negative_int,
+    default=DEFAULT_PACKET_CACHE_SIZE,
+    help="parsed packets kept to reuse them for identical payloads, "
+    f"0 disables the cache (default: {DEFAULT_PACKET_CACHE_SIZE})",
+)
+performance.add_argument(
+    "--cache-dir",
+    metavar="DIR",
+    help="directory of the disassembled instruction maps "
+    "(default: ~/.cache/rv_tracer_decoder)",
+)
+performance.add_argument(
+    "--no-cache",
+    action="store_true",
+    help="always disassemble the compiled file",
+)
+
+# checkpoints
+checkpoints = parser.add_argument_group("checkpoints")
+checkpoints.add_argument(
+    "--checkpoint",
+    metavar="FILE",
+    help="periodically save the decoder state to FILE",
+)
+checkpoints.add_argument(
+    "--checkpoint-interval",
+    metavar="PACKETS",
+    type=positive_int,
+    default=DEFAULT_CHECKPOINT_INTERVAL,
+    help="packets between two checkpoints "
+    f"(default: {DEFAULT_CHECKPOINT_INTERVAL})",
+)
+checkpoints.add_argument(
+    "--resume",
+    action="store_true",
+    help="continue from the last checkpoint in FILE, the output is "
+    "truncated to where it was when the checkpoint was saved",
+)
+
+# diagnostics
+diagnostics = parser.add_argument_group("diagnostics")
+diagnostics.add_argument(
+    "--profile",
+    metavar="REPORT",
+    help="collect per-stage timings and write them to REPORT "
+    "(JSON, or collapsed stacks for flamegraphs if it ends in .folded)",
+)
+diagnostics.add_argument(
+    "--progress",
+    action="store_true",
+    help="periodically report progress and throughput on stderr",
+)
+diagnostics.add_argument(
+    "--progress-file",
+    metavar="METRICS",
+    help="write the progress reports to METRICS as JSON lines",
+)
+diagnostics.add_argument(
+    "--progress-interval",
+    metavar="SECONDS",
+    type=float,
+    default=1.0,
+    help="seconds between two progress reports (default: 1)",
+)
+args = parser.parse_args()
 
 # assigning file paths to vars
-packets_path = sys.argv[1]
-compiled_path = sys.argv[2]
+packets_path = args.packets_path
+compiled_path = args.compiled_path
+config_path = args.config or path.join(
+    path.dirname(path.abspath(__file__)), "disassembler_config.yaml"
+)
+
+# the options are checked before loading the decoder, so that usage errors
+# return immediately
+options = DecodeOptions(
+    packets_path,
+    compiled_path,
+    output_path=args.output,
+    output_format=args.format,
+    lcov_path=args.lcov,
+    retired=args.retired,
+    config_path=config_path,
+    packet_range=args.packets,
+    time_range=args.time,
+    recover=args.recover,
+    demux=args.demux,
+    source_elfs=dict(args.source_elf),
+    address_ranges=args.address_range,
+    functions=args.function,
+    privileges=args.privilege,
+    sample_every=args.sample,
+    sample_seed=args.sample_seed,
+    workers=args.workers,
+    pipeline=args.pipeline,
+    path_cache_size=args.path_cache,
+    packet_cache_size=args.packet_cache,
+    checkpoint_path=args.checkpoint,
+    checkpoint_interval=args.checkpoint_interval,
+    resume=args.resume,
+    profile_path=args.profile,
+    progress=args.progress,
+    progress_path=args.progress_file,
+    progress_interval=args.progress_interval,
+)
+try:
+    options.validate()
+except ValueError as exc:
+    parser.error(str(exc))
 
 # checks if the files exist
-if not path.exists(packets_path):
-    print(f"Error: the file {packets_path} does not exist.")
-    sys.exit(1)
-if not path.exists(compiled_path):
-    print(f"Error: the file {compiled_path} does not exist.")
+for file_path in (
+    packets_path,
+    compiled_path,
+    config_path,
+    args.encoder,
+    *options.source_elfs.values(),
+):
+    if file_path not in (None, "-") and not path.exists(file_path):
+        print(f"Error: the file {file_path} does not exist.", file=sys.stderr)
+        sys.exit(1)
+if "-" in (compiled_path, *options.source_elfs.values()):
+    print(
+        "Error: the compiled file cannot be read from stdin.", file=sys.stderr
+    )
     sys.exit(1)
 
-# checks if the file extensions are correct
-if not packets_path.endswith(".bin"):
-    print(f"Error: the file {packets_path} must be a binary file.")
-    sys.exit(1)
-if not compiled_path.endswith(".riscv"):
-    print(f"Error: the file {compiled_path} must be RISC-V compiled file.")
-    sys.exit(1)
+# the decoder and its dependencies are imported only once the arguments are
+# valid, so that --help and usage errors return immediately
+from src.controller.trace_decoder import (
+    decoder,
+    decode_sources,
+    export_packets,
+    packet_statistics,
+)
+from src.services.elf_disassembler import default_cache_dir
+from src.services.encoder_profile_loader import load_encoder_profile
+
+if args.encoder is not None:
+    options.encoder_profile = load_encoder_profile(args.encoder)
+if not args.no_cache:
+    options.cache_dir = args.cache_dir or default_cache_dir()
 
-# delete the output file if it exists
-if path.exists("execution_trace"):
-    os.remove("execution_trace")
+if args.format == "packets":
+    export_packets(options)
+    sys.exit(0)
+if args.format == "stats":
+    packet_statistics(options)
+    sys.exit(0)
+if args.demux:
+    failed = decode_sources(options)
+    if failed:
+        print(
+            f"Error: the decode of the sources {failed} failed.",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+    sys.exit(0)
 
-decoder(packets_path, compiled_path)
+decoder(options)
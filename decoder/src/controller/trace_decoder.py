@@ -15,24 +15,682 @@
 # Author: Samuele Righi (samuele.righi@studio.unibo.it)
 
 # imports
-from src.services.packet_parser import parse_packets
-from src.services.trace_processor import process_te_inst
-from src.services.elf_disassembler import get_instruction_map
+import io
+import multiprocessing
+import os
+import sys
+import tempfile
+
+from src.services.capture_reader import open_capture
+from src.services.packet_parser import (
+    iter_packets,
+    count_packets,
+    parse_frame,
+    PacketCache,
+    read_blocks,
+)
+from src.services.trace_processor import (
+    process_te_inst,
+    process_support,
+    follow_execution_path,
+)
+from src.services.trace_processor_utils import get_instr
+from src.services.instruction_logger import (
+    log_instruction,
+    open_output,
+    open_binary_output,
+    TextTraceSink,
+)
+from src.services.elf_disassembler import (
+    get_instruction_map,
+    load_symbols,
+    CONFIG_FILE,
+)
+from src.services.instruction_table import (
+    InstructionTable,
+    open_instruction_table,
+    write_instruction_table,
+)
+from src.services.coverage import CoverageSink
+from src.services.function_profile import (
+    FunctionProfileSink,
+    SampledFunctionProfileSink,
+)
+from src.services.call_graph import CallGraphSink
+from src.services.columnar import (
+    ColumnarTraceSink,
+    ColumnarWriter,
+    PACKET_SCHEMA,
+    packet_row,
+)
+from src.services.trace_statistics import (
+    collect_statistics,
+    write_statistics,
+)
+from src.services.error_log import ErrorLog
+from src.services.pipeline import pipelined_packets, PipelinedTextSink
+from src.services.trace_filter import build_trace_filter, FilteredTraceSink
+from src.services.sampling import SegmentSampler, iter_segments
+from src.services.demux import (
+    ConnectionReader,
+    source_table,
+    split_by_source,
+    source_output_path,
+)
+from src.services.decoder_profiler import DecoderProfiler
+from src.services.progress_reporter import ProgressReporter
+from src.services.path_cache import PathCache
+from src.services.checkpoint import Checkpointer, restore_state
 
 from src.domain import *
 
+OUTPUT_FORMATS = list(DECODE_FORMATS)
+
+
+class _DecodeRun:
+    # what a decode builds from its options besides the TraceState: the
+    # packet cache, the recovery log, the checkpoints, the profiler and the
+    # progress reporter, each None when not requested
+    def __init__(self, options: DecodeOptions):
+        encoder_profile = options.encoder_profile
+        self.checkpointer = None
+        self.checkpoint = None
+        if options.checkpoint_path is not None:
+            # a checkpoint is only valid for the decode that saved it
+            identity = {
+                "packets": os.path.abspath(options.packets_path),
+                "compiled": os.path.abspath(options.compiled_path),
+                "output": os.path.abspath(options.output_path),
+                "format": options.output_format,
+                "packet_range": options.packet_range,
+                "time_range": options.time_range,
+                "encoder": encoder_profile.as_dict(),
+            }
+            self.checkpointer = Checkpointer(
+                options.checkpoint_path, options.checkpoint_interval, identity
+            )
+            if options.resume:
+                self.checkpoint = self.checkpointer.load()
+
+        # the profiler is created only when requested: without it the
+        # stages are the plain functions and the packet loop is untouched
+        self.profiler = None
+        if options.profile_path is not None:
+            self.profiler = DecoderProfiler()
+            for stage in (
+                parse_frame,
+                get_instruction_map,
+                process_te_inst,
+                follow_execution_path,
+                get_instr,
+                log_instruction,
+            ):
+                self.profiler.instrument(stage)
+
+        self.reporter = None
+        if options.progress or options.progress_path is not None:
+            # the total is known up front from the size of the capture
+            total = None
+            if options.packets_path != "-":
+                total = count_packets(options.packets_path, encoder_profile)
+            self.reporter = ProgressReporter(
+                total,
+                options.progress_interval,
+                options.progress_path,
+                frame_size=encoder_profile.chunk_size,
+            )
+
+        self.packet_cache = None
+        if options.packet_cache_size:
+            self.packet_cache = PacketCache(options.packet_cache_size)
+        self.errors = None
+        if options.recover:
+            self.errors = ErrorLog(frame_size=encoder_profile.chunk_size)
+
+    def finish(self, state: TraceState, options: DecodeOptions, failure):
+        # reports the figures of the decode, also when it failed with the
+        # exception failure
+        if self.errors is not None:
+            self.errors.write_summary()
+        if self.reporter is not None:
+            if isinstance(failure, KeyboardInterrupt):
+                self.reporter.stopped = "interrupted"
+            elif failure is not None:
+                self.reporter.stopped = "failed"
+            self.reporter.finish(state.processed_packets, state.reported_pcs)
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.restore()
+            profiler.instr_cache_misses = state.instr_cache_misses
+            if state.path_cache is not None:
+                profiler.sections["path_cache"] = state.path_cache.stats()
+            if (
+                self.packet_cache is not None
+                and options.workers <= 1
+                and not options.pipeline
+            ):
+                profiler.sections["packet_cache"] = self.packet_cache.stats()
+            if self.errors is not None:
+                profiler.sections["recovery"] = self.errors.summary()
+            profiler.dump(options.profile_path)
+
 
-def decoder(packets_path, compiled_path):
-    # reads the binary file and creating packets
-    packets = parse_packets(packets_path)
-    # creates the trace
-    instruction_map = get_instruction_map(compiled_path)
+def decoder(options: DecodeOptions):
+    # decodes the capture of options.packets_path into options.output_path
+    # in options.output_format, see DecodeOptions; the options that cannot
+    # be combined raise ValueError
+    # the coverage format writes a bitmap of the executed instructions and,
+    # with lcov_path, a per function summary
+    # the functions format writes the instructions and calls per function,
+    # callgraph the calls between them as DOT, or JSON for a .json output
+    # columnar writes the pcs, with their packet, to a columnar file
+    # with recover an inconsistency does not stop the decode: it is logged
+    # on stderr with its packet and the decode continues from the next
+    # sync packet, the errors are summarized at the end
+    # with pipeline the frames are parsed by another process and the text
+    # and pc traces written by a third one, see services/pipeline.py
+    # the filters restrict the pcs written to the output, in every format;
+    # the whole trace is still reconstructed
+    # with sample_every only one resync segment every sample_every is
+    # decoded, or each with a probability of 1 / sample_every given a
+    # sample_seed, and the functions format extrapolates the counts of the
+    # whole capture, see services/sampling.py
+    options.validate()
+    encoder_profile = options.encoder_profile
+    run = _DecodeRun(options)
 
-    # creates the trace state
+    # the processor is specialized on the encoder parameters once here
     state = TraceState()
-    state.set_instruction_map(instruction_map)
-    state.set_te_inst_list(packets)
+    state.set_discovery_response(encoder_profile.discovery_response())
+    if options.path_cache_size:
+        state.path_cache = PathCache(options.path_cache_size)
+    output_offset = None
+    if run.checkpoint is not None:
+        restore_state(state, run.checkpoint)
+        output_offset = run.checkpoint["output_offset"]
+    try:
+        # creates the trace
+        instruction_map = options.instruction_map
+        if instruction_map is None:
+            instruction_map = get_instruction_map(
+                options.compiled_path,
+                options.config_path or CONFIG_FILE,
+                options.cache_dir,
+                encoder_profile.xlen,
+            )
+        state.set_instruction_map(instruction_map)
+        trace_filter = build_trace_filter(
+            options.address_ranges,
+            options.functions,
+            options.privileges,
+            load_symbols(options.compiled_path) if options.functions else None,
+        )
+        sink = _create_sink(options, state, output_offset)
+        profile_sink = sink
+        if trace_filter is not None:
+            sink = FilteredTraceSink(sink, trace_filter)
+        state.set_sink(sink)
+        packets = None
+        if options.pipeline:
+            packets = pipelined_packets(
+                options.packets_path,
+                encoder_profile,
+                options.workers,
+                options.packet_cache_size,
+                options.recover,
+            )
+            file = None
+        else:
+            file = open_capture(options.packets_path)
+        try:
+            if options.sampled:
+                _decode_sampled(file, state, profile_sink, options, run)
+            else:
+                _decode(file, state, options, run, packets)
+        finally:
+            if packets is not None:
+                packets.close()
+            elif file is not sys.stdin.buffer:
+                file.close()
+    finally:
+        # the outputs are closed also when the decode fails
+        close_error = None
+        if state.sink is not None:
+            try:
+                state.sink.close()
+            except Exception as exc:
+                # e.g. the writer of the pipeline failed: raised after the
+                # rest of the cleanup, unless it would hide a decode error
+                close_error = exc
+        run.finish(state, options, sys.exc_info()[1] or close_error)
+        if close_error is not None and sys.exc_info()[0] is None:
+            raise close_error
+
+
+def _decode_source(connection, options: DecodeOptions):
+    # runs in the process of a source, on the frames sent by decode_sources
+    options.packets_path = io.BufferedReader(ConnectionReader(connection))
+    decoder(options)
+
+
+def _shared_instruction_table(
+    compiled_path, xlen, tables_dir, config_path, cache_dir
+):
+    # instruction map of a compiled file as a table other processes can map
+    instruction_map = get_instruction_map(
+        compiled_path, config_path, cache_dir, xlen
+    )
+    if isinstance(instruction_map, InstructionTable):
+        return instruction_map
+    path = os.path.join(tables_dir, f"{len(os.listdir(tables_dir))}.table")
+    write_instruction_table(instruction_map, path)
+    return open_instruction_table(path)
+
+
+def decode_sources(options: DecodeOptions):
+    # decodes a capture interleaving the frames of several sources (harts)
+    # the source id is read from the frame header, see EncoderProfile, and
+    # every source is decoded by its own process with its own TraceState:
+    # the main process reads the capture once and sends each its frames
+    # options.source_elfs maps a source id to its compiled file, the other
+    # sources run options.compiled_path; the output of a source is
+    # output_path with {source} replaced by the id, or with the id appended
+    # returns the ids of the sources whose decode failed
+    options.validate()
+    encoder_profile = options.encoder_profile
+    table = source_table(encoder_profile)
+    size = encoder_profile.chunk_size
+    context = multiprocessing.get_context()
+    sources = {}  # id -> (process, connection)
+    # the instruction map of a compiled file is built once and mapped by
+    # the processes of all the sources running it: from the cache or,
+    # without one, from a temporary table file
+    tables = {}  # compiled file -> InstructionTable
+    tables_dir = tempfile.TemporaryDirectory(prefix="rv_tracer_tables_")
+    file = open_capture(options.packets_path)
+    try:
+        for block in read_blocks(file, FRAMES_PER_BLOCK, size):
+            for source, frames in split_by_source(block, table, size).items():
+                if source not in sources:
+                    compiled_path = options.source_elfs.get(
+                        source, options.compiled_path
+                    )
+                    if compiled_path is None:
+                        raise ValueError(
+                            f"No compiled file for the source {source}"
+                        )
+                    if compiled_path not in tables:
+                        tables[compiled_path] = _shared_instruction_table(
+                            compiled_path,
+                            encoder_profile.xlen,
+                            tables_dir.name,
+                            options.config_path or CONFIG_FILE,
+                            options.cache_dir,
+                        )
+                    receiver, sender = context.Pipe(duplex=False)
+                    process = context.Process(
+                        target=_decode_source,
+                        args=(
+                            receiver,
+                            options.for_source(
+                                compiled_path,
+                                source_output_path(
+                                    options.output_path, source
+                                ),
+                                tables[compiled_path],
+                            ),
+                        ),
+                        name=f"source {source}",
+                    )
+                    process.start()
+                    receiver.close()
+                    sources[source] = [process, sender]
+                sender = sources[source][1]
+                if sender is None:
+                    continue  # the decode of the source stopped
+                try:
+                    sender.send_bytes(frames)
+                except OSError:
+                    # the process of the source failed, the others go on
+                    sender.close()
+                    sources[source][1] = None
+    finally:
+        if file is not sys.stdin.buffer:
+            file.close()
+        # the empty message ends the stream of every source
+        for process, sender in sources.values():
+            if sender is None:
+                continue
+            try:
+                sender.send_bytes(b"")
+            except OSError:
+                pass
+            sender.close()
+        for process, _ in sources.values():
+            process.join()
+        tables.clear()
+        tables_dir.cleanup()
+    return sorted(
+        source
+        for source, (process, _) in sources.items()
+        if process.exitcode != 0
+    )
+
+
+def _create_sink(options: DecodeOptions, state: TraceState, output_offset):
+    output_path = options.output_path
+    output_format = options.output_format
+    compiled_path = options.compiled_path
+    lcov_path = options.lcov_path
+    if output_format in ("text", "pc") and options.pipeline:
+        return PipelinedTextSink(
+            output_path, output_format, state.instruction_map, output_offset
+        )
+    if output_format in ("text", "pc"):
+        return TextTraceSink(
+            open_output(output_path, output_offset), output_format
+        )
+    if output_format == "coverage":
+        symbols = None
+        if lcov_path is not None:
+            symbols = SymbolIndex(load_symbols(compiled_path))
+        return CoverageSink(
+            output_path,
+            state.instruction_map,
+            lcov_path,
+            symbols,
+            compiled_path,
+        )
+    if output_format == "functions" and options.sampled:
+        return SampledFunctionProfileSink(
+            open_output(output_path),
+            state.instruction_map,
+            SymbolIndex(load_symbols(compiled_path)),
+        )
+    if output_format == "functions":
+        return FunctionProfileSink(
+            open_output(output_path),
+            state.instruction_map,
+            SymbolIndex(load_symbols(compiled_path)),
+        )
+    if output_format == "callgraph":
+        return CallGraphSink(
+            open_output(output_path),
+            state.instruction_map,
+            SymbolIndex(load_symbols(compiled_path)),
+            output_path.endswith(".json"),
+        )
+    if output_format == "columnar":
+        return ColumnarTraceSink(
+            open_binary_output(output_path),
+            state.instruction_map,
+            compiled_path,
+        )
+    raise ValueError(f"Unknown output format: {output_format}")
+
+
+def export_packets(options: DecodeOptions):
+    # writes the parsed packets to a columnar file, without decoding them
+    options.validate()
+    encoder_profile = options.encoder_profile
+    first, last = options.packet_range or (None, None)
+    start_time, end_time = options.time_range or (None, None)
+    packet_cache = None
+    if options.packet_cache_size:
+        packet_cache = PacketCache(options.packet_cache_size)
+    writer = ColumnarWriter(
+        open_binary_output(options.output_path),
+        PACKET_SCHEMA,
+        {
+            "source": options.packets_path,
+            "encoder": encoder_profile.as_dict(),
+        },
+    )
+    file = open_capture(options.packets_path)
+    try:
+        for index, (timestamp, packet) in enumerate(
+            iter_packets(
+                file,
+                options.workers,
+                ParserContext(encoder_profile),
+                packet_cache,
+            )
+        ):
+            if last is not None and index >= last:
+                break
+            if end_time is not None and timestamp > end_time:
+                break
+            if (first is None or index >= first) and (
+                start_time is None or timestamp >= start_time
+            ):
+                writer.append(packet_row(index, timestamp, packet))
+    finally:
+        writer.close()
+        if file is not sys.stdin.buffer:
+            file.close()
+
+
+def packet_statistics(options: DecodeOptions):
+    # writes the encoder efficiency statistics of a capture, as JSON if
+    # the output ends in .json, without parsing nor decoding the packets
+    options.validate()
+    file = open_capture(options.packets_path)
+    try:
+        statistics = collect_statistics(file, options.encoder_profile)
+    finally:
+        if file is not sys.stdin.buffer:
+            file.close()
+    output = open_output(options.output_path)
+    try:
+        write_statistics(
+            statistics.report(options.retired),
+            output,
+            options.output_path.endswith(".json"),
+        )
+    finally:
+        output.close()
+
+
+def _is_sync(te_inst):
+    # format 3 packets carrying an address can start the reconstruction
+    return te_inst.format == 3 and te_inst.subformat in (0, 1)
+
+
+def _decode(
+    file, state: TraceState, options: DecodeOptions, run: _DecodeRun, packets
+):
+    # with an ErrorLog the decode recovers from errors: each is logged,
+    # the reconstruction restarts from the next sync packet
+    # packets, when given, are the (timestamp, packet) of the capture
+    # already parsed, e.g. by the parser of the pipeline, and file is unused
+    # the helpers of the run are locals of the packet loop
+    encoder_profile = options.encoder_profile
+    profiler = run.profiler
+    reporter = run.reporter
+    checkpointer = run.checkpointer
+    checkpoint = run.checkpoint
+    errors = run.errors
+    first, last = options.packet_range or (None, None)
+    start_time, end_time = options.time_range or (None, None)
+    # with a selection the reconstruction starts from the first sync packet
+    synced = first is None and start_time is None
+    context = ParserContext(encoder_profile)
+    if checkpoint is not None:
+        # continues after the last packet processed before the checkpoint,
+        # parsing with the options of the last support packet
+        synced = checkpoint["synced"]
+        file.seek(checkpoint["input_offset"])
+        if state.options is not None:
+            context.set_ioptions(dict(state.options))
+
+    if reporter is not None:
+        reporter.begin()
+    # processes the packets while reading the binary file
+    if packets is None:
+        packets = iter_packets(
+            file,
+            options.workers,
+            context,
+            run.packet_cache,
+            errors is not None,
+        )
+    for index, (timestamp, packet) in enumerate(
+        packets, state.processed_packets
+    ):
+        if (last is not None and index >= last) or (
+            end_time is not None and timestamp > end_time
+        ):
+            if reporter is not None:
+                reporter.stopped = "end of the selection"
+            break
+
+        if isinstance(packet, PacketError):
+            # a frame that cannot be parsed breaks the reconstruction
+            errors.record(index, packet)
+            state.restart()
+            synced = False
+            packet = None
+        elif not synced:
+            if (
+                (first is None or index >= first)
+                and (start_time is None or timestamp >= start_time)
+                and _is_sync(packet)
+            ):
+                synced = True
+                if errors is not None:
+                    errors.resynced()
+            else:
+                if errors is not None:
+                    errors.skip()
+                if packet.format == 3 and packet.subformat == 3:
+                    # outside the selection only the encoder options are
+                    # followed
+                    process_support(packet, state)
+
+        if synced:
+            state.timestamp = timestamp
+            reported = state.reported_pcs
+            try:
+                process_te_inst(packet, state)
+            except EndOfTrace:
+                if errors is None:
+                    if reporter is not None:
+                        reporter.stopped = "end of the program"
+                    break
+                # in a long capture another trace may follow
+                errors.end_trace(index)
+                state.restart()
+                synced = False
+            except DecodeError as exc:
+                # other exceptions are bugs of the decoder, not of the trace
+                if errors is None:
+                    raise
+                errors.record(index, exc)
+                state.restart()
+                synced = False
+            finally:
+                if profiler is not None:
+                    profiler.record_packet(state.reported_pcs - reported)
+
+        state.prev_te_inst = packet
+        state.processed_packets += 1
+        if reporter is not None:
+            reporter.update(state.processed_packets, state.reported_pcs)
+        if checkpointer is not None and checkpointer.due(state):
+            checkpointer.save(state, synced, encoder_profile.chunk_size)
+
+
+def _decode_sampled(
+    file,
+    state: TraceState,
+    profile_sink: SampledFunctionProfileSink,
+    options: DecodeOptions,
+    run: _DecodeRun,
+):
+    # decodes the resync segments chosen by the sampler: a segment that
+    # follows a decoded one goes on with its reconstruction, the others
+    # start from their sync packet; within the decoded segments the errors
+    # and the end of the program are handled as by _decode, so that a
+    # sample of every segment gives the exact profile
+    reporter = run.reporter
+    errors = run.errors
+    sampled = False  # the current segment is decoded
+    synced = False
+    if reporter is not None:
+        reporter.begin()
+    try:
+        for segment, selected, index, timestamp, packet in iter_segments(
+            file,
+            ParserContext(options.encoder_profile),
+            SegmentSampler(options.sample_every, options.sample_seed),
+            run.packet_cache,
+            errors is not None,
+        ):
+            if packet is None:
+                # start of a segment
+                if sampled:
+                    profile_sink.end_segment(continued=selected)
+                elif selected:
+                    # only the options were followed since the last one
+                    state.restart()
+                    state.prev_te_inst = None
+                    synced = True
+                profile_sink.segments = segment + 1
+                sampled = selected
+                if reporter is not None:
+                    reporter.segments = profile_sink.sampled, segment + 1
+                continue
+
+            if isinstance(packet, PacketError):
+                # a frame that cannot be parsed breaks the reconstruction
+                errors.record(index, packet)
+                state.restart()
+                synced = False
+                packet = None
+            elif not sampled:
+                # skipped segments only follow the encoder options
+                process_support(packet, state)
+            elif not synced:
+                if _is_sync(packet):
+                    synced = True
+                    if errors is not None:
+                        errors.resynced()
+                else:
+                    if errors is not None:
+                        errors.skip()
+                    if packet.format == 3 and packet.subformat == 3:
+                        process_support(packet, state)
+
+            if sampled and synced:
+                state.timestamp = timestamp
+                try:
+                    process_te_inst(packet, state)
+                except EndOfTrace:
+                    if errors is None:
+                        if reporter is not None:
+                            reporter.stopped = "end of the program"
+                        break
+                    # another run of the program may follow in the capture
+                    errors.end_trace(index)
+                    state.restart()
+                    synced = False
+                except DecodeError as exc:
+                    if errors is None:
+                        raise
+                    errors.record(index, exc)
+                    state.restart()
+                    synced = False
+            if sampled:
+                state.prev_te_inst = packet
 
-    # processes the packets
-    for packet in packets:
-        process_te_inst(packet, state)
+            # the frames of the skipped segments count as processed
+            state.processed_packets = index + 1
+            if reporter is not None:
+                reporter.update(state.processed_packets, state.reported_pcs)
+    finally:
+        # the profile is written also when the decode fails, with the
+        # counts of the segment in progress
+        if sampled:
+            profile_sink.end_segment()
+        if reporter is not None:
+            reporter.segments = profile_sink.sampled, profile_sink.segments
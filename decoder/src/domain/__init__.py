@@ -2,3 +2,9 @@ from .const import *
 from .enums import *
 from .packet_format import *
 from .trace_processor_model import *
+from .encoder_profile import *
+from .packet_parser_model import *
+from .symbol_index import *
+from .retirement_block import *
+from .errors import *
+from .decode_options import *
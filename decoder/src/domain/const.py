@@ -27,6 +27,10 @@ NO_TIME = 1
 NO_CONTEXT = 1
 # decoder constants
 CHUNK_SIZE = 40  # bytes == 320 bits
+FRAMES_PER_BLOCK = 4096  # frames read from the capture at once
+DEFAULT_PATH_CACHE_SIZE = 4096  # execution path segments
+DEFAULT_PACKET_CACHE_SIZE = 4096  # parsed packets
+DEFAULT_CHECKPOINT_INTERVAL = 100000  # packets
 # instruction size
 INSTRUCTION_SIZE = 4  # bytes == 32 bits
 COMPRESSED_INSTRUCTION_SIZE = 2  # bytes == 16 bits
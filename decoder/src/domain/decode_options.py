@@ -0,0 +1,224 @@
+# Copyright (C) 2025 ETH Zurich and University of Bologna
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# imports
+import copy
+
+from .const import (
+    DEFAULT_PATH_CACHE_SIZE,
+    DEFAULT_PACKET_CACHE_SIZE,
+    DEFAULT_CHECKPOINT_INTERVAL,
+)
+from .encoder_profile import EncoderProfile, DEFAULT_PROFILE
+from .enums import Privilege
+
+# formats of the decoded trace
+DECODE_FORMATS = (
+    "text",
+    "pc",
+    "coverage",
+    "functions",
+    "callgraph",
+    "columnar",
+)
+# formats written from the frames alone, without decoding the packets
+PACKET_ONLY_FORMATS = ("packets", "stats")
+OUTPUT_FORMATS = DECODE_FORMATS + PACKET_ONLY_FORMATS
+# privilege levels accepted by the filter, from the least privileged
+PRIVILEGES = tuple(
+    privilege.name for privilege in sorted(Privilege, key=lambda p: p.value)
+)
+
+
+class DecodeOptions:
+    # options of a decode, as given on the command line: built once by
+    # main.py, checked by validate() and read by the controller
+    # packets_path and output_path accept "-" for stdin and stdout
+    # packet_range and time_range are (start, end) tuples, the end is
+    # exclusive for packets and inclusive for timestamps, None is open
+    # config_path None is the disassembler_config.yaml of the decoder
+    # with demux, source_elfs maps a source id to its compiled file, the
+    # other sources use compiled_path
+    # instruction_map, when given, is used instead of disassembling
+    # compiled_path, e.g. an InstructionTable shared with other processes
+    def __init__(
+        self,
+        packets_path,
+        compiled_path=None,
+        # output
+        output_path="execution_trace",
+        output_format="text",
+        lcov_path=None,
+        retired=None,
+        # input
+        config_path=None,
+        encoder_profile: EncoderProfile = DEFAULT_PROFILE,
+        packet_range=None,
+        time_range=None,
+        recover=False,
+        demux=False,
+        source_elfs=None,
+        instruction_map=None,
+        # filters
+        address_ranges=None,
+        functions=None,
+        privileges=None,
+        # sampling
+        sample_every=None,
+        sample_seed=None,
+        # performance
+        workers=1,
+        pipeline=False,
+        path_cache_size=DEFAULT_PATH_CACHE_SIZE,
+        packet_cache_size=DEFAULT_PACKET_CACHE_SIZE,
+        cache_dir=None,
+        # checkpoints
+        checkpoint_path=None,
+        checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL,
+        resume=False,
+        # diagnostics
+        profile_path=None,
+        progress=False,
+        progress_path=None,
+        progress_interval=1.0,
+    ):
+        self.packets_path = packets_path
+        self.compiled_path = compiled_path
+        self.output_path = output_path
+        self.output_format = output_format
+        self.lcov_path = lcov_path
+        self.retired = retired
+        self.config_path = config_path
+        self.encoder_profile = encoder_profile
+        self.packet_range = packet_range
+        self.time_range = time_range
+        self.recover = recover
+        self.demux = demux
+        self.source_elfs = source_elfs or {}
+        self.instruction_map = instruction_map
+        self.address_ranges = address_ranges
+        self.functions = functions
+        self.privileges = privileges
+        self.sample_every = sample_every
+        self.sample_seed = sample_seed
+        self.workers = workers
+        self.pipeline = pipeline
+        self.path_cache_size = path_cache_size
+        self.packet_cache_size = packet_cache_size
+        self.cache_dir = cache_dir
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+        self.resume = resume
+        self.profile_path = profile_path
+        self.progress = progress
+        self.progress_path = progress_path
+        self.progress_interval = progress_interval
+
+    @property
+    def sampled(self):
+        return self.sample_every is not None
+
+    @property
+    def filtered(self):
+        return bool(self.address_ranges or self.functions or self.privileges)
+
+    def for_source(self, compiled_path, output_path, table):
+        # options of the decode of one source of a demuxed capture, whose
+        # process sets packets_path to its stream of frames
+        options = copy.copy(self)
+        options.packets_path = None
+        options.compiled_path = compiled_path
+        options.output_path = output_path
+        options.instruction_map = table
+        options.demux = False
+        options.source_elfs = {}
+        return options
+
+    def validate(self):
+        # raises ValueError, with the command line options in the message,
+        # for the combinations of options that are not supported
+        packet_only = self.output_format in PACKET_ONLY_FORMATS
+        reads_file = isinstance(self.packets_path, str)
+        # 0 disables a cache
+        if self.path_cache_size < 0:
+            raise ValueError("--path-cache must be at least 0")
+        if self.packet_cache_size < 0:
+            raise ValueError("--packet-cache must be at least 0")
+        if self.lcov_path is not None and self.output_format != "coverage":
+            raise ValueError("--lcov requires -f coverage")
+        if self.retired is not None and self.output_format != "stats":
+            raise ValueError("--retired requires -f stats")
+        if self.source_elfs and not self.demux:
+            raise ValueError("--source-elf requires --demux")
+        if self.demux:
+            if packet_only:
+                raise ValueError(
+                    f"--demux does not support -f {self.output_format}"
+                )
+            if self.output_path == "-":
+                raise ValueError("--demux writes an output file per source")
+            for option, name in (
+                (self.checkpoint_path, "--checkpoint"),
+                (self.profile_path, "--profile"),
+                (self.lcov_path, "--lcov"),
+                (self.progress or self.progress_path, "--progress"),
+            ):
+                if option:
+                    raise ValueError(f"{name} is not supported with --demux")
+        if (
+            self.compiled_path is None
+            and self.instruction_map is None
+            and not packet_only
+            and not (self.demux and self.source_elfs)
+        ):
+            raise ValueError(
+                "the compiled file is required to decode the trace"
+            )
+        if packet_only and self.filtered:
+            raise ValueError(
+                f"-f {self.output_format} does not support the filters"
+            )
+        if self.sample_seed is not None and not self.sampled:
+            raise ValueError("--sample-seed requires --sample")
+        if self.sampled:
+            if self.output_format != "functions":
+                raise ValueError("--sample requires -f functions")
+            for option, name in (
+                (self.packet_range or self.time_range, "--packets and --time"),
+                (self.pipeline, "--pipeline"),
+                (self.checkpoint_path, "--checkpoint"),
+            ):
+                if option:
+                    raise ValueError(f"{name} not supported with --sample")
+        if self.pipeline:
+            if not reads_file or self.packets_path == "-":
+                raise ValueError("--pipeline requires a capture file")
+            for option, name in (
+                (self.demux, "--demux"),
+                (self.checkpoint_path, "--checkpoint"),
+                (packet_only, f"-f {self.output_format}"),
+            ):
+                if option:
+                    raise ValueError(
+                        f"{name} is not supported with --pipeline"
+                    )
+        if self.checkpoint_path is not None:
+            if self.output_format not in ("text", "pc"):
+                raise ValueError("--checkpoint requires a text output format")
+            if not reads_file or "-" in (self.packets_path, self.output_path):
+                raise ValueError(
+                    "--checkpoint requires seekable input and output files"
+                )
+        if self.resume and self.checkpoint_path is None:
+            raise ValueError("--resume requires --checkpoint")
@@ -0,0 +1,107 @@
+# Copyright (C) 2025 ETH Zurich and University of Bologna
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# imports
+from .const import (
+    PRIV_LEN,
+    XLEN,
+    CALL_COUNTER_SIZE,
+    NO_TIME,
+    NO_CONTEXT,
+    CHUNK_SIZE,
+)
+from .trace_processor_model import DiscoveryResponse
+
+# encapsulation: the last byte is the header, preceded by the timestamp
+HEADER_LEN = 8
+TIMESTAMP_LEN = 64
+
+
+class EncoderProfile:
+    # parameters of the encoder that produced a capture
+    # the values default to the ones in const.py, the field lengths that
+    # depend on them are computed once here instead of for every packet
+    def __init__(
+        self,
+        xlen=XLEN,
+        priv_len=PRIV_LEN,
+        call_counter_size=CALL_COUNTER_SIZE,
+        return_stack_size=0,
+        iaddress_lsb=0,
+        no_time=NO_TIME,
+        no_context=NO_CONTEXT,
+        chunk_size=CHUNK_SIZE,
+        source_id_lsb=5,
+        source_id_len=2,
+    ):
+        if xlen not in (32, 64):
+            raise ValueError(f"Unsupported XLEN: {xlen}")
+        if source_id_lsb < 5 or source_id_lsb + source_id_len > HEADER_LEN:
+            # the low 5 bits of the header are the payload length
+            raise ValueError("The source id must be in the header bits 7:5")
+        self.xlen = xlen
+        self.priv_len = priv_len
+        self.call_counter_size = call_counter_size
+        self.return_stack_size = return_stack_size
+        self.iaddress_lsb = iaddress_lsb
+        self.no_time = no_time
+        self.no_context = no_context
+        self.chunk_size = chunk_size
+        # header bits telling the source (hart) of a frame, for captures
+        # of several encoders, see demux.py
+        self.source_id_lsb = source_id_lsb
+        self.source_id_len = source_id_len
+
+        # irdepth field length
+        self.irdepth_len = 2**call_counter_size
+        # sign extended length of delta addresses
+        self.delta_address_len = xlen + 1
+        # lengths of the fields preceding a compressed address
+        # time and context are not supported yet, see packet_parser.py
+        self.f1_known_fields_len = 10 + self.irdepth_len  # + branch map
+        self.f2_known_fields_len = 5 + self.irdepth_len
+        self.f3sf0_known_fields_len = 5 + priv_len
+        self.f3sf1_known_fields_len = 7 + priv_len + 2 * xlen
+        # bit offsets inside the encapsulated frame
+        self.frame_len = chunk_size * 8
+        self.timestamp_end = self.frame_len - HEADER_LEN
+        self.payload_end = self.timestamp_end - TIMESTAMP_LEN
+
+    def discovery_response(self):
+        # parameters the trace processor would ask to the encoder
+        response = DiscoveryResponse()
+        response.iaddress_lsb = self.iaddress_lsb
+        response.call_counter_size = self.call_counter_size
+        response.return_stack_size = self.return_stack_size
+        return response
+
+    def as_dict(self):
+        return {
+            "xlen": self.xlen,
+            "priv_len": self.priv_len,
+            "call_counter_size": self.call_counter_size,
+            "return_stack_size": self.return_stack_size,
+            "iaddress_lsb": self.iaddress_lsb,
+            "no_time": self.no_time,
+            "no_context": self.no_context,
+            "chunk_size": self.chunk_size,
+            "source_id_lsb": self.source_id_lsb,
+            "source_id_len": self.source_id_len,
+        }
+
+    def __repr__(self):
+        return f"EncoderProfile({self.as_dict()})"
+
+
+DEFAULT_PROFILE = EncoderProfile()
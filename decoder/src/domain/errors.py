@@ -0,0 +1,30 @@
+# Copyright (C) 2025 ETH Zurich and University of Bologna
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+class DecodeError(Exception):
+    # the packets do not agree with the compiled file or with each other,
+    # e.g. a branch that cannot be resolved or an address that is not an
+    # instruction: the reconstruction cannot continue from this state
+    pass
+
+
+class PacketError(DecodeError):
+    # a frame that could not be parsed into a packet
+    pass
+
+
+class EndOfTrace(Exception):
+    # the traced program reached the jump to itself that ends it
+    pass
@@ -0,0 +1,77 @@
+# Copyright (C) 2025 ETH Zurich and University of Bologna
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# classification of the disassembled instructions, as capstone prints
+# them, shared by the output sinks and the reference encoder
+
+BRANCH_MNEMONICS = {
+    "beq",
+    "bne",
+    "blt",
+    "bge",
+    "bltu",
+    "bgeu",
+    "c.beqz",
+    "c.bnez",
+    "beqz",
+    "bnez",
+    "blez",
+    "bgez",
+    "bltz",
+    "bgtz",
+}
+# jumps whose target is an offset from their address
+DIRECT_JUMP_MNEMONICS = {"jal", "j", "c.j", "c.jal"}
+# jumps whose target is in a register
+INDIRECT_JUMP_MNEMONICS = {"jalr", "jr", "ret", "c.jr", "c.jalr"}
+TRAP_RETURN_MNEMONICS = {"uret", "sret", "mret", "dret"}
+ENVIRONMENT_MNEMONICS = {"ecall", "ebreak", "c.ebreak"}
+# instructions ending a basic block
+CONTROL_TRANSFER_MNEMONICS = (
+    BRANCH_MNEMONICS
+    | DIRECT_JUMP_MNEMONICS
+    | INDIRECT_JUMP_MNEMONICS
+    | TRAP_RETURN_MNEMONICS
+    | ENVIRONMENT_MNEMONICS
+)
+
+# how a jump transfers control
+OTHER = 0
+CALL = 1
+RETURN = 2
+
+LINK_REGISTERS = ("ra", "t0")
+
+
+def jump_kind(mnemonic, op_str):
+    # classifies a disassembled instruction as a call, a return or neither
+    # capstone omits rd when it is ra, e.g. "jal 0x20" or "jalr a5"
+    operands = op_str.split(", ")
+    if mnemonic in ("c.jal", "c.jalr"):
+        return CALL
+    if mnemonic in ("jal", "jalr"):
+        if len(operands) == 1 or operands[0] in LINK_REGISTERS:
+            return CALL
+        if (
+            mnemonic == "jalr"
+            and operands[0] == "zero"
+            and operands[1] in LINK_REGISTERS
+        ):
+            return RETURN
+        return OTHER
+    if mnemonic == "ret" or (
+        mnemonic in ("c.jr", "jr") and operands[0] in LINK_REGISTERS
+    ):
+        return RETURN
+    return OTHER
@@ -18,7 +18,13 @@
 from .enums import *
 
 from abc import ABC
-from tabulate import tabulate
+
+
+def tabulate(data, **kwargs):
+    # tabulate is only needed to print packets, so it is imported on demand
+    from tabulate import tabulate
+
+    return tabulate(data, **kwargs)
 
 
 # Abstract class that represent a packet
@@ -30,6 +36,17 @@ class Packet(ABC):
     def getFormat(self):
         return self.format
 
+    # packets shared by the parser cache are frozen, since the same object
+    # stands for every occurrence of a payload
+    def freeze(self):
+        self._frozen = True
+        return self
+
+    def __setattr__(self, name, value):
+        if self.__dict__.get("_frozen"):
+            raise AttributeError(f"{type(self).__name__} packet is frozen")
+        super().__setattr__(name, value)
+
 
 # Class that represents a Format 1 packet
 class Format1(Packet):
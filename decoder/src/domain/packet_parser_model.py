@@ -0,0 +1,51 @@
+# Copyright (C) 2025 ETH Zurich and University of Bologna
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# imports
+from .enums import Ioptions
+from .encoder_profile import EncoderProfile, DEFAULT_PROFILE
+
+
+def default_ioptions():
+    # encoder modes before the first support packet
+    return {
+        Ioptions.DELTA_ADDRESS: True,
+        Ioptions.FULL_ADDRESS: False,
+        Ioptions.IMPLICIT_EXCEPTION: False,
+        Ioptions.SIJUMP: False,
+        Ioptions.IMPLICIT_RETURN: False,
+        Ioptions.BRANCH_PREDICTION: False,
+        Ioptions.JUMP_TARGET_CACHE: False,
+    }
+
+
+class ParserContext:
+    # represents the state of the packet parser: the encoder parameters and
+    # the ioptions of the last support packet, which decide how format 1
+    # and 2 addresses are encoded
+    # parsing a range of frames only needs the context at its first frame
+    def __init__(
+        self, profile: EncoderProfile = DEFAULT_PROFILE, ioptions=None
+    ):
+        self.profile = profile
+        self.set_ioptions(ioptions or default_ioptions())
+
+    def set_ioptions(self, ioptions: dict):
+        self.ioptions = ioptions
+        self.full_address = ioptions[Ioptions.FULL_ADDRESS]
+        # hashable form, used by the packet cache
+        self.ioptions_key = tuple(ioptions[option] for option in Ioptions)
+
+    def copy(self):
+        return ParserContext(self.profile, dict(self.ioptions))
@@ -0,0 +1,72 @@
+# Copyright (C) 2025 ETH Zurich and University of Bologna
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# imports
+from collections import namedtuple
+
+# termination types of a block, as on the itype_i port of rv_tracer
+# (ITYPE_LEN = 4)
+ITYPE_NONE = 0
+ITYPE_EXCEPTION = 1
+ITYPE_INTERRUPT = 2
+ITYPE_ERET = 3  # return from trap
+ITYPE_NOT_TAKEN_BRANCH = 4
+ITYPE_TAKEN_BRANCH = 5
+ITYPE_UNINFERABLE_CALL = 8
+ITYPE_INFERABLE_CALL = 9
+ITYPE_UNINFERABLE_TAIL_CALL = 10
+ITYPE_INFERABLE_TAIL_CALL = 11
+ITYPE_COROUTINE_SWAP = 12
+ITYPE_RETURN = 13
+ITYPE_UNINFERABLE_JUMP = 14
+ITYPE_INFERABLE_JUMP = 15
+
+ITYPE_TRAPS = (ITYPE_EXCEPTION, ITYPE_INTERRUPT)
+ITYPE_BRANCHES = (ITYPE_NOT_TAKEN_BRANCH, ITYPE_TAKEN_BRANCH)
+# the target of these instructions is not known from the binary
+ITYPE_UPDISCON = (
+    ITYPE_ERET,
+    ITYPE_UNINFERABLE_CALL,
+    ITYPE_UNINFERABLE_TAIL_CALL,
+    ITYPE_COROUTINE_SWAP,
+    ITYPE_RETURN,
+    ITYPE_UNINFERABLE_JUMP,
+)
+
+# the instructions retired by a hart in one cycle, as on the rv_tracer
+# inputs: iretire half-words starting at iaddr, the last instruction is
+# 2**ilastsize half-words long and terminates the block as told by itype
+# a block with iretire == 0 is an exception or interrupt alone, iaddr is
+# then the address of the trapping instruction
+# time is the timestamp of the frames emitted for the block, None for
+# the index of the block
+RetirementBlock = namedtuple(
+    "RetirementBlock",
+    [
+        "itype",
+        "iaddr",
+        "iretire",
+        "ilastsize",
+        "priv",
+        "cause",
+        "tval",
+        "time",
+    ],
+    defaults=(3, 0, 0, None),
+)
+
+
+def last_address(block):
+    # address of the last instruction retired by a block
+    return block.iaddr + 2 * (block.iretire - (1 << block.ilastsize))
@@ -0,0 +1,70 @@
+# Copyright (C) 2025 ETH Zurich and University of Bologna
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# imports
+from bisect import bisect_right
+
+
+class SymbolIndex:
+    # sorted, non overlapping intervals [start, end) of the functions of
+    # the compiled file, an address is resolved with a binary search
+    def __init__(self, symbols):
+        # symbols: iterable of (start, size, name), a size of 0 extends the
+        # symbol up to the next one, unless it falls inside a function
+        self.starts = []
+        self.ends = []
+        self.names = []
+        # at equal addresses the symbols with a size come first
+        ordered = sorted(symbols, key=lambda s: (s[0], s[1] == 0))
+        unique_starts = sorted({s[0] for s in ordered})
+        for start, size, name in ordered:
+            if self.starts and self.starts[-1] == start:
+                continue  # alias of the previous symbol
+            end = start + size
+            if size == 0:
+                i = bisect_right(unique_starts, start)
+                end = unique_starts[i] if i < len(unique_starts) else start
+            if self.ends and self.ends[-1] > start:
+                if size == 0:
+                    continue  # label inside the previous function
+                # the previous symbol ends where this one starts
+                self.ends[-1] = start
+            self.starts.append(start)
+            self.ends.append(end)
+            self.names.append(name)
+
+    def find(self, address):
+        # index of the symbol containing address, -1 if there is none
+        i = bisect_right(self.starts, address) - 1
+        if i >= 0 and address < self.ends[i]:
+            return i
+        return -1
+
+    def interval(self, address):
+        # (index, start, end) of the symbol containing address, for an
+        # address outside every symbol the index is -1 and the interval the
+        # gap between the neighbouring symbols
+        i = bisect_right(self.starts, address) - 1
+        if i >= 0 and address < self.ends[i]:
+            return i, self.starts[i], self.ends[i]
+        start = self.ends[i] if i >= 0 else 0
+        end = self.starts[i + 1] if i + 1 < len(self.starts) else 1 << 64
+        return -1, start, end
+
+    def name(self, address):
+        i = self.find(address)
+        return self.names[i] if i >= 0 else None
+
+    def __len__(self):
+        return len(self.starts)
@@ -23,6 +23,51 @@ class DiscoveryResponse:
         self.return_stack_size = 0
 
 
+class ReturnStack:
+    # implicit return stack of the trace processor, a ring buffer of fixed
+    # capacity: when full, pushing a new link evicts the oldest one
+    def __init__(self, capacity=1):
+        self.capacity = capacity
+        self.links = [0] * capacity
+        self.bottom = 0  # slot of the oldest link
+        self.depth = 0
+
+    def push(self, link):
+        if self.depth == self.capacity:
+            # the new link takes the slot of the oldest one
+            self.links[self.bottom] = link
+            self.bottom = (self.bottom + 1) % self.capacity
+            return
+        self.links[(self.bottom + self.depth) % self.capacity] = link
+        self.depth += 1
+
+    def pop(self):
+        # callers check that the stack is not empty
+        self.depth -= 1
+        return self.links[(self.bottom + self.depth) % self.capacity]
+
+    def clear(self):
+        self.bottom = 0
+        self.depth = 0
+
+    def snapshot(self):
+        # links from the oldest to the most recent, hashable
+        return tuple(
+            self.links[(self.bottom + i) % self.capacity]
+            for i in range(self.depth)
+        )
+
+    def restore(self, snapshot):
+        # snapshots longer than the capacity keep their most recent links
+        snapshot = snapshot[len(snapshot) - self.capacity :]
+        self.links[: len(snapshot)] = snapshot
+        self.bottom = 0
+        self.depth = len(snapshot)
+
+    def __len__(self):
+        return self.depth
+
+
 class Instruction:
     # represents a decoded RISC-V instruction
 
@@ -40,8 +85,11 @@ class Instruction:
 class TraceState:
     # represents the state of the trace processor
     def __init__(self):
-        self.te_inst_list = []
+        self.discovery_response = DiscoveryResponse()
+        self.prev_te_inst = None  # packet preceding the one processed
         self.instruction_map = []
+        self.instr_cache = {}  # address -> decoded Instruction
+        self.instr_cache_misses = 0  # lookups that decoded the instruction
 
         self.pc = 0
         self.last_pc = 0
@@ -53,11 +101,42 @@ class TraceState:
         self.address = 0
         self.privilege = 0
         self.options = None
-        self.return_stack = []
-        self.irstack_depth = 0
+        self.return_stack = ReturnStack()
+        self.processed_packets = 0  # number of packets processed so far
+        self.timestamp = 0  # of the packet being processed
+        self.reported_pcs = 0  # number of pcs reported so far
+        self.sink = None  # receives the reported pcs
+        self.path_cache = None  # memoized execution path segments
+
+    @property
+    def irstack_depth(self):
+        return self.return_stack.depth
+
+    def set_discovery_response(self, discovery_response):
+        # the return stack is sized from the encoder parameters
+        self.discovery_response = discovery_response
+        if discovery_response.return_stack_size:
+            capacity = 2**discovery_response.return_stack_size
+        else:
+            capacity = 2**discovery_response.call_counter_size
+        self.return_stack = ReturnStack(capacity)
+
+    def restart(self):
+        # forgets the reconstruction after an error: the next sync packet
+        # starts it again, the options, caches and sink are kept
+        self.pc = 0
+        self.last_pc = 0
+        self.branches = 0
+        self.branch_map = 0
+        self.stop_at_last_branch = False
+        self.inferred_address = False
+        self.start_of_trace = True
+        self.address = 0
+        self.return_stack.clear()
 
     def set_instruction_map(self, m):
         self.instruction_map = m
+        self.instr_cache = {}
 
-    def set_te_inst_list(self, l):
-        self.te_inst_list = l
+    def set_sink(self, sink):
+        self.sink = sink
@@ -0,0 +1,86 @@
+# Copyright (C) 2025 ETH Zurich and University of Bologna
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# imports
+import json
+from collections import Counter
+
+from .function_profile import FunctionProfileSink
+
+from src.domain.symbol_index import SymbolIndex
+
+
+class CallGraphSink(FunctionProfileSink):
+    # builds the dynamic call graph while decoding: the calls recognized by
+    # the function profile become caller -> callee edges weighted by their
+    # count, the nodes carry the instructions executed in each function
+    # written as JSON if the output path ends in .json, as DOT otherwise
+    def __init__(
+        self, output, instruction_map, symbols: SymbolIndex, as_json=False
+    ):
+        super().__init__(output, instruction_map, symbols)
+        self.as_json = as_json
+        self.edges = Counter()  # (caller, callee) -> calls
+
+    def _call(self, function):
+        super()._call(function)
+        self.edges[(self.current, function)] += 1
+
+    def graph(self):
+        functions = {}
+        for name, start, calls, instructions, inclusive in self.rows():
+            functions[name] = {
+                "address": start,
+                "calls": calls,
+                "instructions": instructions,
+                "inclusive": inclusive,
+            }
+        edges = [
+            {
+                "caller": self.function_name(caller),
+                "callee": self.function_name(callee),
+                "calls": calls,
+            }
+            for (caller, callee), calls in self.edges.most_common()
+        ]
+        return {
+            "functions": functions,
+            "edges": edges,
+            "max_depth": self.max_depth,
+        }
+
+    def dot(self, graph):
+        lines = ["digraph callgraph {", "    node [shape=box];"]
+        for name, function in graph["functions"].items():
+            label = f"{name}\n{function['instructions']} instr"
+            lines.append(
+                f"    {json.dumps(name)} [label={json.dumps(label)}];"
+            )
+        for edge in graph["edges"]:
+            lines.append(
+                f'    {json.dumps(edge["caller"])} -> '
+                f'{json.dumps(edge["callee"])} [label="{edge["calls"]}"];'
+            )
+        lines.append(f'    label="max call depth {graph["max_depth"]}";')
+        lines.append("}")
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        graph = self.graph()
+        if self.as_json:
+            json.dump(graph, self.output, indent=2)
+            self.output.write("\n")
+        else:
+            self.output.write(self.dot(graph))
+        self.output.close()
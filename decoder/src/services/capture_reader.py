@@ -0,0 +1,210 @@
+# Copyright (C) 2025 ETH Zurich and University of Bologna
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# imports
+import io
+import queue
+import sys
+import threading
+
+READ_BLOCK_SIZE = 1 << 20  # bytes decompressed at a time
+READ_AHEAD_BLOCKS = 8  # decompressed blocks waiting to be parsed
+
+# magic bytes at the start of the compressed captures
+COMPRESSION_MAGICS = [
+    (b"\x1f\x8b", "gzip"),
+    (b"\xfd7zXZ\x00", "xz"),
+    (b"\x28\xb5\x2f\xfd", "zstd"),
+    (b"BZh", "bzip2"),
+]
+
+
+def detect_compression(stream):
+    # returns the compression of a buffered binary stream, None for a raw
+    # capture, looking at its first bytes without consuming them
+    head = stream.peek(8)[:8]
+    for magic, compression in COMPRESSION_MAGICS:
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+def _decompressor(stream, compression):
+    # wraps a binary stream into a file object returning decompressed data
+    if compression == "gzip":
+        import gzip
+
+        return gzip.GzipFile(fileobj=stream, mode="rb")
+    if compression == "xz":
+        import lzma
+
+        return lzma.LZMAFile(stream, "rb")
+    if compression == "bzip2":
+        import bz2
+
+        return bz2.BZ2File(stream, "rb")
+    if compression == "zstd":
+        # the standard library has zstd from Python 3.14, before that the
+        # zstandard package is needed
+        try:
+            from compression import zstd
+
+            return zstd.ZstdFile(stream, "rb")
+        except ImportError:
+            pass
+        try:
+            import zstandard
+        except ImportError:
+            raise Exception(
+                "zstd captures need the zstandard package: "
+                "pip install zstandard"
+            )
+        return zstandard.ZstdDecompressor().stream_reader(stream)
+    raise ValueError(f"Unknown compression: {compression}")
+
+
+class ThreadedReader(io.RawIOBase):
+    # reads a decompressed stream from a background thread, so that the
+    # decompression of the next blocks overlaps the decoding of the current
+    # one (zlib, lzma and bz2 release the GIL while they work)
+    # only forward seeks are supported, by skipping data
+    def __init__(
+        self,
+        source,
+        stream=None,
+        block_size=READ_BLOCK_SIZE,
+        read_ahead=READ_AHEAD_BLOCKS,
+    ):
+        self.source = source  # decompressed stream
+        self.stream = stream  # compressed file, closed with the reader
+        self.block_size = block_size
+        self.blocks = queue.Queue(maxsize=read_ahead)
+        self.buffer = b""
+        self.offset = 0  # bytes of the buffer already read
+        self.position = 0
+        self.error = None
+        self.done = False
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._fill, daemon=True)
+        self.thread.start()
+
+    def _fill(self):
+        try:
+            while not self.stopped.is_set():
+                block = self.source.read(self.block_size)
+                if not block:
+                    break
+                self._put(block)
+        except Exception as exc:  # raised again by read()
+            self.error = exc
+        self._put(None)
+
+    def _put(self, block):
+        # gives up when the reader is closed while the queue is full
+        while not self.stopped.is_set():
+            try:
+                self.blocks.put(block, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _next_block(self):
+        block = self.blocks.get()
+        if block is None:
+            self.done = True
+            if self.error is not None:
+                raise self.error
+            return b""
+        return block
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = sys.maxsize
+        available = len(self.buffer) - self.offset
+        if available >= size:
+            # served from the current block
+            data = self.buffer[self.offset : self.offset + size]
+            self.offset += size
+        else:
+            chunks = [self.buffer[self.offset :]]
+            while available < size and not self.done:
+                block = self._next_block()
+                chunks.append(block)
+                available += len(block)
+            data = b"".join(chunks)
+            self.buffer = data[size:]
+            self.offset = 0
+            data = data[:size]
+        self.position += len(data)
+        return data
+
+    def readinto(self, b):
+        data = self.read(len(b))
+        b[: len(data)] = data
+        return len(data)
+
+    def seekable(self):
+        return False
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence != io.SEEK_SET:
+            raise io.UnsupportedOperation("compressed captures seek forward")
+        if offset < self.position:
+            raise io.UnsupportedOperation("compressed captures seek forward")
+        while self.position < offset:
+            if not self.read(min(offset - self.position, self.block_size)):
+                break
+        return self.position
+
+    def tell(self):
+        return self.position
+
+    def close(self):
+        if not self.closed:
+            self.stopped.set()
+            self.thread.join()
+            self.source.close()
+            if self.stream is not None:
+                self.stream.close()
+        super().close()
+
+
+def open_capture(path):
+    # opens a capture for reading, "-" is the standard input
+    # compressed captures are recognized from their magic bytes and
+    # decompressed while they are read, never on disk
+    # a binary stream, e.g. the frames of one source, is read as it is
+    if not isinstance(path, str):
+        return path
+    if path == "-":
+        stream = sys.stdin.buffer
+    else:
+        stream = open(path, "rb")
+    compression = detect_compression(stream)
+    if compression is None:
+        return stream
+    return ThreadedReader(
+        _decompressor(stream, compression),
+        stream if stream is not sys.stdin.buffer else None,
+    )
+
+
+def is_compressed(path):
+    with open(path, "rb") as stream:
+        return detect_compression(stream) is not None
@@ -0,0 +1,102 @@
+# Copyright (C) 2025 ETH Zurich and University of Bologna
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# imports
+import os
+import pickle
+
+from src.domain.const import DEFAULT_CHECKPOINT_INTERVAL
+from src.domain.trace_processor_model import TraceState
+
+CHECKPOINT_VERSION = 1
+
+# trace processor fields saved as they are, the return stack is saved as a
+# snapshot and the instruction map, the caches and the sink are rebuilt
+STATE_FIELDS = (
+    "prev_te_inst",
+    "pc",
+    "last_pc",
+    "branches",
+    "branch_map",
+    "stop_at_last_branch",
+    "inferred_address",
+    "start_of_trace",
+    "address",
+    "privilege",
+    "options",
+    "processed_packets",
+    "reported_pcs",
+)
+
+
+class Checkpointer:
+    # periodically saves the state of a decode, so that a decode that was
+    # interrupted can resume from the last checkpoint instead of the start
+    # a checkpoint is taken between two packets: the output is flushed
+    # first and the file is replaced atomically, so the offsets it holds
+    # always point to data that is on disk
+    def __init__(
+        self, path, interval=DEFAULT_CHECKPOINT_INTERVAL, identity=None
+    ):
+        self.path = path
+        self.interval = interval
+        self.identity = identity  # inputs the checkpoint belongs to
+        self.saved = 0
+
+    def due(self, state: TraceState):
+        return state.processed_packets % self.interval == 0
+
+    def save(self, state: TraceState, synced, frame_size):
+        checkpoint = {
+            "version": CHECKPOINT_VERSION,
+            "identity": self.identity,
+            "state": {
+                field: getattr(state, field) for field in STATE_FIELDS
+            },
+            "return_stack": state.return_stack.snapshot(),
+            "synced": synced,
+            "input_offset": state.processed_packets * frame_size,
+            "output_offset": state.sink.position(),
+        }
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(checkpoint, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.saved += 1
+
+    def load(self):
+        # returns the last checkpoint, None if there is none yet
+        try:
+            with open(self.path, "rb") as f:
+                checkpoint = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, pickle.UnpicklingError, EOFError) as exc:
+            raise Exception(f"Cannot read checkpoint {self.path}: {exc}")
+        if checkpoint.get("version") != CHECKPOINT_VERSION:
+            raise Exception(f"Unsupported checkpoint {self.path}")
+        if checkpoint["identity"] != self.identity:
+            raise Exception(
+                f"Checkpoint {self.path} belongs to a different decode"
+            )
+        return checkpoint
+
+
+def restore_state(state: TraceState, checkpoint):
+    # puts back the trace processor fields saved by Checkpointer.save
+    for field, value in checkpoint["state"].items():
+        setattr(state, field, value)
+    state.return_stack.restore(checkpoint["return_stack"])
@@ -0,0 +1,278 @@
+# Copyright (C) 2025 ETH Zurich and University of Bologna
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# imports
+import json
+import struct
+import sys
+from array import array
+from enum import Enum
+
+from .instruction_logger import TraceSink
+
+from src.domain.enums import Ioptions
+from src.domain.trace_processor_model import TraceState
+
+# columnar files, laid out like Parquet without its dependencies:
+#   magic
+#   row group 0: column 0 values, column 1 values, ...
+#   row group 1: ...
+#   footer: JSON with the schema, the metadata and the byte ranges of
+#           every column chunk
+#   footer length (8 bytes, little endian), magic
+# the values of a column chunk are a little endian array of one of the
+# fixed size typecodes of the array module
+COLUMNAR_MAGIC = b"RVCOL1\0\0"
+COLUMNAR_VERSION = 1
+DEFAULT_ROW_GROUP_SIZE = 1 << 16  # rows
+TYPECODES = "bBhHiIqQ"
+
+# instruction id of a pc outside the instruction map
+NO_INSTRUCTION = 0xFFFFFFFF
+
+TRACE_SCHEMA = [
+    ("pc", "Q"),
+    ("packet", "Q"),  # index of the packet the pc was reconstructed from
+    ("timestamp", "Q"),  # of that packet
+    ("privilege", "b"),
+    ("instruction", "I"),  # index in the "instructions" metadata
+]
+
+# -1 marks a field the packet does not have
+PACKET_SCHEMA = [
+    ("packet", "Q"),
+    ("timestamp", "Q"),
+    ("format", "B"),
+    ("subformat", "b"),
+    ("address", "q"),  # delta addresses are negative when going back
+    ("branches", "b"),
+    ("branch_map", "q"),
+    ("branch", "b"),
+    ("notify", "b"),
+    ("updiscon", "b"),
+    ("irreport", "b"),
+    ("irdepth", "q"),  # 2 ** call_counter_size bits
+    ("privilege", "b"),
+    ("ecause", "q"),  # XLEN bits, as address and tval
+    ("interrupt", "b"),
+    ("thaddr", "b"),
+    ("tval", "q"),
+    ("qual_status", "b"),
+    ("ioptions", "h"),  # bit i set if option i of Ioptions is enabled
+]
+
+
+class ColumnarWriter:
+    # appends rows to a columnar file, a row group is written every
+    # row_group_size rows so that memory stays bounded
+    def __init__(
+        self,
+        output,
+        schema,
+        metadata=None,
+        row_group_size=DEFAULT_ROW_GROUP_SIZE,
+    ):
+        for name, typecode in schema:
+            if typecode not in TYPECODES:
+                raise ValueError(f"Unsupported type {typecode} for {name}")
+        self.output = output
+        self.schema = schema
+        self.metadata = metadata or {}
+        self.row_group_size = row_group_size
+        self.columns = [array(typecode) for _, typecode in schema]
+        self.row_groups = []
+        self.offset = len(COLUMNAR_MAGIC)
+        output.write(COLUMNAR_MAGIC)
+
+    def append(self, row):
+        for column, value in zip(self.columns, row):
+            column.append(value)
+        if len(self.columns[0]) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        # writes the buffered rows as a row group
+        rows = len(self.columns[0])
+        if not rows:
+            return
+        chunks = []
+        for i, column in enumerate(self.columns):
+            if sys.byteorder != "little":
+                column.byteswap()
+            data = column.tobytes()
+            self.output.write(data)
+            chunks.append([self.offset, len(data)])
+            self.offset += len(data)
+            self.columns[i] = array(column.typecode)
+        self.row_groups.append({"rows": rows, "columns": chunks})
+
+    def close(self):
+        self.flush()
+        footer = json.dumps(
+            {
+                "version": COLUMNAR_VERSION,
+                "schema": self.schema,
+                "metadata": self.metadata,
+                "row_groups": self.row_groups,
+            }
+        ).encode()
+        self.output.write(footer)
+        self.output.write(struct.pack("<Q", len(footer)))
+        self.output.write(COLUMNAR_MAGIC)
+        self.output.close()
+
+
+class ColumnarReader:
+    # reads the files of ColumnarWriter, one row group or column at a time
+    # columns are returned as arrays, e.g. numpy.frombuffer(column, "u8")
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        tail = len(COLUMNAR_MAGIC) + 8
+        self.file.seek(-tail, 2)
+        footer_len = struct.unpack("<Q", self.file.read(8))[0]
+        if self.file.read() != COLUMNAR_MAGIC:
+            raise ValueError(f"{path} is not a columnar file")
+        self.file.seek(-(tail + footer_len), 2)
+        footer = json.loads(self.file.read(footer_len))
+        if footer["version"] != COLUMNAR_VERSION:
+            raise ValueError(f"Unsupported columnar file version {path}")
+        self.schema = [tuple(field) for field in footer["schema"]]
+        self.metadata = footer["metadata"]
+        self.row_groups = footer["row_groups"]
+        self.names = [name for name, _ in self.schema]
+
+    @property
+    def num_rows(self):
+        return sum(group["rows"] for group in self.row_groups)
+
+    def read_row_group(self, index, columns=None):
+        # returns {name: array} with the selected columns of a row group
+        group = self.row_groups[index]
+        result = {}
+        for name in columns or self.names:
+            i = self.names.index(name)
+            offset, length = group["columns"][i]
+            self.file.seek(offset)
+            column = array(self.schema[i][1])
+            column.frombytes(self.file.read(length))
+            if sys.byteorder != "little":
+                column.byteswap()
+            result[name] = column
+        return result
+
+    def iter_row_groups(self, columns=None):
+        for index in range(len(self.row_groups)):
+            yield self.read_row_group(index, columns)
+
+    def read(self, columns=None):
+        # the selected columns of the whole file
+        result = {
+            name: array(self.schema[self.names.index(name)][1])
+            for name in columns or self.names
+        }
+        for group in self.iter_row_groups(columns):
+            for name, column in group.items():
+                result[name].extend(column)
+        return result
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _field(packet, name):
+    # numeric value of a packet field, -1 if the packet does not have it
+    value = getattr(packet, name, None)
+    if value is None:
+        return -1
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, str):
+        return int(value, 2) if value else 0  # bit strings
+    return int(value)
+
+
+def _signed64(value):
+    # full 64 bit fields, e.g. addresses, are stored as two's complement
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def packet_row(index, timestamp, packet):
+    # row of PACKET_SCHEMA for a parsed packet
+    ioptions = -1
+    if getattr(packet, "ioptions", None) is not None:
+        ioptions = 0
+        for option in Ioptions:
+            if packet.ioptions[option]:
+                ioptions |= 1 << option.value
+    return (
+        index,
+        timestamp,
+        packet.format,
+        getattr(packet, "subformat", -1),
+        _signed64(_field(packet, "address")),
+        _field(packet, "branches"),
+        _field(packet, "branch_map"),
+        _field(packet, "branch"),
+        _field(packet, "notify"),
+        _field(packet, "updiscon"),
+        _field(packet, "irreport"),
+        _signed64(_field(packet, "irdepth")),
+        _field(packet, "privilege"),
+        _signed64(_field(packet, "ecause")),
+        _field(packet, "interrupt"),
+        _field(packet, "thaddr"),
+        _signed64(_field(packet, "tval")),
+        _field(packet, "qual_status"),
+        ioptions,
+    )
+
+
+class ColumnarTraceSink(TraceSink):
+    # writes the reconstructed pcs as rows of TRACE_SCHEMA
+    # the instruction column indexes the "instructions" metadata, the
+    # disassembled instructions in ascending address order
+    def __init__(self, output, instruction_map, source_name=""):
+        addresses = sorted(instruction_map)
+        self.ids = {address: i for i, address in enumerate(addresses)}
+        metadata = {
+            "source": source_name,
+            "instructions": [
+                [address, *instruction_map[address]]
+                for address in addresses
+            ],
+        }
+        self.writer = ColumnarWriter(output, TRACE_SCHEMA, metadata)
+
+    def report(self, address, state: TraceState):
+        privilege = state.privilege
+        if isinstance(privilege, Enum):
+            privilege = privilege.value
+        self.writer.append(
+            (
+                address,
+                state.processed_packets,
+                state.timestamp,
+                privilege,
+                self.ids.get(address, NO_INSTRUCTION),
+            )
+        )
+
+    def close(self):
+        self.writer.close()
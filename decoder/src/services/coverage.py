@@ -0,0 +1,141 @@
+# Copyright (C) 2025 ETH Zurich and University of Bologna
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# imports
+import sys
+from bisect import bisect_left
+
+from .instruction_logger import TraceSink
+
+from src.domain.instruction_kind import (
+    BRANCH_MNEMONICS,
+    CONTROL_TRANSFER_MNEMONICS,
+    DIRECT_JUMP_MNEMONICS,
+)
+from src.domain.trace_processor_model import TraceState
+from src.domain.symbol_index import SymbolIndex
+
+# "0"/"1" bytes for int(..., 2), see CoverageSink.bitmap
+_BITS = bytes.maketrans(b"\x00\x01", b"01")
+
+
+def basic_blocks(addresses, instruction_map, symbols: SymbolIndex = None):
+    # returns the first instruction of each basic block, addresses must be
+    # sorted: a block starts at a function entry, at the target of a direct
+    # branch or jump, and after any instruction transferring control
+    leaders = set(addresses[:1])
+    if symbols is not None:
+        leaders.update(symbols.starts)
+    for i, address in enumerate(addresses):
+        mnemonic, op_str = instruction_map[address]
+        if mnemonic not in CONTROL_TRANSFER_MNEMONICS:
+            continue
+        if i + 1 < len(addresses):
+            leaders.add(addresses[i + 1])
+        if mnemonic in BRANCH_MNEMONICS or mnemonic in DIRECT_JUMP_MNEMONICS:
+            try:
+                leaders.add(address + int(op_str.split(", ")[-1], 0))
+            except ValueError:
+                pass  # register operand
+    return sorted(leaders & set(addresses))
+
+
+class CoverageSink(TraceSink):
+    # records which instructions were executed instead of the ordered trace
+    # every instruction of the map has a slot, in ascending address order,
+    # and the slot is flagged the first time its pc is reported
+    def __init__(
+        self,
+        output_path,
+        instruction_map,
+        lcov_path=None,
+        symbols: SymbolIndex = None,
+        source_name="",
+    ):
+        self.output_path = output_path
+        self.instruction_map = instruction_map
+        self.lcov_path = lcov_path
+        self.symbols = symbols
+        self.source_name = source_name
+        self.addresses = sorted(instruction_map)
+        self.slots = {address: i for i, address in enumerate(self.addresses)}
+        self.executed = bytearray(len(self.addresses))  # 1 byte per slot
+
+    def report(self, address, state: TraceState):
+        slot = self.slots.get(address)
+        if slot is not None:
+            self.executed[slot] = 1
+
+    def report_block(self, addresses, state: TraceState):
+        slots = self.slots
+        executed = self.executed
+        for address in addresses:
+            slot = slots.get(address)
+            if slot is not None:
+                executed[slot] = 1
+
+    def bitmap(self):
+        # packs the slots 8 per byte, slot i is bit i % 8 of byte i // 8
+        if not self.executed:
+            return b""
+        bits = bytes(self.executed).translate(_BITS)[::-1]
+        return int(bits, 2).to_bytes((len(bits) + 7) // 8, "little")
+
+    def lcov(self):
+        # lcov style summary: the functions of the compiled file and whether
+        # they ran, DA lines are the basic blocks keyed by their address
+        executed = self.executed
+        slots = self.slots
+        symbols = self.symbols or SymbolIndex([])
+        blocks = basic_blocks(self.addresses, self.instruction_map, symbols)
+        block_ends = blocks[1:] + [None]
+
+        lines = ["TN:", f"SF:{self.source_name}"]
+        functions = []  # (name, start, executed)
+        ran = []
+        for start, end in zip(blocks, block_ends):
+            first = slots[start]
+            last = slots[end] if end is not None else len(executed)
+            ran.append(any(executed[first:last]))
+        for start, end, name in zip(
+            symbols.starts, symbols.ends, symbols.names
+        ):
+            first = bisect_left(self.addresses, start)
+            last = bisect_left(self.addresses, end)
+            if first == last:
+                continue  # no disassembled instruction, e.g. data
+            functions.append((name, start, any(executed[first:last])))
+        for name, start, hit in functions:
+            lines.append(f"FN:{start},{name}")
+        for name, start, hit in functions:
+            lines.append(f"FNDA:{int(hit)},{name}")
+        lines.append(f"FNF:{len(functions)}")
+        lines.append(f"FNH:{sum(hit for _, _, hit in functions)}")
+        for start, hit in zip(blocks, ran):
+            lines.append(f"DA:{start},{int(hit)}")
+        lines.append(f"LF:{len(blocks)}")
+        lines.append(f"LH:{sum(ran)}")
+        lines.append("end_of_record")
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        if self.output_path == "-":
+            sys.stdout.buffer.write(self.bitmap())
+            sys.stdout.buffer.flush()
+        else:
+            with open(self.output_path, "wb") as f:
+                f.write(self.bitmap())
+        if self.lcov_path is not None:
+            with open(self.lcov_path, "w") as f:
+                f.write(self.lcov())
@@ -0,0 +1,152 @@
+# Copyright (C) 2025 ETH Zurich and University of Bologna
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# imports
+import json
+import sys
+
+from time import perf_counter
+
+
+class DecoderProfiler:
+    # collects per-stage wall time and call counts of the decoder
+    # the stages are instrumented by replacing the functions inside the
+    # decoder modules, so nothing is paid when the profiler is not created
+    def __init__(self):
+        self.stages = {}  # name -> [calls, total time, self time]
+        self.stacks = {}  # collapsed call stack -> self time
+        self.instructions_per_packet = {}  # instructions -> packets
+        self.instr_cache_misses = 0  # counted by get_instr
+        self.sections = {}  # extra statistics added to the report
+        self._stack = []  # active stages as [name, children time]
+        self._patched = []  # (module, attribute, original function)
+
+    def instrument(self, function, name=None):
+        # replaces `function` with a timed wrapper in every decoder module
+        name = name or function.__name__
+        wrapper = self._wrap(name, function)
+        for module in list(sys.modules.values()):
+            if not getattr(module, "__name__", "").startswith("src."):
+                continue
+            for attribute, value in list(vars(module).items()):
+                if value is function:
+                    setattr(module, attribute, wrapper)
+                    self._patched.append((module, attribute, function))
+        return wrapper
+
+    def restore(self):
+        # puts back the original functions
+        for module, attribute, function in reversed(self._patched):
+            setattr(module, attribute, function)
+        self._patched = []
+
+    def _wrap(self, name, function):
+        stages = self.stages
+        stacks = self.stacks
+        stack = self._stack
+
+        def wrapper(*args, **kwargs):
+            frame = [name, 0.0]
+            stack.append(frame)
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = perf_counter() - start
+                path = ";".join(f[0] for f in stack)
+                stack.pop()
+                if stack:
+                    stack[-1][1] += elapsed
+                own = elapsed - frame[1]
+                stage = stages.get(name)
+                if stage is None:
+                    stages[name] = [1, elapsed, own]
+                else:
+                    stage[0] += 1
+                    stage[1] += elapsed
+                    stage[2] += own
+                stacks[path] = stacks.get(path, 0.0) + own
+
+        wrapper.__wrapped__ = function
+        return wrapper
+
+    def calls(self, name):
+        # number of completed calls of a stage
+        stage = self.stages.get(name)
+        return stage[0] if stage else 0
+
+    def record_packet(self, instructions):
+        # stores how many instructions a packet reconstructed
+        self.instructions_per_packet[instructions] = (
+            self.instructions_per_packet.get(instructions, 0) + 1
+        )
+
+    def report(self):
+        # builds the report as a dictionary
+        stages = {
+            name: {
+                "calls": calls,
+                "total_s": total,
+                "self_s": own,
+                "mean_us": total / calls * 1e6 if calls else 0.0,
+            }
+            for name, (calls, total, own) in self.stages.items()
+        }
+        packets = sum(self.instructions_per_packet.values())
+        instructions = sum(
+            n * count for n, count in self.instructions_per_packet.items()
+        )
+        lookups = self.calls("get_instr")
+        misses = self.instr_cache_misses
+        return {
+            "stages": stages,
+            "packets": {
+                "processed": packets,
+                "instructions": instructions,
+                "instructions_per_packet_mean": (
+                    instructions / packets if packets else 0.0
+                ),
+                "instructions_per_packet_max": max(
+                    self.instructions_per_packet, default=0
+                ),
+                "instructions_per_packet_histogram": {
+                    str(n): count
+                    for n, count in sorted(self.instructions_per_packet.items())
+                },
+            },
+            "instr_cache": {
+                "lookups": lookups,
+                "hits": lookups - misses,
+                "misses": misses,
+                "hit_rate": (lookups - misses) / lookups if lookups else 0.0,
+            },
+            **self.sections,
+            "flamegraph": self.folded(),
+        }
+
+    def folded(self):
+        # collapsed stacks with self time in microseconds, the input format
+        # of flamegraph.pl and speedscope
+        return [
+            f"{path} {round(own * 1e6)}"
+            for path, own in sorted(self.stacks.items())
+        ]
+
+    def dump(self, path):
+        # writes the report, a .folded path gets only the collapsed stacks
+        with open(path, "w") as f:
+            if path.endswith(".folded"):
+                f.write("\n".join(self.folded()) + "\n")
+            else:
+                json.dump(self.report(), f, indent=2)
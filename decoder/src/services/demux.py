@@ -0,0 +1,88 @@
+# Copyright (C) 2025 ETH Zurich and University of Bologna
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# imports
+import io
+
+from src.domain.encoder_profile import EncoderProfile, DEFAULT_PROFILE
+
+SOURCE_PLACEHOLDER = "{source}"
+
+
+def source_table(profile: EncoderProfile = DEFAULT_PROFILE) -> bytes:
+    # maps a header byte to the source id of its frame, for bytes.translate
+    mask = (1 << profile.source_id_len) - 1
+    return bytes(
+        header >> profile.source_id_lsb & mask for header in range(256)
+    )
+
+
+def split_by_source(
+    block: bytes, table: bytes, frame_size: int
+) -> dict[int, bytes]:
+    # splits a block of whole frames into the frames of each source, in
+    # capture order; the header is the last byte of each frame
+    sources = block[frame_size - 1 :: frame_size].translate(table)
+    first = sources[:1]
+    if sources.count(first) == len(sources):
+        # a single source, the usual case for long stretches of a capture
+        return {first[0]: block} if block else {}
+    frames = {}
+    for index, source in enumerate(sources):
+        offset = index * frame_size
+        frames.setdefault(source, []).append(
+            block[offset : offset + frame_size]
+        )
+    return {source: b"".join(chunks) for source, chunks in frames.items()}
+
+
+def source_output_path(output_path: str, source: int) -> str:
+    # output of a source: the placeholder replaced by its id, or the id
+    # appended to the file name
+    if SOURCE_PLACEHOLDER in output_path:
+        return output_path.replace(SOURCE_PLACEHOLDER, str(source))
+    return f"{output_path}.{source}"
+
+
+class ConnectionReader(io.RawIOBase):
+    # binary stream of the frames a demultiplexer sends to the process of
+    # a source through a multiprocessing Connection, an empty message ends
+    # the stream
+    def __init__(self, connection):
+        self.connection = connection
+        self.buffer = b""
+        self.offset = 0
+        self.done = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while self.offset >= len(self.buffer):
+            if self.done:
+                return 0
+            self.buffer = self.connection.recv_bytes()
+            self.offset = 0
+            if not self.buffer:
+                self.done = True
+                return 0
+        size = min(len(b), len(self.buffer) - self.offset)
+        b[:size] = self.buffer[self.offset : self.offset + size]
+        self.offset += size
+        return size
+
+    def close(self):
+        if not self.closed:
+            self.connection.close()
+        super().close()
@@ -15,13 +15,34 @@
 # Author: Samuele Righi (samuele.righi@studio.unibo.it)
 
 # imports
-import yaml
-#
-from capstone import *
-from elftools.elf.elffile import ELFFile
+import hashlib
+import os
+import struct
+
+from .instruction_table import open_instruction_table, write_instruction_table
+
+# capstone, pyelftools and PyYAML are imported inside the functions using
+# them: a run served by the instruction map cache never loads them
+
+# bump when the layout of the cached instruction map changes
+CACHE_VERSION = 2
+# configuration shipped with the decoder, next to main.py
+DECODER_DIR = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+CONFIG_FILE = os.path.join(DECODER_DIR, "disassembler_config.yaml")
+
+
+def load_riscv_instructions(filename, sections, xlen=64):
+    from capstone import (
+        Cs,
+        CS_ARCH_RISCV,
+        CS_MODE_RISCV32,
+        CS_MODE_RISCV64,
+        CS_MODE_RISCVC,
+    )
+    from elftools.elf.elffile import ELFFile
 
-
-def load_riscv_instructions(filename, sections):
     # create a dictionary {PC: istruzione}
     with open(filename, "rb") as f:
         # create empty instruction map
@@ -29,10 +50,9 @@ def load_riscv_instructions(filename, sections):
 
         elf = ELFFile(f)
 
-        # capstone riscv init
-        md = Cs(CS_ARCH_RISCV, CS_MODE_RISCV64 | CS_MODE_RISCVC)
-        # for 32 bit sistems
-        # md = Cs(CS_ARCH_RISCV, CS_MODE_RISCV32 | CS_MODE_RISCVC)
+        # capstone riscv init, the mode follows the XLEN of the encoder
+        mode = CS_MODE_RISCV64 if xlen == 64 else CS_MODE_RISCV32
+        md = Cs(CS_ARCH_RISCV, mode | CS_MODE_RISCVC)
 
         for sec in sections['disassemble']['sections']:
             instruction_map = extract_section(elf, md, instruction_map, sec)
@@ -59,8 +79,10 @@ def extract_section(elf, md, instruction_map, section_name):
     return instruction_map
 
 
-def get_sections():
-    with open("disassembler_config.yaml") as stream:
+def get_sections(config_path=CONFIG_FILE):
+    import yaml
+
+    with open(config_path) as stream:
         try:
             sections = yaml.safe_load(stream)
         except yaml.YAMLError as exc:
@@ -68,6 +90,76 @@ def get_sections():
     return sections
 
 
-def get_instruction_map(filename):
-    return load_riscv_instructions(filename, get_sections())
+def default_cache_dir():
+    # per-user cache directory following the XDG convention
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "rv_tracer_decoder")
+
+
+def _cache_key(filename, config_path, xlen):
+    # the map depends on the ELF content, on the sections to disassemble and
+    # on XLEN, the raw config is hashed so that a hit does not need to parse it
+    digest = hashlib.sha256(f"v{CACHE_VERSION}-rv{xlen}".encode())
+    for path in (filename, config_path):
+        with open(path, "rb") as f:
+            while block := f.read(1 << 20):
+                digest.update(block)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def get_instruction_map(
+    filename, config_path=CONFIG_FILE, cache_dir=None, xlen=64
+):
+    # disassembles the ELF, or maps the table stored by a previous run
+    # cached maps are InstructionTable views of the cache file, shared by
+    # all the processes decoding the same binary
+    if cache_dir is None:
+        return load_riscv_instructions(
+            filename, get_sections(config_path), xlen
+        )
+
+    cache_path = os.path.join(
+        cache_dir, _cache_key(filename, config_path, xlen) + ".table"
+    )
+    try:
+        return open_instruction_table(cache_path)
+    except (OSError, ValueError, struct.error):
+        pass  # cache miss or unreadable entry: disassemble again
+
+    instruction_map = load_riscv_instructions(
+        filename, get_sections(config_path), xlen
+    )
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        write_instruction_table(instruction_map, cache_path)
+        return open_instruction_table(cache_path)
+    except OSError:
+        pass  # the cache is an optimization, decoding goes on without it
+    return instruction_map
+
+
+def load_symbols(filename):
+    # returns the (start, size, name) of the functions and code labels
+    from elftools.elf.elffile import ELFFile
 
+    symbols = []
+    with open(filename, "rb") as f:
+        symtab = ELFFile(f).get_section_by_name(".symtab")
+        if symtab is None:
+            return symbols  # stripped binary
+        for symbol in symtab.iter_symbols():
+            kind = symbol["st_info"]["type"]
+            if symbol["st_shndx"] == "SHN_UNDEF" or not symbol.name:
+                continue
+            # $x/$d are mapping symbols, .L local labels of the assembler
+            if kind == "STT_FUNC" or (
+                kind == "STT_NOTYPE"
+                and not symbol.name.startswith(("$", ".L"))
+            ):
+                symbols.append(
+                    (symbol["st_value"], symbol["st_size"], symbol.name)
+                )
+    return symbols
@@ -0,0 +1,88 @@
+# Copyright (C) 2025 ETH Zurich and University of Bologna
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# imports
+import re
+
+from src.domain.encoder_profile import EncoderProfile
+
+# te_pkg.sv localparams mapped to the profile fields
+TE_PKG_PARAMETERS = {
+    "PRIV_LEN": "priv_len",
+    "CALL_COUNTER_SIZE": "call_counter_size",
+    "RETURN_STACK_SIZE": "return_stack_size",
+}
+
+
+def load_encoder_profile(path):
+    # loads the encoder parameters from a YAML file or from te_pkg.sv
+    if path.endswith(".sv") or path.endswith(".svh"):
+        return parse_te_pkg(path)
+    return load_profile_yaml(path)
+
+
+def load_profile_yaml(path):
+    import yaml
+
+    with open(path) as stream:
+        try:
+            config = yaml.safe_load(stream) or {}
+        except yaml.YAMLError as exc:
+            raise Exception(f"Error while loading YAML file: {exc}")
+    parameters = config.get("encoder", config)
+    try:
+        return EncoderProfile(**parameters)
+    except TypeError as exc:
+        raise Exception(f"Invalid encoder profile {path}: {exc}")
+
+
+def _sv_value(literal):
+    # converts a SystemVerilog integer literal: 64, '0, '1, 8'h1f, 4'b1010
+    literal = literal.strip().replace("_", "")
+    if literal in ("'0", "'1"):
+        return int(literal[1])
+    match = re.fullmatch(r"(?:\d+)?'([sS])?([bBoOdDhH])([0-9a-fA-F]+)", literal)
+    if match:
+        base = {"b": 2, "o": 8, "d": 10, "h": 16}[match.group(2).lower()]
+        return int(match.group(3), base)
+    return int(literal, 0)
+
+
+def parse_te_pkg(path):
+    # reads the parameters from the package of the RTL encoder, following
+    # the `define TE_ARCH64 switch to select the XLEN branch
+    with open(path) as f:
+        source = f.read()
+    # drops comments so that a commented `define does not count
+    source = re.sub(r"/\*.*?\*/", "", source, flags=re.S)
+    source = re.sub(r"//[^\n]*", "", source)
+
+    arch64 = re.search(r"`define\s+TE_ARCH64\b", source) is not None
+    # keeps the branch of `ifdef TE_ARCH64 that is active
+    source = re.sub(
+        r"`ifdef\s+TE_ARCH64(.*?)`else(.*?)`endif",
+        lambda m: m.group(1) if arch64 else m.group(2),
+        source,
+        flags=re.S,
+    )
+
+    parameters = {}
+    for name, value in re.findall(
+        r"localparam\s+(\w+)\s*=\s*([^;]+);", source
+    ):
+        if name == "XLEN":
+            parameters["xlen"] = _sv_value(value)
+        elif name in TE_PKG_PARAMETERS:
+            parameters[TE_PKG_PARAMETERS[name]] = _sv_value(value)
+    return EncoderProfile(**parameters)
@@ -0,0 +1,87 @@
+# Copyright (C) 2025 ETH Zurich and University of Bologna
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# imports
+import re
+import sys
+
+from collections import Counter
+
+from src.domain.const import CHUNK_SIZE
+
+# addresses and counts are left out of the kind of an error
+_NUMBER = re.compile(r"0x[0-9a-fA-F]+|\d+")
+
+
+class ErrorLog:
+    # errors met by a decode in recovery mode: each one is reported with
+    # its packet when it happens, then the decode skips to the next sync
+    # packet; summary() gathers them by kind at the end
+    def __init__(self, output=sys.stderr, frame_size=CHUNK_SIZE):
+        self.output = output
+        self.frame_size = frame_size
+        self.kinds = Counter()  # kind of error -> occurrences
+        self.first_packet = {}  # kind of error -> packet of the first one
+        self.errors = 0
+        self.skipped_packets = 0  # packets dropped waiting for a sync
+        self.ended_traces = 0  # ends of the traced program
+        self.resyncing = False
+
+    def record(self, index, error):
+        kind = f"{type(error).__name__}: {_NUMBER.sub('N', str(error))}"
+        self.kinds[kind] += 1
+        self.first_packet.setdefault(kind, index)
+        self.errors += 1
+        self.resyncing = True
+        self.output.write(
+            f"packet {index} (offset {index * self.frame_size:#x}): "
+            f"{type(error).__name__}: {error}\n"
+        )
+
+    def end_trace(self, index):
+        # the program ended, another trace may follow in the capture
+        self.ended_traces += 1
+        self.resyncing = True
+
+    def skip(self):
+        if self.resyncing:
+            self.skipped_packets += 1
+
+    def resynced(self):
+        self.resyncing = False
+
+    def summary(self) -> dict:
+        return {
+            "errors": self.errors,
+            "skipped_packets": self.skipped_packets,
+            "ended_traces": self.ended_traces,
+            "kinds": {
+                kind: {
+                    "count": count,
+                    "first_packet": self.first_packet[kind],
+                }
+                for kind, count in self.kinds.most_common()
+            },
+        }
+
+    def write_summary(self):
+        self.output.write(
+            f"{self.errors} errors, {self.skipped_packets} packets skipped "
+            f"to resync, {self.ended_traces} traces ended\n"
+        )
+        for kind, count in self.kinds.most_common():
+            self.output.write(
+                f"  {count:>8}  {kind} (first at packet "
+                f"{self.first_packet[kind]})\n"
+            )
@@ -0,0 +1,257 @@
+# Copyright (C) 2025 ETH Zurich and University of Bologna
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# imports
+from .instruction_logger import TraceSink
+
+from src.domain.instruction_kind import jump_kind, OTHER, CALL, RETURN
+from src.domain.trace_processor_model import TraceState
+from src.domain.symbol_index import SymbolIndex
+
+UNKNOWN_FUNCTION = "??"
+
+
+class FunctionProfileSink(TraceSink):
+    # aggregates the reconstructed pcs per function instead of writing them:
+    # instructions executed in the function (exclusive), instructions
+    # executed while it was on the call stack (inclusive) and calls
+    # the function of the last pc is cached with its interval, so only a
+    # change of function needs a lookup in the symbol index
+    # the call stack is rebuilt from the instruction preceding each change
+    # of function, so the inclusive counts are estimates: tail calls replace
+    # the caller and returns unwind to the function they land in
+    def __init__(self, output, instruction_map, symbols: SymbolIndex):
+        self.output = output
+        self.instruction_map = instruction_map
+        self.symbols = symbols
+        # the last slot collects the pcs outside every symbol
+        slots = len(symbols) + 1
+        self.unknown = len(symbols)
+        self.instructions = [0] * slots
+        self.inclusive = [0] * slots
+        self.calls = [0] * slots
+        self.kinds = {}  # address -> CALL, RETURN or OTHER
+        self.total = 0
+        self.previous = None  # last pc reported
+        # interval of the current function, empty before the first pc
+        self.current = self.unknown
+        self.start = 0
+        self.end = 0
+        self.stack = []  # [function, total when it was entered]
+        self.depth = [0] * slots  # frames of each function on the stack
+        self.max_depth = 0
+
+    def report(self, address, state: TraceState):
+        # the function entry is excluded to see recursive calls
+        if self.start < address < self.end:
+            self.instructions[self.current] += 1
+            self.total += 1
+            self.previous = address
+            return
+        self._enter(address)
+
+    def report_block(self, addresses, state: TraceState):
+        for address in addresses:
+            self.report(address, state)
+
+    def _kind(self, address):
+        kind = self.kinds.get(address)
+        if kind is None:
+            kind = OTHER
+            if address in self.instruction_map:
+                kind = jump_kind(*self.instruction_map[address])
+            self.kinds[address] = kind
+        return kind
+
+    def _enter(self, address):
+        function, start, end = self.symbols.interval(address)
+        if function < 0:
+            function = self.unknown
+        kind = OTHER
+        if self.previous is not None:
+            kind = self._kind(self.previous)
+
+        if function != self.current or (address == start and kind == CALL):
+            if address == start and kind == CALL:
+                self._call(function)
+                self._push(function)
+            elif kind == RETURN:
+                self._unwind(function)
+            else:
+                if address == start and self.previous is not None:
+                    self._call(function)  # tail call
+                if self.stack:
+                    self._pop()
+                self._push(function)
+
+        self.current, self.start, self.end = function, start, end
+        self.instructions[function] += 1
+        self.total += 1
+        self.previous = address
+
+    def _call(self, function):
+        # the caller is self.current, the function of the previous pc
+        self.calls[function] += 1
+
+    def _push(self, function):
+        self.stack.append((function, self.total))
+        self.depth[function] += 1
+        if len(self.stack) > self.max_depth:
+            self.max_depth = len(self.stack)
+
+    def _pop(self):
+        function, entered = self.stack.pop()
+        self.depth[function] -= 1
+        # recursive frames are counted once, by the outermost one
+        if not self.depth[function]:
+            self.inclusive[function] += self.total - entered
+
+    def _unwind(self, function):
+        # returns to the most recent frame of function, or starts a new
+        # root if it is not on the stack, e.g. at the start of the trace
+        if not self.depth[function]:
+            while self.stack:
+                self._pop()
+            self._push(function)
+            return
+        while self.stack[-1][0] != function:
+            self._pop()
+
+    def function_name(self, function):
+        if function == self.unknown:
+            return UNKNOWN_FUNCTION
+        return self.symbols.names[function]
+
+    def rows(self):
+        # (function, start, calls, exclusive, inclusive) of every function
+        # that ran, sorted by exclusive instructions
+        while self.stack:
+            self._pop()
+        rows = []
+        for function, instructions in enumerate(self.instructions):
+            if not instructions:
+                continue
+            start = None
+            if function != self.unknown:
+                start = self.symbols.starts[function]
+            rows.append(
+                (
+                    self.function_name(function),
+                    start,
+                    self.calls[function],
+                    instructions,
+                    self.inclusive[function],
+                )
+            )
+        rows.sort(key=lambda row: (-row[3], row[0]))
+        return rows
+
+    def close(self):
+        # tab separated, one function per line
+        total = self.total or 1
+        self.output.write(
+            "function\taddress\tcalls\tinstructions\tpercent\tinclusive\n"
+        )
+        for name, start, calls, instructions, inclusive in self.rows():
+            address = hex(start) if start is not None else "-"
+            self.output.write(
+                f"{name}\t{address}\t{calls}\t{instructions}\t"
+                f"{100 * instructions / total:.2f}\t{inclusive}\n"
+            )
+        self.output.close()
+
+
+class SampledFunctionProfileSink(FunctionProfileSink):
+    # function profile of a sampled decode, see services/sampling.py: only
+    # some resync segments are reconstructed, each from its sync packet,
+    # and the counts of the whole capture are extrapolated from theirs
+    # end_segment() is called after every sampled segment; the per segment
+    # instructions give the variance of the estimates, as for a simple
+    # random sample of the segments
+    def __init__(self, output, instruction_map, symbols: SymbolIndex):
+        super().__init__(output, instruction_map, symbols)
+        slots = len(self.instructions)
+        self.squares = [0] * slots  # sums of the squared segment counts
+        self.before = [0] * slots  # counts at the end of the last segment
+        self.sampled = 0
+        self.segments = 0  # segments in the capture, set at the end
+
+    def end_segment(self, continued=False):
+        # unless continued, the next segment is reconstructed on its own
+        # and the calls in progress end here
+        if not continued:
+            while self.stack:
+                self._pop()
+            self.previous = None
+            self.current = self.unknown
+            self.start = 0
+            self.end = 0
+        squares = self.squares
+        before = self.before
+        for function, count in enumerate(self.instructions):
+            delta = count - before[function]
+            if delta:
+                squares[function] += delta * delta
+                before[function] = count
+        self.sampled += 1
+
+    def estimate(self, total, squares):
+        # (estimate, half width of its 95% confidence interval) of the
+        # total over all the segments from the sum and the sum of the
+        # squares over the sampled ones
+        n = self.sampled
+        if not n:
+            return 0, 0.0
+        scale = self.segments / n
+        if n < 2:
+            return total * scale, 0.0
+        mean = total / n
+        variance = max(squares - n * mean * mean, 0) / (n - 1)
+        # finite population correction, nothing to estimate when all the
+        # segments were sampled
+        fraction = min(n / self.segments, 1.0)
+        error = self.segments * (variance * (1 - fraction) / n) ** 0.5
+        return total * scale, 1.96 * error
+
+    def close(self):
+        # tab separated, one function per line, the counts are estimates
+        # and instructions_ci95 the half width of the confidence interval
+        rows = self.rows()
+        scale = self.segments / self.sampled if self.sampled else 0
+        estimates = {}
+        total = 0
+        for row in rows:
+            function = self._slot(row[0], row[1])
+            estimates[row[0]] = self.estimate(row[3], self.squares[function])
+            total += estimates[row[0]][0]
+        total = total or 1
+        self.output.write(
+            "function\taddress\tcalls\tinstructions\tinstructions_ci95\t"
+            "percent\tinclusive\n"
+        )
+        for name, start, calls, _, inclusive in rows:
+            address = hex(start) if start is not None else "-"
+            instructions, error = estimates[name]
+            self.output.write(
+                f"{name}\t{address}\t{round(calls * scale)}\t"
+                f"{round(instructions)}\t{round(error)}\t"
+                f"{100 * instructions / total:.2f}\t"
+                f"{round(inclusive * scale)}\n"
+            )
+        self.output.close()
+
+    def _slot(self, name, start):
+        if start is None:
+            return self.unknown
+        return self.symbols.find(start)
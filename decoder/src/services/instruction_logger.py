@@ -14,13 +14,105 @@
 
 # Author: Samuele Righi (samuele.righi@studio.unibo.it)
 
+# imports
+import sys
+
 from src.domain.trace_processor_model import TraceState
 
+OUTPUT_BUFFER_SIZE = 1 << 20  # bytes
 
-def log_instruction(address, state: TraceState):
 
-    # Get the instruction details
-    mnemonic, op_str = state.instruction_map[address]
+def open_output(path, offset=None):
+    # opens the trace output, "-" stands for the standard output
+    # with an offset an existing trace is truncated there and continued
+    if offset is not None:
+        output = open(path, "r+", buffering=OUTPUT_BUFFER_SIZE)
+        if output.seek(0, 2) < offset:
+            output.close()
+            raise Exception(f"{path} is shorter than at the checkpoint")
+        output.seek(offset)
+        output.truncate()
+        return output
+    if path == "-":
+        return open(
+            sys.stdout.fileno(),
+            "w",
+            buffering=OUTPUT_BUFFER_SIZE,
+            closefd=False,
+        )
+    return open(path, "w", buffering=OUTPUT_BUFFER_SIZE)
+
+
+def open_binary_output(path):
+    # binary counterpart of open_output
+    if path == "-":
+        return open(
+            sys.stdout.fileno(),
+            "wb",
+            buffering=OUTPUT_BUFFER_SIZE,
+            closefd=False,
+        )
+    return open(path, "wb", buffering=OUTPUT_BUFFER_SIZE)
+
+
+class TraceSink:
+    # receives the pcs reconstructed by the trace processor
+    def report(self, address, state: TraceState):
+        raise NotImplementedError
+
+    def report_block(self, addresses, state: TraceState):
+        for address in addresses:
+            self.report(address, state)
+
+    def position(self):
+        # flushes the output and returns where the next pc will be written
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class TextTraceSink(TraceSink):
+    # writes the trace as text, one instruction per line
+    # formats: "text" -> pc mnemonic operands, "pc" -> pc only
+    def __init__(self, output, fmt="text"):
+        self.output = output
+        self.fmt = fmt
+        self.lines = {}  # address -> formatted line
+
+    def report(self, address, state: TraceState):
+        line = self.lines.get(address)
+        if line is None:
+            line = self._format(address, state)
+        self.output.write(line)
+
+    def report_block(self, addresses, state: TraceState):
+        lines = self.lines
+        self.output.write(
+            "".join(
+                lines.get(address) or self._format(address, state)
+                for address in addresses
+            )
+        )
+
+    def _format(self, address, state: TraceState):
+        if self.fmt == "pc":
+            line = f"{hex(address)}\n"
+        else:
+            # Get the instruction details
+            mnemonic, op_str = state.instruction_map[address]
+            line = f"{hex(address)} {mnemonic} {op_str}\n"
+        self.lines[address] = line
+        return line
+
+    def position(self):
+        self.output.flush()
+        return self.output.tell()
+
+    def close(self):
+        self.output.close()
+
+
+def log_instruction(address, state: TraceState):
     # Log the instruction
-    with open("execution_trace", "a") as f:
-        f.write(f"{hex(address)} {mnemonic} {op_str}\n")
+    state.sink.report(address, state)
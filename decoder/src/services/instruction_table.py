@@ -0,0 +1,123 @@
+# Copyright (C) 2025 ETH Zurich and University of Bologna
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# imports
+import mmap
+import os
+import struct
+import sys
+
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+
+# layout of an instruction table, in native byte order:
+#   header      magic, instructions, bytes of the strings
+#   addresses   sorted, 8 bytes each
+#   offsets     of the text of each instruction in the strings, 4 bytes
+#               each, one more than the instructions
+#   strings     "mnemonic\0operands" of each instruction, UTF-8
+TABLE_MAGIC = b"RVITAB1" + (b"<" if sys.byteorder == "little" else b">")
+_HEADER = struct.Struct("=8sQQ")
+
+
+def pack_instruction_map(instruction_map) -> bytes:
+    # flattens an {address: (mnemonic, operands)} map into a table
+    addresses = array("Q", sorted(instruction_map))
+    offsets = array("I", [0])
+    strings = bytearray()
+    for address in addresses:
+        mnemonic, op_str = instruction_map[address]
+        strings += f"{mnemonic}\0{op_str}".encode()
+        offsets.append(len(strings))
+    return b"".join(
+        (
+            _HEADER.pack(TABLE_MAGIC, len(addresses), len(strings)),
+            addresses.tobytes(),
+            offsets.tobytes(),
+            strings,
+        )
+    )
+
+
+def write_instruction_table(instruction_map, path):
+    # written aside and renamed, readers never see half a table
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(pack_instruction_map(instruction_map))
+    os.replace(tmp_path, path)
+
+
+def open_instruction_table(path):
+    # maps a table file read-only: the processes opening the same file
+    # share its pages, nothing is copied nor unpickled
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return InstructionTable(buffer, path)
+
+
+class InstructionTable(Mapping):
+    # read-only {address: (mnemonic, operands)} view over a packed table,
+    # a drop-in for the dict of load_riscv_instructions
+    # addresses are found by bisection on the flat array, the entries
+    # looked up are decoded once and kept, so a process only holds the
+    # instructions it actually executes
+    def __init__(self, buffer, path=None):
+        magic, instructions, strings_len = _HEADER.unpack_from(buffer)
+        if magic != TABLE_MAGIC:
+            raise ValueError("Not an instruction table")
+        self.buffer = buffer
+        self.path = path  # file of the table, None if it is in memory
+        view = memoryview(buffer)
+        start = _HEADER.size
+        end = start + 8 * instructions
+        self.addresses = view[start:end].cast("Q")
+        start, end = end, end + 4 * (instructions + 1)
+        self.offsets = view[start:end].cast("I")
+        self.strings = view[end : end + strings_len]
+        self.decoded = {}  # address -> (mnemonic, operands)
+
+    def _index(self, address):
+        index = bisect_left(self.addresses, address)
+        if index < len(self.addresses) and self.addresses[index] == address:
+            return index
+        return -1
+
+    def __getitem__(self, address):
+        entry = self.decoded.get(address)
+        if entry is not None:
+            return entry
+        index = self._index(address)
+        if index < 0:
+            raise KeyError(address)
+        text = self.strings[self.offsets[index] : self.offsets[index + 1]]
+        mnemonic, op_str = bytes(text).decode().split("\0", 1)
+        entry = self.decoded[address] = (mnemonic, op_str)
+        return entry
+
+    def __contains__(self, address):
+        return address in self.decoded or self._index(address) >= 0
+
+    def __iter__(self):
+        # in ascending address order
+        return iter(self.addresses)
+
+    def __len__(self):
+        return len(self.addresses)
+
+    def __reduce__(self):
+        # a table sent to another process is mapped again from its file
+        if self.path is not None:
+            return open_instruction_table, (self.path,)
+        return InstructionTable, (bytes(self.buffer),)
@@ -15,16 +15,34 @@
 # Author: Umberto Laghi (umberto.laghi2@unibo.it)
 
 # imports
+import os
+import re
+
+from collections import OrderedDict, deque
+
+from .capture_reader import open_capture, is_compressed
+
 from src.domain.packet_format import *
 
 from src.domain.enums import *
 from src.domain.const import *
+from src.domain.encoder_profile import EncoderProfile, DEFAULT_PROFILE
+from src.domain.packet_parser_model import ParserContext
+from src.domain.errors import PacketError
 
-current_ioptions = Ioptions.DELTA_ADDRESS  # default start value
+_MISSING = object()
+_worker_cache = None  # packet cache of a parsing process
+# raised by the fields of a corrupted frame: bits that are not binary
+# digits, or a payload too short for its format
+FRAME_ERRORS = (ValueError, IndexError)
+# last payload byte of a support packet: format 3, subformat 3
+SUPPORT_PACKET_BYTE = re.compile(
+    b"[" + re.escape(bytes(range(0x0F, 0x100, 0x10))) + b"]"
+)
 
 
 # utils functions
-def _convert_line(chunk: bytes) -> str:
+def convert_line(chunk: bytes) -> str:
     """converts line from bytes to characters"""
     packet_bits = ""
     for byte in chunk:
@@ -33,18 +51,7 @@ def _convert_line(chunk: bytes) -> str:
     return packet_bits
 
 
-def _extract_payload(packet_bits: str) -> str:
-    """extracts the payload from the encapsulated packet"""
-    # splits the packet_bits string into the sections
-    header = packet_bits[312:]
-    timestamp = packet_bits[248:312]
-    packet_len = int(header[-5:], 2)  # from header extracts the payload length
-    return packet_bits[
-        248 - packet_len * 8 : 248
-    ]  # packet_len is multiplied by 8 to get the bits
-
-
-def _find_address_len(
+def find_address_len(
     payload_len: int, known_fields_len: int
 ) -> tuple[int, int]:
     """determines the length of address within a packet"""
@@ -69,7 +76,7 @@ def _round_up(n: int) -> int:
     return ((n + 7) // 8) * 8
 
 
-def _find_branch_map_len(branches: int) -> int:
+def find_branch_map_len(branches: int) -> int:
     """determines the branch map length"""
     match branches:
         case _ if branches == 0:
@@ -163,7 +170,9 @@ def _parse_modes(bit_string: str) -> dict:
 
 
 # parsing functions
-def _parse_format3_subformat3(payload: str) -> Packet:
+def _parse_format3_subformat3(
+    payload: str, context: ParserContext
+) -> Packet:
     """parses a string into a format 3 subformat 3 packet"""
 
     # fields to parse:
@@ -202,13 +211,16 @@ def _parse_format3_subformat3(payload: str) -> Packet:
     )
 
     # sets the ioptions as the one just read
-    current_ioptions = packet.getIoptions()
+    context.set_ioptions(packet.getIoptions())
 
     return packet
 
 
-def _parse_format3_subformat2(payload: str) -> Packet:
+def _parse_format3_subformat2(
+    payload: str, context: ParserContext
+) -> Packet:
     """parses a string into a format 3 subformat 2 packet"""
+    profile = context.profile
 
     # fields to parse:
     # format      2
@@ -223,7 +235,10 @@ def _parse_format3_subformat2(payload: str) -> Packet:
     # sets attributes
     packet.setPrivilege(
         Privilege(
-            int(payload[-(current_index + PRIV_LEN) : -current_index], 2)
+            int(
+                payload[-(current_index + profile.priv_len) : -current_index],
+                2,
+            )
         )
     )
     # TODO: setTime(), setContext
@@ -231,8 +246,11 @@ def _parse_format3_subformat2(payload: str) -> Packet:
     return packet
 
 
-def _parse_format3_subformat1(payload: str) -> Packet:
+def _parse_format3_subformat1(
+    payload: str, context: ParserContext
+) -> Packet:
     """parses a string into a format 3 subformat 1 packet"""
+    profile = context.profile
 
     # fields to parse:
     # format      2
@@ -249,17 +267,17 @@ def _parse_format3_subformat1(payload: str) -> Packet:
 
     # computes the compressed address length
     payload_len = len(payload)
-    known_fields_len = 7 + PRIV_LEN + 2 * XLEN
+    known_fields_len = profile.f3sf1_known_fields_len
     # adds time and/or context length
-    if NO_TIME == 0:
+    if profile.no_time == 0:
         # TODO:
         # increase known_fields_length of time len
         pass
-    if NO_CONTEXT == 0:
+    if profile.no_context == 0:
         # TODO:
         # increase known_fields_length of context len
         pass
-    address_len, padding_len = _find_address_len(payload_len, known_fields_len)
+    address_len, padding_len = find_address_len(payload_len, known_fields_len)
 
     current_index = 4
     packet = Format3Subformat1()
@@ -269,24 +287,27 @@ def _parse_format3_subformat1(payload: str) -> Packet:
     current_index += 1
     packet.setPrivilege(
         Privilege(
-            int(payload[-(current_index + PRIV_LEN) : -current_index], 2)
+            int(
+                payload[-(current_index + profile.priv_len) : -current_index],
+                2,
+            )
         )
     )
     # checks if time and context are enabled and save them
-    current_index += PRIV_LEN
-    if NO_TIME == 0:
+    current_index += profile.priv_len
+    if profile.no_time == 0:
         # TODO:
         # read and set time
         # update current_index
         pass
-    if NO_CONTEXT == 0:
+    if profile.no_context == 0:
         # TODO:
         # read and set context
         # update current_index
         pass
-    ecause = payload[-(current_index + XLEN) : -(current_index)]
+    ecause = payload[-(current_index + profile.xlen) : -(current_index)]
     packet.setEcause(int(ecause, 2))
-    current_index += XLEN
+    current_index += profile.xlen
     packet.setInterrupt(int(payload[-(current_index + 1) : -current_index]))
     current_index += 1
     packet.setThaddr(int(payload[-(current_index + 1) : -current_index], 2))
@@ -296,14 +317,22 @@ def _parse_format3_subformat1(payload: str) -> Packet:
     )
     current_index += address_len
     packet.setTval(
-        int(payload[-(current_index + XLEN - padding_len) : -current_index], 2)
+        int(
+            payload[
+                -(current_index + profile.xlen - padding_len) : -current_index
+            ],
+            2,
+        )
     )
 
     return packet
 
 
-def _parse_format3_subformat0(payload: str) -> Packet:
+def _parse_format3_subformat0(
+    payload: str, context: ParserContext
+) -> Packet:
     """parses a string into a format 3 subformat 0 packet"""
+    profile = context.profile
 
     # fields to parse:
     # format      2
@@ -319,17 +348,17 @@ def _parse_format3_subformat0(payload: str) -> Packet:
 
     # computing the compressed address length
     payload_len = len(payload)
-    known_fields_len = 5 + PRIV_LEN
+    known_fields_len = profile.f3sf0_known_fields_len
     # adds time and/or context length
-    if NO_TIME == 0:
+    if profile.no_time == 0:
         # TODO
         # increases known_fields_length
         pass
-    if NO_CONTEXT == 0:
+    if profile.no_context == 0:
         # TODO
         # increases known_fields_length
         pass
-    address_len, padding_len = _find_address_len(payload_len, known_fields_len)
+    address_len, padding_len = find_address_len(payload_len, known_fields_len)
 
     current_index = 4  # starts from 4 because the format and subformat are
     packet = Format3Subformat0()
@@ -339,17 +368,20 @@ def _parse_format3_subformat0(payload: str) -> Packet:
     current_index += 1  # update current_index
     packet.setPrivilege(
         Privilege(
-            int(payload[-(current_index + PRIV_LEN) : -current_index], 2)
+            int(
+                payload[-(current_index + profile.priv_len) : -current_index],
+                2,
+            )
         )
     )
-    current_index += PRIV_LEN
+    current_index += profile.priv_len
     # checks if time and context are enabled and save them
-    if NO_TIME == 0:
+    if profile.no_time == 0:
         # TODO:
         # read and set time
         # update current_index
         pass
-    if NO_CONTEXT == 0:
+    if profile.no_context == 0:
         # TODO:
         # read and set context
         # update current_index
@@ -361,8 +393,9 @@ def _parse_format3_subformat0(payload: str) -> Packet:
     return packet
 
 
-def _parse_format2(payload: str):
+def _parse_format2(payload: str, context: ParserContext):
     """parses a string into a format 2 packet"""
+    profile = context.profile
 
     # fields to parse:
     # format      2
@@ -377,34 +410,35 @@ def _parse_format2(payload: str):
 
     # sets attributes
     # checks if delta address is enabled
-    if current_ioptions == Ioptions.DELTA_ADDRESS:
+    if not context.full_address:
         # computing the compressed address length
         payload_len = len(payload)
-        known_fields_len = 5 + 2**CALL_COUNTER_SIZE
+        known_fields_len = profile.f2_known_fields_len
         # adds time and/or context length
-        if NO_TIME == 0:
+        if profile.no_time == 0:
             # TODO
             # increases known_fields_length
             pass
-        if NO_CONTEXT == 0:
+        if profile.no_context == 0:
             # TODO
             # increases known_fields_length
             pass
-        address_len, padding_len = _find_address_len(
+        address_len, padding_len = find_address_len(
             payload_len, known_fields_len
         )
 
         extendedAddr = _extend_with_sign(
-            payload[-(current_index + address_len) : -current_index], XLEN + 1
+            payload[-(current_index + address_len) : -current_index],
+            profile.delta_address_len,
         )
         twoCompAddr = _twos_complement(extendedAddr)
         packet.setAddress(twoCompAddr)
         current_index += address_len
     else:
         packet.setAddress(
-            int(payload[-(current_index + XLEN) : -current_index], 2)
+            int(payload[-(current_index + profile.xlen) : -current_index], 2)
         )
-        current_index += XLEN
+        current_index += profile.xlen
 
     packet.setNotify(int(payload[-(current_index + 1) : -(current_index)], 2))
     current_index += 1
@@ -414,7 +448,7 @@ def _parse_format2(payload: str):
     current_index += 1
     packet.setIrdepth(
         int(
-            payload[-(current_index + 2**CALL_COUNTER_SIZE) : -current_index],
+            payload[-(current_index + profile.irdepth_len) : -current_index],
             2,
         )
     )
@@ -422,8 +456,9 @@ def _parse_format2(payload: str):
     return packet
 
 
-def _parse_format1(payload: str):
+def _parse_format1(payload: str, context: ParserContext):
     """parses a string into a format 2 packet"""
+    profile = context.profile
 
     # fields to parse:
     # 1st type payload:
@@ -460,7 +495,7 @@ def _parse_format1(payload: str):
     packet.setBranches(branches)
     current_index += 5
     # compute the part of branch_map put inside payload
-    branch_map_len = _find_branch_map_len(branches)
+    branch_map_len = find_branch_map_len(branches)
     packet.setBranchMap(
         payload[-(current_index + branch_map_len) : -current_index]
     )
@@ -472,35 +507,40 @@ def _parse_format1(payload: str):
     # checks out if the computed length corresponds to the one of the payload
     if total_len != len(payload) / 8:  # 1st payload type
         # checks if delta address mode is enabled
-        if current_ioptions == Ioptions.DELTA_ADDRESS:
+        if not context.full_address:
             # computing the compressed address length
             payload_len = len(payload)
-            known_fields_len = 10 + branch_map_len + 2**CALL_COUNTER_SIZE
+            known_fields_len = (
+                profile.f1_known_fields_len + branch_map_len
+            )
             # adds time and/or context length
-            if NO_TIME == 0:
+            if profile.no_time == 0:
                 # TODO
                 # increases known_fields_length
                 pass
-            if NO_CONTEXT == 0:
+            if profile.no_context == 0:
                 # TODO
                 # increases known_fields_length
                 pass
-            address_len, padding_len = _find_address_len(
+            address_len, padding_len = find_address_len(
                 payload_len, known_fields_len
             )
 
             extendedAddr = _extend_with_sign(
                 payload[-(current_index + address_len) : -current_index],
-                XLEN + 1,
+                profile.delta_address_len,
             )
             twoCompAddr = _twos_complement(extendedAddr)
             packet.setAddress(twoCompAddr)
             current_index += address_len
         else:
             packet.setAddress(
-                int(payload[-(current_index + XLEN) : -current_index], 2)
+                int(
+                    payload[-(current_index + profile.xlen) : -current_index],
+                    2,
+                )
             )
-            current_index += XLEN
+            current_index += profile.xlen
 
         packet.setNotify(
             int(payload[-(current_index + 1) : -current_index], 2)
@@ -517,7 +557,7 @@ def _parse_format1(payload: str):
         packet.setIrdepth(
             int(
                 payload[
-                    -(current_index + 2**CALL_COUNTER_SIZE) : -current_index
+                    -(current_index + profile.irdepth_len) : -current_index
                 ],
                 2,
             )
@@ -525,8 +565,10 @@ def _parse_format1(payload: str):
     return packet
 
 
-def parse_packet(payload: str) -> Packet:
+def parse_packet(payload: str, context: ParserContext = None) -> Packet:
     """selects the right function to parse a packet"""
+    if context is None:
+        context = ParserContext()
     format = int(payload[-2:], 2)  # extracts packet format
     # match case to select the different packet types
     match format:
@@ -535,19 +577,19 @@ def parse_packet(payload: str) -> Packet:
             # selects the right subformat
             match subformat:
                 case 0:
-                    return _parse_format3_subformat0(payload)
+                    return _parse_format3_subformat0(payload, context)
                 case 1:
-                    return _parse_format3_subformat1(payload)
+                    return _parse_format3_subformat1(payload, context)
                 case 2:
-                    return _parse_format3_subformat2(payload)
+                    return _parse_format3_subformat2(payload, context)
                 case 3:
-                    return _parse_format3_subformat3(payload)
+                    return _parse_format3_subformat3(payload, context)
                 case _:
                     print("Error: wrong subformat")
         case 2:
-            return _parse_format2(payload)
+            return _parse_format2(payload, context)
         case 1:
-            return _parse_format1(payload)
+            return _parse_format1(payload, context)
         case 0:
             # TODO
             pass
@@ -555,21 +597,220 @@ def parse_packet(payload: str) -> Packet:
             print("Error: not valid packet type")
 
 
-def parse_packets(path: str) -> list[Packet]:
+def _split_frame(chunk: bytes, profile: EncoderProfile) -> tuple[int, bytes]:
+    """splits an encapsulated frame into its timestamp and payload"""
+    # works on the bytes: the payload ends where the timestamp starts and
+    # its length in bytes is in the header, the last byte of the frame
+    payload_end = profile.payload_end // 8
+    packet_len = chunk[-1] & 0x1F  # from header extracts the payload length
+    timestamp = int.from_bytes(
+        chunk[payload_end : profile.timestamp_end // 8], "big"
+    )
+    return timestamp, chunk[payload_end - packet_len : payload_end]
+
+
+class PacketCache:
+    """bounded cache of the packets parsed from identical payloads"""
+
+    # tight loops make the encoder emit the same payload over and over, the
+    # packet parsed the first time is frozen and shared by the repetitions
+    # entries are evicted in least recently used order
+    def __init__(self, max_entries: int = DEFAULT_PACKET_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # (payload, ioptions) -> packet
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def parse(self, payload: bytes, context: ParserContext) -> Packet:
+        """returns the packet of a payload, parsing it on a miss"""
+        # format 1 and 2 packets are parsed according to the ioptions
+        key = (payload, context.ioptions_key)
+        packet = self.entries.get(key, _MISSING)
+        if packet is not _MISSING:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            if isinstance(packet, Format3Subformat3):
+                # a repeated support packet still updates the context
+                context.set_ioptions(packet.getIoptions())
+            return packet
+        self.misses += 1
+        packet = parse_packet(convert_line(payload), context)
+        if packet is not None:
+            packet.freeze()
+        self.entries[key] = packet
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        return packet
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def parse_frame(
+    chunk: bytes,
+    context: ParserContext,
+    cache: PacketCache = None,
+) -> tuple[int, Packet]:
+    """parses an encapsulated frame into its timestamp and packet"""
+    timestamp, payload = _split_frame(chunk, context.profile)
+    if cache is not None:
+        return timestamp, cache.parse(payload, context)
+    # the payload is converted to text and parsed
+    return timestamp, parse_packet(convert_line(payload), context)
+
+
+def parse_frame_or_error(
+    chunk: bytes,
+    context: ParserContext,
+    cache: PacketCache = None,
+) -> tuple[int, Packet]:
+    """parses a frame, returning a PacketError instead of raising it"""
+    # corrupted frames can hold fields that do not parse, or a format the
+    # parser does not support
+    try:
+        timestamp, packet = parse_frame(chunk, context, cache)
+    except FRAME_ERRORS as exc:
+        timestamp, _ = _split_frame(chunk, context.profile)
+        return timestamp, PacketError(f"ERROR: Cannot parse frame: {exc}")
+    if packet is None:
+        return timestamp, PacketError("ERROR: Unsupported packet format")
+    return timestamp, packet
+
+
+def _parse_frames(
+    block: bytes, context: ParserContext, cache_size: int, recover: bool
+) -> list[tuple[int, Packet]]:
+    """parses a block of contiguous frames starting from a context"""
+    # runs in the worker processes, each keeps its own cache
+    global _worker_cache
+    if cache_size and _worker_cache is None:
+        _worker_cache = PacketCache(cache_size)
+    parse = parse_frame_or_error if recover else parse_frame
+    size = context.profile.chunk_size
+    return [
+        parse(block[offset : offset + size], context, _worker_cache)
+        for offset in range(0, len(block) - size + 1, size)
+    ]
+
+
+def scan_support_packets(
+    block: bytes, context: ParserContext, recover: bool = False
+) -> list[tuple[int, dict]]:
+    """locates the support packets of a block of frames"""
+    # fast scan on the bytes: the format and subformat are the 4 low bits
+    # of the last payload byte, only the support packets found are parsed
+    # returns (frame index, ioptions) and leaves the context updated with
+    # the ioptions in force after the block
+    # with recover, the support packets that do not parse are skipped
+    size = context.profile.chunk_size
+    last_payload_bytes = block[context.profile.payload_end // 8 - 1 :: size]
+    support = []
+    for match in SUPPORT_PACKET_BYTE.finditer(last_payload_bytes):
+        index = match.start()
+        chunk = block[index * size : (index + 1) * size]
+        if len(chunk) < size:
+            break  # truncated frame
+        _, payload = _split_frame(chunk, context.profile)
+        if not payload:
+            continue
+        try:
+            parse_packet(convert_line(payload), context)
+        except FRAME_ERRORS:
+            if not recover:
+                raise
+            continue
+        support.append((index, context.ioptions))
+    return support
+
+
+def read_blocks(file, frames_per_block: int, frame_size: int):
+    """reads whole frames from a binary stream in large blocks"""
+    block_size = frames_per_block * frame_size
+    while block := file.read(block_size):
+        # pipes can return less than requested: completes the last frame
+        while len(block) % frame_size:
+            missing = frame_size - len(block) % frame_size
+            more = file.read(missing)
+            if not more:
+                break  # truncated capture, the partial frame is dropped
+            block += more
+        yield block
+
+
+def iter_packets(
+    file,
+    workers: int = 1,
+    context: ParserContext = None,
+    cache: PacketCache = None,
+    recover: bool = False,
+):
+    """parses the frames of a binary stream while it is read"""
+    # yields (timestamp, packet) in capture order, without keeping
+    # the packets in memory
+    # with recover, a frame that cannot be parsed yields a PacketError in
+    # place of its packet instead of ending the iteration
+    if context is None:
+        context = ParserContext()
+    size = context.profile.chunk_size
+    blocks = read_blocks(file, FRAMES_PER_BLOCK, size)
+    if workers <= 1:
+        parse = parse_frame_or_error if recover else parse_frame
+        for block in blocks:
+            for offset in range(0, len(block) - size + 1, size):
+                yield parse(block[offset : offset + size], context, cache)
+        return
+
+    # two phases: the main process scans each block for the support
+    # packets, so that it knows the context in force at the start of the
+    # next one, then the blocks are parsed by a process pool, each seeded
+    # with a copy of its starting context
+    # the number of blocks in flight is bounded to keep memory flat
+    cache_size = cache.max_entries if cache is not None else 0
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for block in blocks:
+            pending.append(
+                pool.submit(
+                    _parse_frames, block, context.copy(), cache_size, recover
+                )
+            )
+            scan_support_packets(block, context, recover)
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def count_packets(
+    path: str, profile: EncoderProfile = DEFAULT_PROFILE
+) -> int:
+    """computes the number of packets in a file from its size"""
+    # packets are encapsulated in fixed size frames
+    # None for compressed captures, whose decompressed size is not known
+    if is_compressed(path):
+        return None
+    return os.path.getsize(path) // profile.chunk_size
+
+
+def parse_packets(
+    path: str, profile: EncoderProfile = DEFAULT_PROFILE
+) -> list[Packet]:
     """processes the binary file to extract the packets"""
-    packets: list[Packet] = []  # packets obtained are stored in a list
-
-    # loads the binary file and reads one chunk at a time
-    with open(path, "rb") as file:  # opens file in read mode as binary
-        while chunk := file.read(CHUNK_SIZE):  # reads file chunk by chunk
-            # each chunk is converted to text
-            packet_bits = _convert_line(chunk)
-            # from each packet is extracted the payload
-            payload = _extract_payload(packet_bits)
-            # processes the payload to create the packet
-            packet = parse_packet(payload)
-            # stores packet into a list
-            packets.append(packet)
-
-    # outputs the packets list as result
-    return packets
+    # loads the binary file and stores the packets obtained into a list
+    with open_capture(path) as file:  # raw or compressed binary file
+        return [
+            packet
+            for _, packet in iter_packets(file, 1, ParserContext(profile))
+        ]
@@ -0,0 +1,141 @@
+# Copyright (C) 2025 ETH Zurich and University of Bologna
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# imports
+from collections import OrderedDict
+
+from .instruction_logger import TraceSink
+
+from src.domain.const import DEFAULT_PATH_CACHE_SIZE
+from src.domain.enums import Ioptions
+from src.domain.trace_processor_model import TraceState
+
+MAX_SEGMENT_LEN = 4096  # longer segments are not stored
+
+
+class _RecordingSink(TraceSink):
+    # forwards the reported pcs while keeping a copy of them
+    def __init__(self, sink):
+        self.sink = sink
+        self.pcs = []
+
+    def report(self, address, state: TraceState):
+        self.pcs.append(address)
+        self.sink.report(address, state)
+
+
+class PathCache:
+    # memoizes follow_execution_path: in loops the same path segment is
+    # walked again and again from the same state, a hit replays the pcs
+    # reported by the first walk and restores the state it ended in
+    # entries are evicted in least recently used order
+    def __init__(self, max_entries=DEFAULT_PATH_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> (pcs, end state)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(te_inst, state: TraceState):
+        # everything follow_execution_path reads, besides the instruction map
+        prev = state.prev_te_inst
+        options = state.options
+        key = (
+            state.pc,
+            state.branches,
+            state.branch_map,
+            state.address,
+            state.stop_at_last_branch,
+            state.inferred_address,
+            state.privilege,
+            te_inst.format,
+            getattr(te_inst, "notify", None),
+            getattr(te_inst, "updiscon", None),
+            getattr(te_inst, "irreport", None),
+            getattr(te_inst, "irdepth", None),
+            getattr(te_inst, "privilege", None),
+            getattr(prev, "notify", None),
+            getattr(prev, "updiscon", None),
+            getattr(prev, "irreport", None),
+            tuple(options.values()) if options is not None else None,
+        )
+        # the pc preceding the segment matters only to sequential jumps,
+        # leaving it out lets loops entered from different places match
+        if options is not None and options[Ioptions.SIJUMP]:
+            key += (state.last_pc,)
+        if options is not None and options[Ioptions.IMPLICIT_RETURN]:
+            key += (state.return_stack.snapshot(),)
+        return key
+
+    @staticmethod
+    def _end_state(state: TraceState):
+        return (
+            state.pc,
+            state.last_pc,
+            state.branches,
+            state.branch_map,
+            state.stop_at_last_branch,
+            state.inferred_address,
+            state.return_stack.snapshot(),
+        )
+
+    def follow(self, te_inst, state: TraceState, walk):
+        # calls walk(te_inst, state) unless the segment is already known
+        key = self._key(te_inst, state)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            pcs, end_state = entry
+            # the whole segment is handed to the sink in one go
+            state.sink.report_block(pcs, state)
+            state.reported_pcs += len(pcs)
+            (
+                state.pc,
+                state.last_pc,
+                state.branches,
+                state.branch_map,
+                state.stop_at_last_branch,
+                state.inferred_address,
+                return_stack,
+            ) = end_state
+            state.return_stack.restore(return_stack)
+            return
+
+        self.misses += 1
+        recorder = _RecordingSink(state.sink)
+        state.sink = recorder
+        try:
+            walk(te_inst, state)
+        finally:
+            # on errors nothing is stored
+            state.sink = recorder.sink
+        if len(recorder.pcs) > MAX_SEGMENT_LEN:
+            return
+        self.entries[key] = (tuple(recorder.pcs), self._end_state(state))
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
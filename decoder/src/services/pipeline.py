@@ -0,0 +1,218 @@
+# Copyright (C) 2025 ETH Zurich and University of Bologna
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# imports
+import multiprocessing
+import queue
+import sys
+
+from array import array
+
+from .capture_reader import open_capture
+from .instruction_logger import TraceSink, TextTraceSink, open_output
+from .packet_parser import iter_packets, PacketCache
+
+from src.domain.packet_parser_model import ParserContext
+from src.domain.trace_processor_model import TraceState
+
+# the pipelined decode runs in three stages: a parser process reads and
+# parses the frames, the main process reconstructs the execution and a
+# writer process formats and writes the pcs; the stages hand each other
+# batches through bounded queues, so that a slow stage stops the one
+# before it instead of piling up batches in memory
+# processes and not threads: the parsing and the formatting hold the GIL
+PIPELINE_BATCH_SIZE = 4096  # packets, or pcs, per batch
+PIPELINE_QUEUE_DEPTH = 8  # batches in flight between two stages
+PIPELINE_POLL_INTERVAL = 0.1  # seconds between two checks of a stage
+
+
+def _parse_stage(
+    packets_path, batches, stop, profile, workers, cache_size, recover
+):
+    # runs in the parser process: sends batches of (timestamp, packet),
+    # the last one ending with None, or with the exception that stopped
+    # the parsing
+    # the packets are pickled per batch, so the ones the cache shares
+    # between identical frames are sent once
+    cache = PacketCache(cache_size) if cache_size else None
+    batch = []
+    try:
+        with open_capture(packets_path) as file:
+            for item in iter_packets(
+                file, workers, ParserContext(profile), cache, recover
+            ):
+                batch.append(item)
+                if len(batch) >= PIPELINE_BATCH_SIZE:
+                    if stop.is_set():
+                        return
+                    batches.put(batch)
+                    batch = []
+        batch.append(None)
+    except Exception as exc:
+        # the packets before the error are decoded first
+        batch.append(exc)
+    batches.put(batch)
+
+
+def pipelined_packets(
+    packets_path,
+    profile,
+    workers=1,
+    cache_size=0,
+    recover=False,
+    context=None,
+):
+    """iterates the (timestamp, packet) of a capture parsed by another
+    process, ahead of the consumer"""
+    # the capture is opened again by the parser process, so it must be a
+    # file; with workers > 1 it parses with its own process pool
+    if context is None:
+        context = multiprocessing.get_context()
+    batches = context.Queue(PIPELINE_QUEUE_DEPTH)
+    stop = context.Event()
+    # not a daemon: the parser may start a process pool
+    parser = context.Process(
+        target=_parse_stage,
+        args=(
+            packets_path,
+            batches,
+            stop,
+            profile,
+            workers,
+            cache_size,
+            recover,
+        ),
+        name="parser",
+    )
+    parser.start()
+    try:
+        while True:
+            batch = batches.get()
+            if batch and not isinstance(batch[-1], tuple):
+                yield from batch[:-1]
+                if batch[-1] is not None:
+                    raise batch[-1]
+                break
+            yield from batch
+    finally:
+        # the consumer may stop early, e.g. at the end of a selection: the
+        # parser is stopped and the batches it was sending are dropped
+        stop.set()
+        while parser.is_alive():
+            try:
+                batches.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        parser.join()
+        batches.close()
+
+
+def _write_stage(batches, output_path, fmt, instruction_map, offset):
+    # runs in the writer process: formats the batches of pcs, until None
+    state = TraceState()
+    state.set_instruction_map(instruction_map)
+    sink = TextTraceSink(open_output(output_path, offset), fmt)
+    try:
+        while True:
+            batch = batches.get()
+            if batch is None:
+                break
+            sink.report_block(array("Q", batch), state)
+    finally:
+        sink.close()
+
+
+class PipelinedTextSink(TraceSink):
+    # text or pc trace written by a writer process: the pcs are gathered
+    # in batches here and formatted there, with the same TextTraceSink
+    def __init__(
+        self,
+        output_path,
+        fmt="text",
+        instruction_map=None,
+        output_offset=None,
+        context=None,
+    ):
+        if context is None:
+            context = multiprocessing.get_context()
+        if output_path == "-":
+            # the writer inherits the descriptor, not sys.stdout
+            sys.stdout.flush()
+        self.batches = context.Queue(PIPELINE_QUEUE_DEPTH)
+        self.batch = array("Q")
+        # the pc format needs no instruction map, it is not sent
+        self.writer = context.Process(
+            target=_write_stage,
+            args=(
+                self.batches,
+                output_path,
+                fmt,
+                instruction_map if fmt == "text" else None,
+                output_offset,
+            ),
+            name="writer",
+            daemon=True,
+        )
+        self.writer.start()
+
+    def _writer_failed(self):
+        # the batches still queued will not be read
+        self.batches.cancel_join_thread()
+        return RuntimeError(
+            f"The writer process failed with exit code "
+            f"{self.writer.exitcode}"
+        )
+
+    def _put(self, item):
+        # the writer can fail while the queue is full, e.g. on a full disk
+        # or a closed stdout: it is checked again at every timeout instead
+        # of waiting forever
+        while True:
+            if not self.writer.is_alive():
+                raise self._writer_failed()
+            try:
+                self.batches.put(item, timeout=PIPELINE_POLL_INTERVAL)
+                return
+            except queue.Full:
+                pass
+
+    def _send(self):
+        self._put(self.batch.tobytes())
+        self.batch = array("Q")
+
+    def report(self, address, state: TraceState):
+        self.batch.append(address)
+        if len(self.batch) >= PIPELINE_BATCH_SIZE:
+            self._send()
+
+    def report_block(self, addresses, state: TraceState):
+        self.batch.extend(addresses)
+        if len(self.batch) >= PIPELINE_BATCH_SIZE:
+            self._send()
+
+    def position(self):
+        raise NotImplementedError("The pipelined trace has no position")
+
+    def close(self):
+        # the pcs reconstructed so far are written also when the decode
+        # failed, as by the other sinks
+        try:
+            if self.batch:
+                self._send()
+            self._put(None)
+        finally:
+            self.batches.close()
+            self.writer.join()
+        if self.writer.exitcode != 0:
+            raise self._writer_failed()
@@ -0,0 +1,127 @@
+# Copyright (C) 2025 ETH Zurich and University of Bologna
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# imports
+import json
+import sys
+
+from time import monotonic
+
+from src.domain.const import CHUNK_SIZE
+
+
+class ProgressReporter:
+    # periodically reports how far the packet loop is
+    # the clock is read only every `check_every` packets to keep the
+    # cost of update() negligible inside the loop
+    def __init__(
+        self,
+        total,
+        interval=1.0,
+        metrics_path=None,
+        check_every=64,
+        frame_size=CHUNK_SIZE,
+    ):
+        self.total = total
+        self.frame_size = frame_size
+        self.interval = interval
+        self.check_every = check_every
+        self.start = monotonic()
+        self._next_check = check_every
+        self._next_report = self.start + interval
+        # (sampled, seen) resync segments of a sampled decode
+        self.segments = None
+        # why the packet loop stopped before the end of the capture, set
+        # by the controller, e.g. "end of the program"
+        self.stopped = None
+        # metrics go to a JSON lines file if given, otherwise to stderr
+        self._metrics = open(metrics_path, "w") if metrics_path else None
+
+    def begin(self):
+        # restarts the clock when the packet loop starts, so that loading
+        # the capture and the ELF does not skew the rates
+        self.start = monotonic()
+        self._next_report = self.start + self.interval
+
+    def update(self, processed, instructions):
+        # called once per packet, reports when the interval elapsed
+        if processed < self._next_check:
+            return
+        self._next_check = processed + self.check_every
+        now = monotonic()
+        if now >= self._next_report:
+            self._next_report = now + self.interval
+            self._emit(processed, instructions, now)
+
+    def finish(self, processed, instructions):
+        # reports the final figures, with why the decode stopped instead of
+        # the ETA, and releases the metrics file
+        self._emit(
+            processed,
+            instructions,
+            monotonic(),
+            self.stopped or "end of the capture",
+        )
+        if self._metrics is not None:
+            self._metrics.close()
+            self._metrics = None
+
+    def _emit(self, processed, instructions, now, stopped=None):
+        # stopped is given by the final report only
+        elapsed = max(now - self.start, 1e-9)
+        packets_per_s = processed / elapsed
+        eta = None
+        if self.total is not None and packets_per_s:
+            eta = max(self.total - processed, 0) / packets_per_s
+        metrics = {
+            "elapsed_s": round(elapsed, 3),
+            "packets": processed,
+            "total": self.total,
+            "bytes_per_s": round(packets_per_s * self.frame_size, 1),
+            "instructions": instructions,
+            "instructions_per_s": round(instructions / elapsed, 1),
+            "done": stopped is not None,
+        }
+        if stopped is None:
+            metrics["eta_s"] = round(eta, 1) if eta is not None else None
+        else:
+            metrics["stopped"] = stopped
+        if self.segments is not None:
+            metrics["sampled_segments"], metrics["segments"] = self.segments
+        if self._metrics is not None:
+            self._metrics.write(json.dumps(metrics) + "\n")
+            self._metrics.flush()
+            return
+        if self.total is None:  # streamed input, the size is unknown
+            done = f"{processed} packets"
+        elif stopped is not None:
+            done = f"{processed}/{self.total} packets"
+        else:
+            percent = 100 * processed / self.total if self.total else 100.0
+            done = f"{processed}/{self.total} packets ({percent:.1f}%)"
+        if self.segments is not None:
+            done += f", {self.segments[0]}/{self.segments[1]} segments sampled"
+        rates = (
+            f"{metrics['bytes_per_s'] / 1e6:.2f} MB/s, "
+            f"{metrics['instructions_per_s']:.0f} instr/s"
+        )
+        if stopped is not None:
+            print(
+                f"progress: done in {elapsed:.1f}s, {done}, {stopped}, "
+                f"{rates}",
+                file=sys.stderr,
+            )
+            return
+        eta_str = f"{eta:.1f}s" if eta is not None else "?"
+        print(f"progress: {done}, {rates}, ETA {eta_str}", file=sys.stderr)
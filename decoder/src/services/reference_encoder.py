@@ -0,0 +1,486 @@
+# Copyright (C) 2025 ETH Zurich and University of Bologna
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# imports
+import io
+import struct
+
+from itertools import chain
+
+from src.domain.const import IOPTIONS_LEN, QUAL_STATUS_LEN
+from src.domain.enums import Ioptions, QualStatus
+from src.domain.instruction_kind import (
+    BRANCH_MNEMONICS,
+    DIRECT_JUMP_MNEMONICS,
+    ENVIRONMENT_MNEMONICS,
+    INDIRECT_JUMP_MNEMONICS,
+    TRAP_RETURN_MNEMONICS,
+    jump_kind,
+    CALL,
+    RETURN,
+)
+from src.domain.encoder_profile import DEFAULT_PROFILE, TIMESTAMP_LEN
+from src.domain.retirement_block import *
+
+# Python model of the rv_tracer encoder: turns the blocks retired by a hart
+# into the encapsulated frames of a capture, for round trip tests of the
+# decoder and to generate captures of any size
+#
+# the packets are chosen as in te_priority, one instruction at a time with
+# the previous (lc) and the next (nc) one, and their payloads are laid out
+# bit by bit as in te_packet_emitter; time and context are not traced,
+# like in the RTL
+
+RESYNC_MAX = 0x1FFF  # cycles between two sync packets, as in rv_tracer
+FRAME_HEADER = 0x80  # header bits above the payload length
+BRANCH_MAP_LEN = 31
+BRANCH_COUNT_LEN = 5
+FRAMES_PER_WRITE = 4096
+FRAME_CACHE_SIZE = 4096  # padded payloads
+
+# packet formats and format 3 subformats
+F_DIFF_DELTA = 1
+F_ADDR_ONLY = 2
+F_SYNC = 3
+SF_START = 0
+SF_TRAP = 1
+SF_SUPPORT = 3
+
+DEFAULT_IOPTIONS = {option: False for option in Ioptions}
+DEFAULT_IOPTIONS[Ioptions.DELTA_ADDRESS] = True
+
+
+def _branch_map_len(branches):
+    # bits of the branch map sent with `branches` branches
+    for length in (1, 3, 7, 15):
+        if branches <= length:
+            return length
+    return BRANCH_MAP_LEN
+
+
+def compressed_address_len(value, xlen):
+    # bits kept of an XLEN+1 bits two's complement address: te_priority
+    # drops the sign bits but one and te_packet_emitter rounds up to whole
+    # bytes, plus one bit
+    width = xlen + 1
+    mask = (1 << width) - 1
+    value &= mask
+    if value >> xlen:
+        value ^= mask  # leading ones become leading zeros
+    keep = value.bit_length() + 1  # one sign bit
+    return min((keep + 7) >> 3, xlen >> 3) * 8 + 1
+
+
+def _itype(mnemonic, op_str, taken):
+    # itype of the last instruction of a block, from its disassembly
+    if mnemonic in BRANCH_MNEMONICS:
+        return ITYPE_TAKEN_BRANCH if taken else ITYPE_NOT_TAKEN_BRANCH
+    if mnemonic in TRAP_RETURN_MNEMONICS:
+        return ITYPE_ERET
+    # followed by the decoder as uninferable jumps
+    if mnemonic in ENVIRONMENT_MNEMONICS:
+        return ITYPE_UNINFERABLE_JUMP
+    kind = jump_kind(mnemonic, op_str)
+    if mnemonic in DIRECT_JUMP_MNEMONICS:
+        return ITYPE_INFERABLE_CALL if kind == CALL else ITYPE_INFERABLE_JUMP
+    if mnemonic in INDIRECT_JUMP_MNEMONICS:
+        if kind == CALL:
+            return ITYPE_UNINFERABLE_CALL
+        if kind == RETURN:
+            return ITYPE_RETURN
+        return ITYPE_UNINFERABLE_JUMP
+    return ITYPE_NONE
+
+
+def blocks_from_pcs(pcs, instruction_map, priv=3):
+    # groups an ordered list of executed pcs, e.g. a decoded trace, into
+    # retirement blocks: a block ends at every instruction with an itype
+    # and wherever the next pc is not the sequential one
+    blocks = []
+    start = None
+    for i, pc in enumerate(pcs):
+        mnemonic, op_str = instruction_map[pc]
+        size = 2 if mnemonic.startswith("c.") else 4
+        if start is None:
+            start = pc
+        following = pcs[i + 1] if i + 1 < len(pcs) else None
+        itype = _itype(mnemonic, op_str, following != pc + size)
+        if itype != ITYPE_NONE or following != pc + size:
+            blocks.append(
+                RetirementBlock(
+                    itype,
+                    start,
+                    (pc + size - start) // 2,
+                    size // 4,
+                    priv,
+                )
+            )
+            start = None
+    return blocks
+
+
+def _points(blocks):
+    # splits the blocks into the instructions the encoder looks at: the
+    # first and the last one of each block, the ones in between are
+    # sequential and never reported
+    # point: (address, itype, priv, cause, tval, retired, time, cycle)
+    for cycle, block in enumerate(blocks):
+        time = block.time if block.time is not None else cycle
+        if block.iretire == 0:  # exception or interrupt alone
+            yield (
+                block.iaddr,
+                block.itype,
+                block.priv,
+                block.cause,
+                block.tval,
+                False,
+                time,
+                cycle,
+            )
+            continue
+        last = last_address(block)
+        if last != block.iaddr:
+            yield (
+                block.iaddr,
+                ITYPE_NONE,
+                block.priv,
+                0,
+                0,
+                True,
+                time,
+                cycle,
+            )
+        yield (
+            last,
+            block.itype,
+            block.priv,
+            block.cause,
+            block.tval,
+            True,
+            time,
+            cycle,
+        )
+
+
+class ReferenceEncoder:
+    # reference model of the encoder, one instance per capture
+    # the frames are laid out as profile says, delta or full addresses as
+    # ioptions say (delta by default, as in the RTL)
+    def __init__(
+        self,
+        profile=DEFAULT_PROFILE,
+        ioptions=None,
+        resync_max=RESYNC_MAX,
+    ):
+        self.profile = profile
+        self.ioptions = dict(DEFAULT_IOPTIONS)
+        if ioptions is not None:
+            self.ioptions.update(ioptions)
+        self.full_address = self.ioptions[Ioptions.FULL_ADDRESS]
+        self.resync_max = resync_max
+        # irdepth is sent only when implicit returns are supported
+        self.irdepth_len = 0
+        if profile.call_counter_size or profile.return_stack_size:
+            self.irdepth_len = profile.irdepth_len
+        self.payload_end = profile.payload_end // 8
+        self.timestamp_mask = (1 << TIMESTAMP_LEN) - 1
+        self.frame_cache = {}
+        self.reset()
+
+    def reset(self):
+        self.branches = 0
+        self.branch_map = 0  # bit i: 0 if branch i was taken
+        self.latest_address = 0  # address of the last packet
+        self.sync_cycle = 0  # cycle of the last sync or trap packet
+        self.resync_br = False  # branches to send before a resync
+        self.reported = False  # trap reported without an address
+        self.packets = 0
+
+    # payloads, as (value, bits) with the format in the lowest bits
+    def support(self, enable=True, qual_status=QualStatus.NO_CHANGE):
+        ioptions = 0
+        for option in Ioptions:
+            ioptions = (ioptions << 1) | self.ioptions[option]
+        value = F_SYNC | SF_SUPPORT << 2 | int(enable) << 4
+        value |= qual_status.value << 6
+        value |= ioptions << 6 + QUAL_STATUS_LEN
+        return value, 6 + QUAL_STATUS_LEN + IOPTIONS_LEN
+
+    def start(self, address, priv, branch):
+        bits = 5 + self.profile.priv_len
+        address_len = compressed_address_len(address, self.profile.xlen)
+        value = F_SYNC | SF_START << 2 | branch << 4 | priv << 5
+        value |= address << bits
+        return value, bits + address_len
+
+    def trap(self, address, priv, branch, cause, interrupt, thaddr, tval):
+        profile = self.profile
+        bits = 5 + profile.priv_len
+        value = F_SYNC | SF_TRAP << 2 | branch << 4 | priv << 5
+        value |= cause << bits
+        bits += profile.xlen
+        value |= interrupt << bits | thaddr << bits + 1
+        bits += 2
+        address_len = compressed_address_len(address, profile.xlen)
+        value |= address << bits
+        bits += address_len
+        value |= tval << bits
+        return value, bits + profile.xlen
+
+    def _address_fields(self, address, updiscon, bits):
+        # address, notify, updiscon, irreport and irdepth of format 1 and 2
+        xlen = self.profile.xlen
+        notify = (address >> xlen - 1) & 1
+        updiscon = notify ^ updiscon
+        if self.full_address:
+            value = address
+            address_len = xlen
+        else:
+            value = (address - self.latest_address) & ((1 << xlen + 1) - 1)
+            address_len = compressed_address_len(value, xlen)
+            value &= (1 << address_len) - 1
+        value = value << bits
+        bits += address_len
+        value |= (notify | updiscon << 1 | updiscon << 2) << bits
+        bits += 3
+        if updiscon:
+            value |= ((1 << self.irdepth_len) - 1) << bits
+        return value, bits + self.irdepth_len
+
+    def address_only(self, address, updiscon):
+        value, bits = self._address_fields(address, updiscon, 2)
+        return F_ADDR_ONLY | value, bits
+
+    def diff_delta(self, address=None, updiscon=False):
+        # without address the branch map is full and branches is 0
+        branches = self.branches if address is not None else 0
+        map_len = _branch_map_len(self.branches)
+        value = F_DIFF_DELTA | branches << 2
+        value |= (self.branch_map & (1 << map_len) - 1) << 2 + BRANCH_COUNT_LEN
+        bits = 2 + BRANCH_COUNT_LEN + map_len
+        if address is None:
+            return value, bits
+        fields, bits = self._address_fields(address, updiscon, bits)
+        return value | fields, bits
+
+    def frame(self, payload, time):
+        # encapsulates a payload: right aligned before the timestamp, the
+        # last byte the header with the payload length
+        # loops repeat the same payloads, their padded bytes are cached
+        cached = self.frame_cache.get(payload)
+        if cached is None:
+            value, bits = payload
+            length = (bits + 7) >> 3
+            head = bytes(self.payload_end - length)
+            cached = (
+                head + value.to_bytes(length, "big"),
+                bytes((FRAME_HEADER | length,)),
+            )
+            if len(self.frame_cache) >= FRAME_CACHE_SIZE:
+                self.frame_cache.clear()
+            self.frame_cache[payload] = cached
+        head, header = cached
+        return (
+            head
+            + (time & self.timestamp_mask).to_bytes(TIMESTAMP_LEN // 8, "big")
+            + header
+        )
+
+    def _add_branch(self, itype):
+        if itype in ITYPE_BRANCHES:
+            if itype == ITYPE_NOT_TAKEN_BRANCH:
+                self.branch_map |= 1 << self.branches
+            self.branches += 1
+
+    def _flush(self, address):
+        self.branches = 0
+        self.branch_map = 0
+        self.latest_address = address
+
+    def _step(self, lc, tc, nc):
+        # packets, as (payload, time), for the instruction tc
+        address, itype, priv, cause, tval, retired, time, cycle = tc
+        exc_only = not retired
+        # a sync packet carries the branch of tc, the branch map the others
+        branch = int(itype != ITYPE_TAKEN_BRANCH)
+        lc_exception = lc[1] in ITYPE_TRAPS
+        lc_updiscon = lc[5] and lc[1] in ITYPE_UPDISCON
+        since_sync = cycle - self.sync_cycle
+        if since_sync >= self.resync_max and self.branches:
+            self.resync_br = True
+
+        if lc_exception:
+            self.sync_cycle = cycle
+            if exc_only:
+                self.reported = True
+                self._flush(lc[0])
+                return [
+                    (
+                        self.trap(
+                            lc[0],
+                            priv,
+                            branch,
+                            lc[3],
+                            int(lc[1] == ITYPE_INTERRUPT),
+                            0,
+                            lc[4],
+                        ),
+                        time,
+                    )
+                ]
+            self._flush(address)
+            if self.reported:
+                self.reported = False
+                return [(self.start(address, priv, branch), time)]
+            return [
+                (
+                    self.trap(
+                        address,
+                        priv,
+                        branch,
+                        lc[3],
+                        int(lc[1] == ITYPE_INTERRUPT),
+                        1,
+                        lc[4],
+                    ),
+                    time,
+                )
+            ]
+        if exc_only and not lc_updiscon:
+            return []  # reported with the first instruction of the handler
+        if not exc_only and (
+            priv != lc[2]
+            or (since_sync > self.resync_max and not self.resync_br)
+        ):
+            self.sync_cycle = cycle
+            self.reported = False
+            self._flush(address)
+            return [(self.start(address, priv, branch), time)]
+        if lc_updiscon and exc_only:
+            self.sync_cycle = cycle
+            self._flush(address)
+            return [
+                (
+                    self.trap(
+                        address,
+                        priv,
+                        branch,
+                        cause,
+                        int(itype == ITYPE_INTERRUPT),
+                        0,
+                        tval,
+                    ),
+                    time,
+                )
+            ]
+
+        self._add_branch(itype)
+        if (
+            lc_updiscon
+            or self.resync_br
+            or itype in ITYPE_TRAPS
+            or nc is None
+            or not nc[5]
+            or (nc[2] != priv and self.branches)
+        ):
+            if self.branches:
+                payload = self.diff_delta(address, lc_updiscon)
+            else:
+                payload = self.address_only(address, lc_updiscon)
+            self.resync_br = False
+            self._flush(address)
+            return [(payload, time)]
+        if self.branches == BRANCH_MAP_LEN:
+            payload = self.diff_delta()
+            self.branches = 0
+            self.branch_map = 0
+            return [(payload, time)]
+        return []
+
+    def encode(self, blocks):
+        # yields the payloads of the packets for the blocks, as (payload,
+        # time): a support packet, a sync packet for the first instruction
+        # and the others as the instructions retire, a support packet
+        # ending the trace
+        self.reset()
+        points = _points(blocks)
+        tc = next(points, None)
+        if tc is None:
+            return
+        time = tc[6]
+        yield self.support(), time
+        self.sync_cycle = tc[7]
+        self._flush(tc[0])
+        yield self.start(tc[0], tc[2], int(tc[1] != ITYPE_TAKEN_BRANCH)), time
+        lc = tc
+        tc = next(points, None)
+        for nc in chain(points, (None,)):
+            if tc is None:
+                break
+            for packet in self._step(lc, tc, nc):
+                yield packet
+            time = tc[6]
+            lc, tc = tc, nc
+        yield self.support(False, QualStatus.ENDED_REP), time
+
+    def frames(self, blocks):
+        # yields the encapsulated frames for the blocks
+        for payload, time in self.encode(blocks):
+            self.packets += 1
+            yield self.frame(payload, time)
+
+    def write(self, blocks, output, frames_per_write=FRAMES_PER_WRITE):
+        # writes the capture of the blocks to a binary file object, the
+        # frames are joined and written in batches; returns the frames
+        batch = []
+        frames = 0
+        for frame in self.frames(blocks):
+            batch.append(frame)
+            if len(batch) == frames_per_write:
+                output.write(b"".join(batch))
+                frames += len(batch)
+                batch = []
+        output.write(b"".join(batch))
+        return frames + len(batch)
+
+    def write_repeated(self, blocks, output, repeat):
+        # writes the capture of the blocks `repeat` times back to back, e.g.
+        # to generate large captures: every copy is a whole trace, from a
+        # support packet to the one ending it, that only differs from the
+        # first one in its timestamps, shifted by the time the blocks span
+        # the first copy is encoded, the others patched; returns the frames
+        buffer = io.BytesIO()
+        frames = self.write(blocks, buffer)
+        first = buffer.getvalue()
+        chunk = self.profile.chunk_size
+        offsets = range(self.payload_end, len(first), chunk)
+        timestamps = [
+            struct.unpack_from(">Q", first, offset)[0] for offset in offsets
+        ]
+        if not timestamps:
+            return 0
+        span = max(timestamps) - min(timestamps) + 1
+        output.write(first)
+        copy = bytearray(first)
+        for i in range(1, repeat):
+            shift = i * span
+            for offset, timestamp in zip(offsets, timestamps):
+                struct.pack_into(
+                    ">Q",
+                    copy,
+                    offset,
+                    (timestamp + shift) & self.timestamp_mask,
+                )
+            output.write(copy)
+        return frames * repeat
@@ -0,0 +1,106 @@
+# Copyright (C) 2025 ETH Zurich and University of Bologna
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# imports
+import random
+import re
+
+from .packet_parser import (
+    read_blocks,
+    SUPPORT_PACKET_BYTE,
+    parse_frame,
+    parse_frame_or_error,
+)
+
+from src.domain.const import FRAMES_PER_BLOCK
+from src.domain.packet_parser_model import ParserContext
+
+# a resync segment runs from a format 3 subformat 0 (sync) packet to the
+# next one; the reconstruction can start again from any sync packet, so
+# the segments can be decoded on their own
+# like the support packets, the sync packets are found on the low 4 bits
+# of the last payload byte, without parsing the frames
+_SYNC_PACKET_BYTE = re.compile(
+    b"[" + re.escape(bytes(range(0x03, 0x100, 0x10))) + b"]"
+)
+
+
+class SegmentSampler:
+    # chooses the segments to decode: one every `every`, or each with a
+    # probability of 1 / every when a seed is given
+    def __init__(self, every, seed=None):
+        self.every = every
+        self.random = random.Random(seed) if seed is not None else None
+
+    def selected(self, segment):
+        if self.random is not None:
+            return self.random.random() * self.every < 1
+        return segment % self.every == 0
+
+
+def iter_segments(
+    file,
+    context: ParserContext,
+    sampler: SegmentSampler,
+    cache=None,
+    recover=False,
+):
+    """iterates the packets of the segments chosen by the sampler"""
+    # yields (segment, selected, index, timestamp, packet): at the start of
+    # every segment one with the packet None, then all the packets of a
+    # selected segment, only the support packets of the others, which
+    # still change how the next packets are parsed and followed
+    # the frames before the first sync packet are segment -1, not selected
+    parse = parse_frame_or_error if recover else parse_frame
+    size = context.profile.chunk_size
+    payload_end = context.profile.payload_end // 8
+    segment = -1
+    selected = False
+    first_index = 0  # index of the first frame of the block
+    for block in read_blocks(file, FRAMES_PER_BLOCK, size):
+        frames = len(block) // size
+        last_payload_bytes = block[payload_end - 1 :: size][:frames]
+        syncs = [
+            match.start()
+            for match in _SYNC_PACKET_BYTE.finditer(last_payload_bytes)
+        ]
+        # pieces of the block between two sync packets
+        starts = [0] + syncs if not syncs or syncs[0] else syncs
+        syncs = set(syncs)
+        for start, end in zip(starts, starts[1:] + [frames]):
+            if start in syncs:
+                segment += 1
+                selected = sampler.selected(segment)
+                yield segment, selected, first_index + start, None, None
+            if selected:
+                frame_indexes = range(start, end)
+            else:
+                frame_indexes = [
+                    match.start()
+                    for match in SUPPORT_PACKET_BYTE.finditer(
+                        last_payload_bytes, start, end
+                    )
+                ]
+            for index in frame_indexes:
+                timestamp, packet = parse(
+                    block[index * size : (index + 1) * size], context, cache
+                )
+                yield (
+                    segment,
+                    selected,
+                    first_index + index,
+                    timestamp,
+                    packet,
+                )
+        first_index += frames
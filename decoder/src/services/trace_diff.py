@@ -0,0 +1,467 @@
+# Copyright (C) 2025 ETH Zurich and University of Bologna
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# imports
+import hashlib
+import re
+import sys
+
+from array import array
+
+from .columnar import COLUMNAR_MAGIC, ColumnarReader
+
+from src.domain.instruction_kind import CONTROL_TRANSFER_MNEMONICS
+
+# the traces are compared as sequences of pcs, read in chunks so that
+# memory stays bounded whatever their length; the equal stretches are
+# compared a chunk at a time, only the records around a mismatch one by one
+DIFF_CHUNK = 1 << 16  # records compared at once
+DIFF_CONTEXT = 4  # equal records shown before a mismatch
+DEFAULT_MAX_REPORTED = 10  # mismatches reported in detail
+RESYNC_WINDOW = 4096  # records looked ahead in each trace to resync
+RESYNC_RUN = 8  # equal pcs in a row that resync the traces
+TEXT_CHUNK_BYTES = 1 << 20
+
+# a line with a pc: the text and pc outputs of the decoder,
+# "0x80000e6e jal -0x190", or a spike commit log,
+# "core   0: 3 0x0000000080000000 (0x00000297) x5 0x0000000080000000"
+# other lines, e.g. the exceptions in a spike log, are skipped
+_TRACE_LINE = re.compile(rb"\s*(?:core\s+\d+:\s+(?:\d\s+)?)?0x([0-9a-fA-F]+)")
+
+# polynomial hash of RESYNC_RUN pcs, rolled along the lookahead windows
+_HASH_MODULUS = (1 << 61) - 1
+_HASH_BASE = 1_000_003
+
+
+class TraceStream:
+    # the pcs of a trace, text or columnar, with the line (or row) and,
+    # for a columnar trace, the packet of each; the pcs are hashed as they
+    # are read, digest() identifies the whole sequence
+    def __init__(self, path):
+        self.path = path
+        self.hash = hashlib.blake2b(digest_size=16)
+        self.pcs = array("Q")
+        self.locations = array("Q")  # line, or row, of each pc
+        self.packets = None  # packet of each pc, columnar traces only
+        self.offset = 0  # first record not consumed in the buffers
+        self.consumed = 0  # records consumed from the start
+        self.done = False
+        with open(path, "rb") as f:
+            columnar = f.read(len(COLUMNAR_MAGIC)) == COLUMNAR_MAGIC
+        if columnar:
+            self.unit = "row"
+            self.packets = array("Q")
+            self.chunks = self._columnar_chunks()
+        else:
+            self.unit = "line"
+            self.chunks = self._text_chunks()
+
+    def _text_chunks(self):
+        line = 0
+        with open(self.path, "rb") as f:
+            while lines := f.readlines(TEXT_CHUNK_BYTES):
+                # fast path: every line starts with a pc, as main.py writes
+                try:
+                    pcs = array(
+                        "Q",
+                        [int(text.split(None, 1)[0], 16) for text in lines],
+                    )
+                except (ValueError, IndexError):
+                    pass
+                else:
+                    end = line + len(lines)
+                    yield pcs, array("Q", range(line + 1, end + 1)), None
+                    line = end
+                    continue
+                pcs = array("Q")
+                locations = array("Q")
+                for text in lines:
+                    line += 1
+                    match = _TRACE_LINE.match(text)
+                    if match:
+                        pcs.append(int(match.group(1), 16))
+                        locations.append(line)
+                yield pcs, locations, None
+
+    def _columnar_chunks(self):
+        row = 0
+        with ColumnarReader(self.path) as reader:
+            for group in reader.iter_row_groups(["pc", "packet"]):
+                pcs = group["pc"]
+                rows = array("Q", range(row, row + len(pcs)))
+                yield pcs, rows, group["packet"]
+                row += len(pcs)
+
+    def fill(self, count):
+        # reads until count records are buffered, fewer at the end of the
+        # trace; returns the records available
+        while len(self.pcs) - self.offset < count and not self.done:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                self.done = True
+                break
+            pcs, locations, packets = chunk
+            # the records consumed are dropped, but for the context
+            drop = max(self.offset - DIFF_CONTEXT, 0)
+            if drop:
+                del self.pcs[:drop]
+                del self.locations[:drop]
+                if self.packets is not None:
+                    del self.packets[:drop]
+                self.offset -= drop
+            self.pcs.extend(pcs)
+            self.locations.extend(locations)
+            if self.packets is not None:
+                self.packets.extend(packets)
+            if sys.byteorder != "little":
+                pcs = array("Q", pcs)
+                pcs.byteswap()
+            self.hash.update(pcs.tobytes())
+        return len(self.pcs) - self.offset
+
+    def window(self, count):
+        # the next count pcs, or fewer at the end
+        return self.pcs[self.offset : self.offset + count]
+
+    def advance(self, count):
+        self.offset += count
+        self.consumed += count
+
+    def record(self, index):
+        # (pc, line or row, packet) of a buffered record, relative to the
+        # first one not consumed, negative for the context
+        i = self.offset + index
+        packet = self.packets[i] if self.packets is not None else None
+        return self.pcs[i], self.locations[i], packet
+
+    def context(self):
+        # the records consumed still buffered, at most DIFF_CONTEXT
+        first = -min(self.offset, DIFF_CONTEXT)
+        return [self.record(i) for i in range(first, 0)]
+
+    def drain(self):
+        # reads the rest of the trace, to complete its digest
+        while self.fill(DIFF_CHUNK):
+            self.advance(len(self.pcs) - self.offset)
+
+    def digest(self):
+        return self.hash.hexdigest()
+
+
+def _first_difference(a, b):
+    # index of the first differing pc of two arrays of the same length,
+    # narrowed by halves with comparisons of slices
+    low, high = 0, len(a)
+    while high - low > 1:
+        middle = (low + high) // 2
+        if a[low:middle] == b[low:middle]:
+            low = middle
+        else:
+            high = middle
+    return low
+
+
+def _run_hashes(pcs, run):
+    # hash of every run of `run` consecutive pcs, by start index
+    power = pow(_HASH_BASE, run - 1, _HASH_MODULUS)
+    hashes = []
+    value = 0
+    for i, pc in enumerate(pcs):
+        if i >= run:
+            value = (value - pcs[i - run] * power) % _HASH_MODULUS
+        value = (value * _HASH_BASE + pc) % _HASH_MODULUS
+        if i >= run - 1:
+            hashes.append(value)
+    return hashes
+
+
+def find_resync(a, b, run, a_done=False, b_done=False):
+    # smallest (i, j), by i + j, after which the two windows agree on run
+    # pcs in a row, or on everything that is left when both traces end
+    # there; None if they never agree within the windows
+    run = min(run, len(a), len(b))
+    if not run:
+        return (len(a), len(b)) if a_done and b_done else None
+    starts = {}  # hash of the run -> start indexes in b
+    for j, value in enumerate(_run_hashes(b, run)):
+        starts.setdefault(value, []).append(j)
+    best = None
+    for i, value in enumerate(_run_hashes(a, run)):
+        if best is not None and i >= best[0] + best[1]:
+            break
+        for j in starts.get(value, ()):
+            if best is not None and i + j >= best[0] + best[1]:
+                break
+            # the hash may collide, the run is checked
+            if a[i : i + run] == b[j : j + run]:
+                best = (i, j)
+                break
+    if best is None and a_done and b_done:
+        # shorter tails than a run can still match as the end of both
+        for length in range(run - 1, 0, -1):
+            if a[-length:] == b[-length:]:
+                return len(a) - length, len(b) - length
+    return best
+
+
+class TraceDiff:
+    # walks a decoded trace and a reference trace in lockstep; at a
+    # mismatch the next RESYNC_WINDOW pcs of both are searched for the
+    # closest point where they agree again, found with a rolling hash of
+    # RESYNC_RUN pcs, and the comparison continues from there
+    def __init__(
+        self,
+        trace: TraceStream,
+        reference: TraceStream,
+        max_reported=DEFAULT_MAX_REPORTED,
+        window=RESYNC_WINDOW,
+        run=RESYNC_RUN,
+    ):
+        self.trace = trace
+        self.reference = reference
+        self.max_reported = max_reported
+        self.window = window
+        self.run = run
+        self.matched = 0
+        self.mismatches = 0
+        self.reported = []  # the first max_reported mismatches, as dicts
+        self.diverged = False  # no resync found after the last mismatch
+
+    def compare(self):
+        trace, reference = self.trace, self.reference
+        while True:
+            available = min(
+                trace.fill(DIFF_CHUNK), reference.fill(DIFF_CHUNK)
+            )
+            if not available:
+                break
+            a = trace.window(available)
+            b = reference.window(available)
+            if a == b:
+                trace.advance(available)
+                reference.advance(available)
+                self.matched += available
+                continue
+            equal = _first_difference(a, b)
+            trace.advance(equal)
+            reference.advance(equal)
+            self.matched += equal
+            if not self._resync():
+                break
+        if not self.diverged and (
+            trace.fill(1) or reference.fill(1)
+        ):
+            # one trace ended, the rest of the other is a mismatch
+            self._resync()
+        trace.drain()
+        reference.drain()
+        return self
+
+    def _resync(self):
+        # handles the mismatch at the current records, returns whether
+        # the traces agree again
+        trace, reference = self.trace, self.reference
+        trace.fill(self.window)
+        reference.fill(self.window)
+        a = trace.window(self.window)
+        b = reference.window(self.window)
+        found = find_resync(
+            a,
+            b,
+            self.run,
+            trace.done and len(a) < self.window,
+            reference.done and len(b) < self.window,
+        )
+        self.mismatches += 1
+        if len(self.reported) < self.max_reported:
+            skipped_trace, skipped_reference = found or (len(a), len(b))
+            self.reported.append(
+                {
+                    "trace": self._position(trace),
+                    "reference": self._position(reference),
+                    "context": list(
+                        zip(trace.context(), reference.context())
+                    ),
+                    "trace_pcs": list(a[:skipped_trace]),
+                    "reference_pcs": list(b[:skipped_reference]),
+                    "resynced": found is not None,
+                }
+            )
+        if found is None:
+            self.diverged = True
+            return False
+        trace.advance(found[0])
+        reference.advance(found[1])
+        return True
+
+    @staticmethod
+    def _position(stream: TraceStream):
+        # (record index, line or row, packet) of the current record, None
+        # at the end of the trace
+        if not stream.fill(1):
+            return stream.consumed, None, None
+        return (stream.consumed,) + stream.record(0)[1:]
+
+    def equal(self):
+        return not self.mismatches and (
+            self.trace.digest() == self.reference.digest()
+        )
+
+
+# the instructions after which the next pc may not be the following one,
+# as objdump prints them
+_BRANCH_MNEMONIC = re.compile(r"b[a-z]*$|c\.b[a-z]*$")
+# objdump also prints the tail and call pseudo-instructions
+JUMP_MNEMONICS = CONTROL_TRANSFER_MNEMONICS | {"tail", "call"}
+
+# "    80000e6e:	e73ff0ef          	jal	ra,80000cde <memcpy>"
+_DUMP_LINE = re.compile(r"\s*([0-9a-f]+):\t([0-9a-f ]+?)\s*\t(\S+)")
+
+
+def load_dump(path):
+    # {address: (size, mnemonic)} of the instructions of an objdump
+    # disassembly, e.g. the tests/*/*.dump files
+    instructions = {}
+    with open(path) as f:
+        for line in f:
+            match = _DUMP_LINE.match(line)
+            if match:
+                address, encoding, mnemonic = match.groups()
+                size = len(encoding.replace(" ", "")) // 2
+                instructions[int(address, 16)] = (size, mnemonic)
+    return instructions
+
+
+def is_control_transfer(mnemonic):
+    return mnemonic in JUMP_MNEMONICS or bool(
+        _BRANCH_MNEMONIC.match(mnemonic)
+    )
+
+
+class DumpCheck:
+    # checks a trace against the disassembly of the compiled file: every
+    # pc must be the address of an instruction, and the pc after an
+    # instruction that does not transfer control must follow it; traps
+    # are reported too, they break the sequence anywhere
+    def __init__(
+        self, trace: TraceStream, dump, max_reported=DEFAULT_MAX_REPORTED
+    ):
+        self.trace = trace
+        self.dump = dump
+        self.max_reported = max_reported
+        self.checked = 0
+        self.mismatches = 0
+        self.reported = []  # the first max_reported mismatches, as dicts
+
+    def compare(self):
+        trace, dump = self.trace, self.dump
+        previous = None  # (pc, size, mnemonic) of the previous pc
+        while available := trace.fill(DIFF_CHUNK):
+            for index, pc in enumerate(trace.window(available)):
+                entry = dump.get(pc)
+                problem = None
+                if entry is None:
+                    problem = "not an instruction of the dump"
+                elif (
+                    previous is not None
+                    and pc != previous[0] + previous[1]
+                    and not is_control_transfer(previous[2])
+                ):
+                    problem = (
+                        f"does not follow {previous[2]} at {previous[0]:#x}"
+                    )
+                if problem is not None:
+                    self._report(index, pc, problem)
+                previous = (pc,) + entry if entry is not None else None
+            trace.advance(available)
+            self.checked += available
+        return self
+
+    def _report(self, index, pc, problem):
+        self.mismatches += 1
+        if len(self.reported) < self.max_reported:
+            _, location, packet = self.trace.record(index)
+            self.reported.append(
+                {
+                    "trace": (self.trace.consumed + index, location, packet),
+                    "pc": pc,
+                    "problem": problem,
+                }
+            )
+
+    def equal(self):
+        return not self.mismatches
+
+
+def _location(stream: TraceStream, position):
+    index, location, packet = position
+    if location is None:
+        return f"end of {stream.path} after {index} pcs"
+    text = f"{stream.path} {stream.unit} {location}"
+    if packet is not None:
+        text += f" (packet {packet})"
+    return text
+
+
+def _pcs(pcs, limit=8):
+    text = " ".join(hex(pc) for pc in pcs[:limit])
+    if len(pcs) > limit:
+        text += f" ... ({len(pcs)} pcs)"
+    return text or "-"
+
+
+def write_diff_report(diff: TraceDiff, output):
+    """writes the mismatches and the summary of a TraceDiff"""
+    for number, mismatch in enumerate(diff.reported, 1):
+        output.write(
+            f"mismatch {number}: {_location(diff.trace, mismatch['trace'])}"
+            f", {_location(diff.reference, mismatch['reference'])}\n"
+        )
+        for (pc, _, _), (reference_pc, _, _) in mismatch["context"]:
+            output.write(f"    {pc:#x} {reference_pc:#x}\n")
+        output.write(f"  trace:     {_pcs(mismatch['trace_pcs'])}\n")
+        output.write(f"  reference: {_pcs(mismatch['reference_pcs'])}\n")
+        if not mismatch["resynced"]:
+            output.write(
+                f"  no resync within {diff.window} pcs, comparison stopped\n"
+            )
+    if diff.mismatches > len(diff.reported):
+        output.write(
+            f"... {diff.mismatches - len(diff.reported)} more mismatches\n"
+        )
+    output.write(
+        f"{diff.matched} pcs matched, {diff.mismatches} mismatches\n"
+        f"{diff.trace.digest()}  {diff.trace.path} "
+        f"({diff.trace.consumed} pcs)\n"
+        f"{diff.reference.digest()}  {diff.reference.path} "
+        f"({diff.reference.consumed} pcs)\n"
+        f"{'equal' if diff.equal() else 'different'}\n"
+    )
+
+
+def write_dump_report(check: DumpCheck, output):
+    """writes the mismatches and the summary of a DumpCheck"""
+    for number, mismatch in enumerate(check.reported, 1):
+        output.write(
+            f"mismatch {number}: {_location(check.trace, mismatch['trace'])}"
+            f": {mismatch['pc']:#x} {mismatch['problem']}\n"
+        )
+    if check.mismatches > len(check.reported):
+        output.write(
+            f"... {check.mismatches - len(check.reported)} more mismatches\n"
+        )
+    output.write(
+        f"{check.checked} pcs checked against the dump, "
+        f"{check.mismatches} mismatches\n"
+    )
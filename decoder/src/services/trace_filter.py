@@ -0,0 +1,142 @@
+# Copyright (C) 2025 ETH Zurich and University of Bologna
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# imports
+from bisect import bisect_right
+from fnmatch import fnmatchcase
+
+from .instruction_logger import TraceSink
+
+from src.domain.enums import Privilege
+from src.domain.symbol_index import SymbolIndex
+from src.domain.trace_processor_model import TraceState
+
+ADDRESS_SPACE_END = 1 << 64
+
+
+class TraceFilter:
+    # the pcs kept in the trace: inside one of the address ranges, None
+    # for all the addresses, and retired at one of the privilege levels,
+    # None for all the levels
+    def __init__(self, ranges=None, privileges=None):
+        # ranges: iterable of [start, end), merged when they overlap
+        self.starts = None
+        self.ends = None
+        if ranges is not None:
+            self.starts = []
+            self.ends = []
+            for start, end in sorted(ranges):
+                if self.ends and start <= self.ends[-1]:
+                    self.ends[-1] = max(self.ends[-1], end)
+                    continue
+                self.starts.append(start)
+                self.ends.append(end)
+        self.privileges = None
+        if privileges is not None:
+            # the level before the first sync packet is a plain 0
+            self.privileges = set()
+            for privilege in privileges:
+                self.privileges.add(privilege)
+                self.privileges.add(privilege.value)
+
+    def contains(self, address):
+        if self.starts is None:
+            return True
+        i = bisect_right(self.starts, address) - 1
+        return i >= 0 and address < self.ends[i]
+
+    def select(self, addresses):
+        # the addresses of a block inside the ranges: a block is usually
+        # a loop body or a function, either kept or dropped whole, which
+        # is decided from its lowest and highest address only
+        if self.starts is None or not addresses:
+            return addresses
+        low = min(addresses)
+        high = max(addresses)
+        i = bisect_right(self.starts, low) - 1
+        if i >= 0 and high < self.ends[i]:
+            return addresses
+        j = bisect_right(self.starts, high) - 1
+        if j < 0 or (i == j and low >= self.ends[i]):
+            return ()  # between two ranges
+        return [address for address in addresses if self.contains(address)]
+
+
+def function_ranges(symbols, patterns):
+    # [start, end) of the functions matching any of the shell-style
+    # patterns, e.g. "uart_*"
+    index = SymbolIndex(symbols)
+    ranges = []
+    for pattern in patterns:
+        matches = [
+            (index.starts[i], index.ends[i])
+            for i, name in enumerate(index.names)
+            if fnmatchcase(name, pattern)
+        ]
+        if not matches:
+            raise ValueError(f"No function matches {pattern}")
+        ranges += matches
+    return ranges
+
+
+def build_trace_filter(
+    address_ranges=None, functions=None, privileges=None, symbols=None
+):
+    # address_ranges: (start, end) tuples, None is open; functions: name
+    # patterns resolved in symbols, see load_symbols; privileges: names of
+    # Privilege, e.g. "U"; None if nothing is filtered
+    if not (address_ranges or functions or privileges):
+        return None
+    ranges = None
+    if address_ranges or functions:
+        ranges = [
+            (start or 0, ADDRESS_SPACE_END if end is None else end)
+            for start, end in address_ranges or ()
+        ]
+        if functions:
+            ranges += function_ranges(symbols, functions)
+    if privileges:
+        privileges = [Privilege[name] for name in privileges]
+    return TraceFilter(ranges, privileges or None)
+
+
+class FilteredTraceSink(TraceSink):
+    # forwards to the sink only the pcs the filter keeps, before they are
+    # formatted: the blocks replayed by the path cache are dropped at
+    # once when outside the ranges or at another privilege level
+    def __init__(self, sink, trace_filter: TraceFilter):
+        self.sink = sink
+        self.filter = trace_filter
+        self.privileges = trace_filter.privileges
+
+    def report(self, address, state: TraceState):
+        if (
+            self.privileges is None or state.privilege in self.privileges
+        ) and self.filter.contains(address):
+            self.sink.report(address, state)
+
+    def report_block(self, addresses, state: TraceState):
+        if self.privileges is not None and (
+            state.privilege not in self.privileges
+        ):
+            return
+        addresses = self.filter.select(addresses)
+        if addresses:
+            self.sink.report_block(addresses, state)
+
+    def position(self):
+        return self.sink.position()
+
+    def close(self):
+        self.sink.close()
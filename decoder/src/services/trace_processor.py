@@ -18,12 +18,8 @@
 from .trace_processor_utils import *
 
 from src.domain.enums import Ioptions, QualStatus
-from src.domain.trace_processor_model import (
-    DiscoveryResponse,
-    TraceState,
-)
-
-discovery_response = DiscoveryResponse()
+from src.domain.trace_processor_model import TraceState
+from src.domain.errors import DecodeError
 
 
 def process_te_inst(
@@ -46,7 +42,9 @@ def process_te_inst(
                 return
 
         state.inferred_address = False  # flag reset
-        state.address = te_inst.address << discovery_response.iaddress_lsb
+        state.address = (
+            te_inst.address << state.discovery_response.iaddress_lsb
+        )
         if te_inst.subformat == 1 or state.start_of_trace == True:
             state.branches = 0
             state.branch_map = 0
@@ -61,27 +59,28 @@ def process_te_inst(
             follow_execution_path(te_inst, state)
         else:
             state.pc = state.address
+            # the pc is reported at the privilege it retired at
+            state.privilege = te_inst.privilege
             report_pc(state.pc, state)
             state.last_pc = (
                 state.pc
             )  # previous pc not known but ensures correct, operation for is_sequential_jump()
-            state.privilege = te_inst.privilege
             state.start_of_trace = False
-            state.irstack_depth = 0
+            state.return_stack.clear()
 
     else:
         if state.start_of_trace:  # this should not be possible
-            raise Exception("ERROR: Expecting trace to start whit format 3")
+            raise DecodeError("ERROR: Expecting trace to start whit format 3")
 
         if te_inst.format == 2 or te_inst.branches != 0:
             state.stop_at_last_branch = False
             if state.options[Ioptions.FULL_ADDRESS]:
                 state.address = (
-                    te_inst.address << discovery_response.iaddress_lsb
+                    te_inst.address << state.discovery_response.iaddress_lsb
                 )
             else:
                 state.address += (
-                    te_inst.address << discovery_response.iaddress_lsb
+                    te_inst.address << state.discovery_response.iaddress_lsb
                 )
 
         if te_inst.format == 1:
@@ -101,6 +100,15 @@ def process_te_inst(
 def follow_execution_path(
     te_inst, state: TraceState
 ):  # follow execution path to reported address
+    # repeated segments are replayed from the path cache when enabled
+    if state.path_cache is not None:
+        state.path_cache.follow(te_inst, state, walk_execution_path)
+        return
+    walk_execution_path(te_inst, state)
+
+
+def walk_execution_path(te_inst, state: TraceState):
+    # follows the execution path instruction by instruction
     # local variables
     previous_address = state.pc
     stop_here = False
@@ -130,7 +138,7 @@ def follow_execution_path(
             if stop_here:
                 # reached reported address following an uninferable discontinuity, stop here
                 if unprocessed_branches(state.pc, state):
-                    raise Exception("ERROR: Unprocessed state.branches")
+                    raise DecodeError("ERROR: Unprocessed state.branches")
                 return
 
             if (
@@ -193,10 +201,10 @@ def next_pc(te_inst, state: TraceState):  # compute next pc
     ):  # lui/auipc followed by jump using the same register
         state.pc = sequential_jump_target(state.pc, state.last_pc)
     elif is_implicit_return(instr, te_inst, state):
-        state.pc = pop_return_stack()
+        state.pc = pop_return_stack(state)
     elif is_uninferable_discon(instr):
         if state.stop_at_last_branch:
-            raise Exception("ERROR: Unexpected uninferable discontinuity")
+            raise DecodeError("ERROR: Unexpected uninferable discontinuity")
         else:
             state.pc = state.address
             stop_here = True
@@ -209,7 +217,7 @@ def next_pc(te_inst, state: TraceState):  # compute next pc
         state.pc += instruction_size(instr)
 
     if is_call(instr):
-        push_return_stack(this_pc)
+        push_return_stack(this_pc, state)
 
     state.last_pc = this_pc
     return stop_here
@@ -238,36 +246,22 @@ def unprocessed_branches(
     return state.branches != (1 if is_branch(get_instr(address, state)) else 0)
 
 
-def push_return_stack(state: TraceState):
+def push_return_stack(address, state: TraceState):
     if (
         state.options[Ioptions.IMPLICIT_RETURN] == False
     ):  # implicit return mode disabled
         return
 
-    # local variables
-    if discovery_response.return_stack_size:
-        state.irstack_depth_max = 2**discovery_response.return_stack_size
-    else:
-        state.irstack_depth_max = 2**discovery_response.call_counter_size
-
-    instr = get_instr(state.address)
-    link = state.address
-    if state.irstack_depth == state.irstack_depth_max:
-        # delete oldest entry from stack to make room for new entry added below
-        state.irstack_depth -= 1
-        for i in range(state.irstack_depth):
-            state.return_stack[i] = state.return_stack[i + 1]
-    link += instruction_size(instr)
-    state.return_stack[state.irstack_depth] = link
-    state.irstack_depth += 1
+    # the stack is sized from the discovery response and, when full, drops
+    # its oldest entry to make room for the new one
+    instr = get_instr(address, state)
+    state.return_stack.push(address + instruction_size(instr))
     return
 
 
 def pop_return_stack(state: TraceState):  # pop address from return stack
     # function not called if state.irstack_depth is 0, so no need to check for underflow
-    state.irstack_depth -= 1  
-    link = state.return_stack[state.irstack_depth]
-    return link
+    return state.return_stack.pop()
 
 
 def exception_address(te_inst, state: TraceState):
@@ -20,6 +20,7 @@ from .instruction_logger import log_instruction
 from src.domain.trace_processor_model import TraceState, Instruction
 from src.domain.enums import Ioptions
 from src.domain.const import COMPRESSED_INSTRUCTION_SIZE, INSTRUCTION_SIZE
+from src.domain.errors import DecodeError, EndOfTrace
 
 
 def is_taken_branch(instr, state: TraceState):  
@@ -29,7 +30,7 @@ def is_taken_branch(instr, state: TraceState):
     if not is_branch(instr):
         return False
     if state.branches == 0:
-        raise Exception("ERROR: Cannot resolve branch")
+        raise DecodeError("ERROR: Cannot resolve branch")
     else:
         taken = (state.branch_map & 1) == 0  # taken=!branch[0]
         state.branches -= 1
@@ -140,7 +141,7 @@ def is_implicit_return(instr, te_inst, state: TraceState):
         instr.opcode == "c.jr" and instr.rs1 == 1
     ):
         if (
-            te_inst.irreport != get_preceding_bit(te_inst, "irreport")
+            te_inst.irreport != get_preceding_bit(te_inst, "irreport", state)
             and te_inst.irdepth == state.irstack_depth
         ):
             return False
@@ -155,36 +156,39 @@ def instruction_size(instr):
 
 
 def report_pc(address, state: TraceState):
+    state.reported_pcs += 1
     log_instruction(address, state)
     return
 
 
 def get_preceding_bit(te_inst, field_name, state: TraceState):
     # returns the value of the specified bit `field_name` from the te_inst packet
-    # that precedes the given `te_inst` in the history
+    # that precedes the given `te_inst` in the capture
 
-    try:
-        # find the index of the given te_inst in history
-        index = state.te_inst_list.index(te_inst)
+    # packets are streamed, the decoder keeps track of the preceding one
+    if state.prev_te_inst is None:
+        return None  # no preceding value available
 
-        # ensure there is a preceding packet
-        if index == 0:
-            return None  # no preceding value available
-
-        # return the value of the requested field from the preceding packet
-        return getattr(state.te_inst_list[index - 1], field_name, None)
-
-    except ValueError:
-        # te_inst is not found in history
-        raise Exception("ERROR: te_inst not found in te_inst_history")
+    # return the value of the requested field from the preceding packet
+    return getattr(state.prev_te_inst, field_name, None)
 
 
 def get_instr(address, state: TraceState):
     # retrieves an instruction object from the instruction map given an address
     # only considers instructions present in the discontinuities map
 
+    # instructions are decoded only once, then served from the cache
+    instr = state.instr_cache.get(address)
+    if instr is not None:
+        return instr
+
+    # the misses are counted for the profiler, the hits are the lookups
+    # it counts minus the misses, so nothing is added to the cached path
+    state.instr_cache_misses += 1
     if address not in state.instruction_map:
-        raise Exception(f"ERROR: Address {hex(address)} is not an instruction")
+        raise DecodeError(
+            f"ERROR: Address {hex(address)} is not an instruction"
+        )
 
     # get the instruction mnemonic and operands
     mnemonic, op_str = state.instruction_map[address]
@@ -202,8 +206,8 @@ def get_instr(address, state: TraceState):
         rd, rs1, imm = operands
     elif opcode in {"jal", "c.j", "c.jal", "c.jr", "c.jalr"}:
         imm = operands[0]
-        if imm == "0": # end of trace recursive jump
-            exit()
+        if imm == "0":  # end of trace recursive jump
+            raise EndOfTrace()
 
     elif opcode in {"beq", "bne", "blt", "bge", "bltu", "bgeu"}:
         rs1, rs2, imm = operands
@@ -219,7 +223,9 @@ def get_instr(address, state: TraceState):
     }:
         rd, rs1 = operands
 
-    return Instruction(opcode, rd, rs1, rs2, imm)
+    instr = Instruction(opcode, rd, rs1, rs2, imm)
+    state.instr_cache[address] = instr
+    return instr
 
 
 # NOT IMPLEMENTED
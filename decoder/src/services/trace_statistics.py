@@ -0,0 +1,301 @@
+# Copyright (C) 2025 ETH Zurich and University of Bologna
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# imports
+import json
+import re
+import sys
+
+from collections import Counter
+
+from .packet_parser import (
+    convert_line,
+    find_address_len,
+    find_branch_map_len,
+    read_blocks,
+    parse_packet,
+)
+
+from src.domain.encoder_profile import EncoderProfile, DEFAULT_PROFILE
+from src.domain.packet_parser_model import ParserContext
+
+# the statistics read two bytes of every frame: the last payload byte,
+# whose low 7 bits hold the format, the subformat or the branch count of
+# format 1 packets, and the header, whose low 5 bits are the payload length
+_LOW_7_BITS = bytes(byte & 0x7F for byte in range(256))
+_LOW_5_BITS = bytes(byte & 0x1F for byte in range(256))
+_LOW_4_BITS = bytes(byte & 0x0F for byte in range(256))
+_SYNC_START = b"\x03"  # format 3, subformat 0, as low 4 bits
+_SUPPORT = re.compile(b"\x0f")  # format 3, subformat 3
+
+STATISTICS_FRAMES_PER_BLOCK = 1 << 16  # frames counted at once
+PACKET_TYPES = ["F0", "F1", "F2", "F3SF0", "F3SF1", "F3SF2", "F3SF3"]
+
+
+def _packet_type(key: int) -> str:
+    format = key & 0x3
+    if format == 3:
+        return f"F3SF{key >> 2 & 0x3}"
+    return f"F{format}"
+
+
+class TraceStatistics:
+    # encoder efficiency figures of a capture, computed on the frame bytes
+    # without parsing the packets nor decoding the trace
+    # the frames are counted by (last payload byte, payload length) pairs,
+    # a few thousand distinct values that are expanded into the statistics
+    # at the end; only the support packets are parsed, to know whether the
+    # addresses that follow are delta or full
+    def __init__(self, profile: EncoderProfile = DEFAULT_PROFILE):
+        self.profile = profile
+        self.full_address = ParserContext(profile).full_address
+        self.support_modes = {}  # support packet payload -> full address
+        self.frames = 0
+        self.delta_pairs = Counter()  # pairs with delta addresses
+        self.full_pairs = Counter()  # pairs with full addresses
+        self.first_time = None
+        self.last_time = None
+        # first and last sync start packets, as (index, timestamp)
+        self.first_sync = None
+        self.last_sync = None
+
+    def _timestamp(self, block: bytes, index: int) -> int:
+        offset = index * self.profile.chunk_size
+        return int.from_bytes(
+            block[
+                offset + self.profile.payload_end // 8 : offset
+                + self.profile.timestamp_end // 8
+            ],
+            "big",
+        )
+
+    def _support_mode(self, payload: bytes) -> bool:
+        # full address mode set by a support packet, the payloads repeat
+        # so each is parsed once
+        context = ParserContext(self.profile)
+        parse_packet(convert_line(payload), context)
+        self.support_modes[payload] = context.full_address
+        return context.full_address
+
+    def add_block(self, block: bytes):
+        """counts a block of whole frames"""
+        size = self.profile.chunk_size
+        frames = len(block) // size
+        if not frames:
+            return
+        last_bytes = block[self.profile.payload_end // 8 - 1 :: size]
+        headers = block[size - 1 :: size]
+        pairs = bytearray(2 * frames)
+        pairs[0::2] = last_bytes.translate(_LOW_7_BITS)
+        pairs[1::2] = headers.translate(_LOW_5_BITS)
+        pairs = memoryview(pairs).cast("H")
+
+        # the frames up to a support packet changing the address mode are
+        # counted with the mode in force before it
+        nibbles = last_bytes.translate(_LOW_4_BITS)
+        payload_end = self.profile.payload_end // 8
+        modes = self.support_modes
+        start = 0
+        full_address = self.full_address
+        for match in _SUPPORT.finditer(nibbles):
+            index = match.start()
+            end = index * size + payload_end
+            length = block[index * size + size - 1] & 0x1F
+            payload = block[end - length : end]
+            if not payload:
+                continue
+            mode = modes.get(payload)
+            if mode is None:
+                mode = self._support_mode(payload)
+            if mode == full_address:
+                continue
+            counter = self.full_pairs if full_address else self.delta_pairs
+            counter.update(pairs[start : index + 1])
+            start = index + 1
+            full_address = mode
+        counter = self.full_pairs if full_address else self.delta_pairs
+        counter.update(pairs[start:])
+        self.full_address = full_address
+
+        first = nibbles.find(_SYNC_START)
+        if first >= 0:
+            last = nibbles.rfind(_SYNC_START)
+            if self.first_sync is None:
+                self.first_sync = (
+                    self.frames + first,
+                    self._timestamp(block, first),
+                )
+            self.last_sync = (self.frames + last, self._timestamp(block, last))
+        if self.first_time is None:
+            self.first_time = self._timestamp(block, 0)
+        self.last_time = self._timestamp(block, frames - 1)
+        self.frames += frames
+
+    def _address_len(self, key: int, length: int) -> int:
+        # compressed address bits of a format 1 or 2 packet, None if the
+        # packet has no address
+        profile = self.profile
+        if key & 0x3 == 2:
+            known_fields_len = profile.f2_known_fields_len
+        else:
+            branch_map_len = find_branch_map_len(key >> 2)
+            # format 1 packets are only as long as the branch map when
+            # they carry no address, see packet_parser.py
+            if length == (7 + branch_map_len + 7) // 8:
+                return None
+            known_fields_len = profile.f1_known_fields_len + branch_map_len
+        return find_address_len(length * 8, known_fields_len)[0]
+
+    def report(self, retired: int = None) -> dict:
+        """expands the counted pairs into the statistics"""
+        packets = Counter()
+        payload_bytes = Counter()
+        branches = Counter()  # branches of a format 1 packet -> packets
+        address_bits = Counter()  # compressed delta address bits -> packets
+        full_addresses = 0
+        for pairs, full_address in (
+            (self.delta_pairs, False),
+            (self.full_pairs, True),
+        ):
+            for pair, count in pairs.items():
+                key, length = pair.to_bytes(2, sys.byteorder)
+                packet_type = _packet_type(key)
+                packets[packet_type] += count
+                payload_bytes[packet_type] += length * count
+                if packet_type == "F1":
+                    # 0 stands for a full branch map
+                    branches[key >> 2 or 31] += count
+                if packet_type not in ("F1", "F2"):
+                    continue
+                if full_address:
+                    if self._address_len(key, length) is not None:
+                        full_addresses += count
+                    continue
+                bits = self._address_len(key, length)
+                if bits is not None:
+                    address_bits[bits] += count
+
+        frames = self.frames
+        total_payload = sum(payload_bytes.values())
+        capture_bytes = frames * self.profile.chunk_size
+        cycles = 0
+        if frames:
+            cycles = self.last_time - self.first_time
+        f1_packets = packets["F1"]
+        total_branches = sum(n * count for n, count in branches.items())
+        delta_addresses = sum(address_bits.values())
+        syncs = packets["F3SF0"]
+
+        statistics = {
+            "frames": frames,
+            "capture_bytes": capture_bytes,
+            "payload_bytes": total_payload,
+            "mean_payload_bytes": total_payload / frames if frames else 0.0,
+            "cycles": cycles,
+            "payload_bytes_per_cycle": (
+                total_payload / cycles if cycles else 0.0
+            ),
+            "packets": {
+                packet_type: {
+                    "count": packets[packet_type],
+                    "percent": (
+                        100 * packets[packet_type] / frames if frames else 0.0
+                    ),
+                    "mean_payload_bytes": (
+                        payload_bytes[packet_type] / packets[packet_type]
+                        if packets[packet_type]
+                        else 0.0
+                    ),
+                }
+                for packet_type in PACKET_TYPES
+            },
+            "branches": {
+                "total": total_branches,
+                "per_format1_packet": (
+                    total_branches / f1_packets if f1_packets else 0.0
+                ),
+                "histogram": dict(sorted(branches.items())),
+            },
+            "addresses": {
+                "delta": delta_addresses,
+                "full": full_addresses,
+                "mean_delta_bits": (
+                    sum(bits * count for bits, count in address_bits.items())
+                    / delta_addresses
+                    if delta_addresses
+                    else 0.0
+                ),
+                "delta_bits_histogram": dict(sorted(address_bits.items())),
+            },
+            "resync": {
+                "sync_packets": syncs,
+                "trap_packets": packets["F3SF1"],
+                "packets_between_syncs": None,
+                "cycles_between_syncs": None,
+            },
+            "retired": retired,
+            "bytes_per_retired": None,
+            "payload_bytes_per_retired": None,
+        }
+        if syncs > 1:
+            first_index, first_time = self.first_sync
+            last_index, last_time = self.last_sync
+            statistics["resync"]["packets_between_syncs"] = (
+                last_index - first_index
+            ) / (syncs - 1)
+            statistics["resync"]["cycles_between_syncs"] = (
+                last_time - first_time
+            ) / (syncs - 1)
+        if retired:
+            statistics["bytes_per_retired"] = capture_bytes / retired
+            statistics["payload_bytes_per_retired"] = total_payload / retired
+        return statistics
+
+
+def collect_statistics(
+    file, profile: EncoderProfile = DEFAULT_PROFILE
+) -> TraceStatistics:
+    """counts the frames of a binary stream in a single pass"""
+    statistics = TraceStatistics(profile)
+    for block in read_blocks(
+        file, STATISTICS_FRAMES_PER_BLOCK, profile.chunk_size
+    ):
+        statistics.add_block(block)
+    return statistics
+
+
+def _format_value(value) -> str:
+    if isinstance(value, float):
+        return f"{value:.3f}"
+    if value is None:
+        return "-"
+    return str(value)
+
+
+def write_statistics(statistics: dict, output, as_json: bool = False):
+    """writes the statistics as JSON or as indented text"""
+    if as_json:
+        json.dump(statistics, output, indent=2)
+        output.write("\n")
+        return
+
+    def write(items, indent):
+        for name, value in items:
+            if isinstance(value, dict):
+                output.write(f"{indent}{name}:\n")
+                write(value.items(), indent + "  ")
+            else:
+                output.write(f"{indent}{name}: {_format_value(value)}\n")
+
+    write(statistics.items(), "")
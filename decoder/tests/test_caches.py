@@ -0,0 +1,79 @@
+# Copyright (C) 2025 ETH Zurich and University of Bologna
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# path and packet caches: the trace of each test capture must be the same
+# with the default caches, without them and with a single entry, where
+# every miss evicts
+#
+# usage (from the decoder directory):
+#   python3 -m pytest tests   or   python3 -m unittest discover tests
+
+# imports
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+DECODER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TESTS = [
+    (
+        "tests/hello_culsans/packets.bin",
+        "tests/hello_culsans/hello_culsans.riscv",
+    ),
+    ("tests/l1_test/packets.bin", "tests/l1_test/l1.riscv"),
+]
+CACHE_SIZES = ["0", "1"]
+
+
+class CachesTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmp.name, "cache")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _trace(self, capture, elf, options):
+        output = os.path.join(self.tmp.name, "trace")
+        subprocess.run(
+            [sys.executable, "main.py", capture, elf, "-f", "text"]
+            + ["-o", output, "--cache-dir", self.cache_dir]
+            + options,
+            cwd=DECODER_DIR,
+            check=True,
+            capture_output=True,
+        )
+        with open(output) as f:
+            return f.read()
+
+    def test_cache_sizes(self):
+        for capture, elf in TESTS:
+            expected = self._trace(capture, elf, [])
+            self.assertTrue(expected)
+            for size in CACHE_SIZES:
+                with self.subTest(capture=capture, size=size):
+                    self.assertEqual(
+                        self._trace(
+                            capture,
+                            elf,
+                            ["--path-cache", size, "--packet-cache", size],
+                        ),
+                        expected,
+                    )
+
+
+if __name__ == "__main__":
+    unittest.main()
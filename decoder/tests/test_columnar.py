@@ -0,0 +1,75 @@
+# Copyright (C) 2025 ETH Zurich and University of Bologna
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# rows of the packets columnar file: every field as wide as the parser
+# reads it must fit its column, at XLEN 64 too
+#
+# usage (from the decoder directory):
+#   python3 -m pytest tests   or   python3 -m unittest discover tests
+
+# imports
+import os
+import sys
+import tempfile
+import unittest
+
+from types import SimpleNamespace
+
+DECODER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DECODER_DIR)
+
+from src.services.columnar import (
+    ColumnarReader,
+    ColumnarWriter,
+    PACKET_SCHEMA,
+    packet_row,
+)
+
+TOP_BIT = 1 << 63
+
+
+class PacketRowTest(unittest.TestCase):
+    def test_full_width_fields(self):
+        # a trap packet with the top bit set in every XLEN wide field, and
+        # the widest irdepth (call_counter_size 6)
+        packet = SimpleNamespace(
+            format=3,
+            subformat=1,
+            address=TOP_BIT | 0x80,
+            ecause=TOP_BIT | 7,
+            tval=TOP_BIT | 1,
+            irdepth=TOP_BIT | 2,
+            thaddr=1,
+            branch_map=(1 << 31) - 1,
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "packets.col")
+            writer = ColumnarWriter(open(path, "wb"), PACKET_SCHEMA)
+            writer.append(packet_row(0, 0, packet))
+            writer.close()
+            with ColumnarReader(path) as reader:
+                columns = reader.read()
+        # the 64 bit columns hold the values as two's complement
+        for name in ("address", "ecause", "tval", "irdepth"):
+            with self.subTest(field=name):
+                self.assertEqual(
+                    columns[name][0] & ((1 << 64) - 1), getattr(packet, name)
+                )
+        self.assertEqual(columns["thaddr"][0], 1)
+        self.assertEqual(columns["branch_map"][0], packet.branch_map)
+        self.assertEqual(columns["branches"][0], -1)  # not in the packet
+
+
+if __name__ == "__main__":
+    unittest.main()
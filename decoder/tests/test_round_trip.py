@@ -0,0 +1,86 @@
+# Copyright (C) 2025 ETH Zurich and University of Bologna
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# round trip of the reference encoder: each test capture is decoded, the
+# trace turned back into retirement blocks and encoded again, and the new
+# capture decoded; the two traces must be byte for byte the same
+#
+# usage (from the decoder directory):
+#   python3 -m pytest tests   or   python3 -m unittest discover tests
+
+# imports
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+DECODER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DECODER_DIR)
+
+from src.services.elf_disassembler import get_instruction_map
+from src.services.reference_encoder import ReferenceEncoder, blocks_from_pcs
+
+TESTS = [
+    (
+        "tests/hello_culsans/packets.bin",
+        "tests/hello_culsans/hello_culsans.riscv",
+    ),
+    ("tests/l1_test/packets.bin", "tests/l1_test/l1.riscv"),
+]
+
+
+class RoundTripTest(unittest.TestCase):
+    def setUp(self):
+        # the instruction maps are cached in a directory of the test only
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmp.name, "cache")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _decode(self, capture, elf, output, output_format):
+        subprocess.run(
+            [sys.executable, "main.py", capture, elf]
+            + ["-f", output_format, "-o", output]
+            + ["--cache-dir", self.cache_dir],
+            cwd=DECODER_DIR,
+            check=True,
+            capture_output=True,
+        )
+        with open(output, "rb") as f:
+            return f.read()
+
+    def test_round_trip(self):
+        for capture, elf in TESTS:
+            with self.subTest(capture=capture):
+                output = os.path.join(self.tmp.name, "trace")
+                pcs = self._decode(capture, elf, output + ".pc", "pc")
+                trace = self._decode(capture, elf, output + ".txt", "text")
+                blocks = blocks_from_pcs(
+                    [int(line, 16) for line in pcs.splitlines()],
+                    get_instruction_map(elf),
+                )
+                encoded = os.path.join(self.tmp.name, "encoded.bin")
+                with open(encoded, "wb") as f:
+                    ReferenceEncoder().write(blocks, f)
+                self.assertTrue(trace)
+                self.assertEqual(
+                    self._decode(encoded, elf, output + ".txt", "text"),
+                    trace,
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
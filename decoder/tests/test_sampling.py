@@ -0,0 +1,85 @@
+# Copyright (C) 2025 ETH Zurich and University of Bologna
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# sampled decode of every segment: the function profile of each test
+# capture with --sample 1 must be the one of the decode without sampling
+#
+# usage (from the decoder directory):
+#   python3 -m pytest tests   or   python3 -m unittest discover tests
+
+# imports
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+DECODER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# gpios_all has decode errors, it is decoded with --recover
+TESTS = [
+    (
+        "tests/hello_culsans/packets.bin",
+        "tests/hello_culsans/hello_culsans.riscv",
+        [],
+    ),
+    ("tests/l1_test/packets.bin", "tests/l1_test/l1.riscv", []),
+    (
+        "tests/gpios_all/packets.bin",
+        "tests/gpios_all/gpios_all.riscv",
+        ["--recover"],
+    ),
+]
+CI95_COLUMN = "instructions_ci95"
+
+
+class SamplingTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmp.name, "cache")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _profile(self, capture, elf, options):
+        # rows of the functions output, without the confidence intervals
+        output = os.path.join(self.tmp.name, "profile.tsv")
+        subprocess.run(
+            [sys.executable, "main.py", capture, elf, "-f", "functions"]
+            + ["-o", output, "--cache-dir", self.cache_dir]
+            + options,
+            cwd=DECODER_DIR,
+            check=True,
+            capture_output=True,
+        )
+        with open(output) as f:
+            rows = [line.rstrip("\n").split("\t") for line in f]
+        if CI95_COLUMN in rows[0]:
+            column = rows[0].index(CI95_COLUMN)
+            rows = [row[:column] + row[column + 1 :] for row in rows]
+        return rows
+
+    def test_sample_every_segment(self):
+        for capture, elf, options in TESTS:
+            with self.subTest(capture=capture):
+                exact = self._profile(capture, elf, options)
+                self.assertGreater(len(exact), 1)
+                self.assertEqual(
+                    self._profile(capture, elf, options + ["--sample", "1"]),
+                    exact,
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+# Copyright (C) 2025 ETH Zurich and University of Bologna
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# imports
+import argparse
+import sys
+
+from src.services.trace_diff import (
+    TraceStream,
+    TraceDiff,
+    DumpCheck,
+    load_dump,
+    write_diff_report,
+    write_dump_report,
+    DEFAULT_MAX_REPORTED,
+    RESYNC_RUN,
+    RESYNC_WINDOW,
+)
+
+# compares a decoded trace with a reference, in bounded memory:
+# 1. with another trace, e.g. a commit log of an ISA simulator, walking
+#    both in lockstep and resynchronizing after each mismatch
+# 2. with the objdump disassembly of the compiled file (--dump)
+# 3. with the digest of a reference trace (--digest), without the trace
+# the exit status is 0 when they agree, 1 otherwise
+
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError("must be at least 1")
+    return number
+
+
+parser = argparse.ArgumentParser(
+    prog="trace_diff.py",
+    description="compare a decoded trace with a reference trace, a "
+    "disassembly or a digest",
+)
+parser.add_argument(
+    "trace",
+    help="decoded trace: text, pc or columnar output of main.py",
+)
+parser.add_argument(
+    "reference",
+    nargs="?",
+    help="reference trace: output of main.py or a spike commit log",
+)
+parser.add_argument(
+    "--dump",
+    metavar="FILE",
+    help="objdump disassembly of the compiled file: every pc must be an "
+    "instruction and follow the previous one unless that transfers control",
+)
+parser.add_argument(
+    "--digest",
+    metavar="HEX",
+    help="expected digest of the pcs of the trace, as printed by a "
+    "previous comparison",
+)
+parser.add_argument(
+    "-n",
+    "--max-mismatches",
+    metavar="N",
+    type=positive_int,
+    default=DEFAULT_MAX_REPORTED,
+    help=f"mismatches reported in detail (default: {DEFAULT_MAX_REPORTED})",
+)
+parser.add_argument(
+    "--window",
+    metavar="PCS",
+    type=positive_int,
+    default=RESYNC_WINDOW,
+    help="pcs searched in each trace to resynchronize after a mismatch "
+    f"(default: {RESYNC_WINDOW})",
+)
+parser.add_argument(
+    "--run",
+    metavar="PCS",
+    type=positive_int,
+    default=RESYNC_RUN,
+    help="equal pcs in a row that resynchronize the traces "
+    f"(default: {RESYNC_RUN})",
+)
+args = parser.parse_args()
+
+if args.reference is None and args.dump is None and args.digest is None:
+    parser.error("give a reference trace, --dump or --digest")
+
+equal = True
+if args.reference is not None:
+    diff = TraceDiff(
+        TraceStream(args.trace),
+        TraceStream(args.reference),
+        args.max_mismatches,
+        args.window,
+        args.run,
+    ).compare()
+    write_diff_report(diff, sys.stdout)
+    equal &= diff.equal()
+    digest = diff.trace.digest()
+if args.dump is not None:
+    check = DumpCheck(
+        TraceStream(args.trace), load_dump(args.dump), args.max_mismatches
+    ).compare()
+    write_dump_report(check, sys.stdout)
+    equal &= check.equal()
+    digest = check.trace.digest()
+if args.digest is not None:
+    if args.reference is None and args.dump is None:
+        stream = TraceStream(args.trace)
+        stream.drain()
+        digest = stream.digest()
+    same = digest == args.digest.lower()
+    print(f"{digest}  {args.trace}: {'same' if same else 'different'} digest")
+    equal &= same
+sys.exit(0 if equal else 1)
@@ -18,7 +18,10 @@
 import te_pkg::*;
 localparam N = 2;
 
-module tb_te_branch_map();
+module tb_te_branch_map #(
+    // lines of the testvector file, see tb/testvectors.py
+    parameter int unsigned TV_LINES = 39
+)();
 
     logic clk;
     logic reset;
@@ -43,6 +46,12 @@ module tb_te_branch_map();
     // iteration variable
     logic [31:0] i;
 
+    // testvector file, another one with +tv=<file>
+    string  tv_file;
+    // file of the outputs, with +dump=<file>
+    integer dump;
+    string  dump_file;
+
     // DUT instantiation
     te_branch_map #(
         .N(2)
@@ -58,17 +67,27 @@ module tb_te_branch_map();
         .is_empty_o    (is_empty_o)
     );
 
-    logic [42:0] test_vector[1000:0];
+    logic [42:0] test_vector[TV_LINES-1:0];
     //    length of line   # of lines
 
     initial begin // reading test vector
-        $readmemb("./tb/testvectors/tv_te_branch_map.txt", test_vector);
+        tv_file = "./tb/testvectors/tv_te_branch_map.txt";
+        void'($value$plusargs("tv=%s", tv_file));
+        $readmemb(tv_file, test_vector);
         i = 0;
-        reset = 0; #10;
+        dump = 0;
+        if ($value$plusargs("dump=%s", dump_file)) begin
+            dump = $fopen(dump_file, "w");
+        end
+        // released between two rising edges, not racing with them
+        reset = 0; @(negedge clk);
         reset = 1;            
     end
 
     always @(posedge clk) begin // on posedge we get expected output
+        // the inputs change after the edge, the registers sample them at
+        // the next one
+        #1;
         {
             valid_i,
             branch_taken_i,
@@ -77,7 +96,7 @@ module tb_te_branch_map();
             expected_branches,
             expected_is_full,
             expected_is_empty
-        } = test_vector[i]; #10; 
+        } = test_vector[i];
     end
 
     always @(negedge clk) begin// on negedge we compare the expected result with the actual one
@@ -97,8 +116,21 @@ module tb_te_branch_map();
         if(expected_is_empty !== is_empty_o) begin
             $display("Wrong is_empty: %b!=%b", expected_is_empty, is_empty_o);
         end
+        // outputs for tb/testvectors.py compare
+        if (dump != 0) begin
+            $fdisplay(dump, "%b", {
+                map_o, branches_o, is_full_o, is_empty_o
+            });
+        end
         // index increase
         i = i + 1;
+        // end of the testvectors, the dump is flushed
+        if (i == TV_LINES) begin
+            if (dump != 0) begin
+                $fclose(dump);
+            end
+            $finish;
+        end
     end
 
     always begin
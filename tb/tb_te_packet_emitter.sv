@@ -17,7 +17,10 @@
 
 import te_pkg::*;
 
-module tb_te_packet_emitter();
+module tb_te_packet_emitter #(
+    // lines of the testvector file, see tb/testvectors.py
+    parameter int unsigned TV_LINES = 8
+)();
 
     logic clk;
     logic reset;
@@ -72,6 +75,12 @@ module tb_te_packet_emitter();
     // iteration variable
     logic [31:0] i;
 
+    // testvector file, another one with +tv=<file>
+    string  tv_file;
+    // file of the outputs, with +dump=<file>
+    integer dump;
+    string  dump_file;
+
     // DUT instantiation
     te_packet_emitter DUT(
         .clk_i                    (clk),
@@ -90,7 +99,8 @@ module tb_te_packet_emitter();
         .tc_branch_i              (tc_branch_i),
         .tc_branch_taken_i        (tc_branch_taken_i),
         .tc_priv_i                (tc_priv_i),
-        .time_i                   (time_i),
+        .tc_time_i                (time_i),
+        .tc_resync_i              (1'b0),
         .tc_address_i             (tc_address_i),
         .lc_tc_mux_i              (lc_tc_mux_i),
         .thaddr_i                 (thaddr_i),
@@ -113,18 +123,28 @@ module tb_te_packet_emitter();
         .addr_to_compress_o       (addr_to_compress_o)
     );
 
-    logic [569:0] test_vector[1000:0];
+    logic [906:0] test_vector[TV_LINES-1:0];
     //     length of line    # of lines
 
     initial begin // reading test vector
-        $readmemb("./tb/testvectors/tv_te_packet_emitter.txt", test_vector);
+        tv_file = "./tb/testvectors/tv_te_packet_emitter.txt";
+        void'($value$plusargs("tv=%s", tv_file));
+        $readmemb(tv_file, test_vector);
         i = 0;
-        reset = 0; #10;
+        dump = 0;
+        if ($value$plusargs("dump=%s", dump_file)) begin
+            dump = $fopen(dump_file, "w");
+        end
+        // released between two rising edges, not racing with them
+        reset = 0; @(negedge clk);
         reset = 1;  // set == 1 -> no reset each cycle
                     // set == 0 -> reset each cycle
     end
 
     always @(posedge clk) begin
+        // the inputs change after the edge, the registers sample them at
+        // the next one
+        #1;
         {
             valid_i,
             packet_format_i,
@@ -161,7 +181,7 @@ module tb_te_packet_emitter();
             expected_payload_length,
             expected_branch_map_flush,
             expected_addr_to_compress
-        } = test_vector[i]; #10;
+        } = test_vector[i];
         
     end
 
@@ -172,7 +192,7 @@ module tb_te_packet_emitter();
         end
         // packet_type_o
         if(expected_packet_type !== packet_type_o) begin
-            $display("Wrong valid: %b!=%b", expected_packet_type, packet_type_o);
+            $display("Wrong type: %b!=%b", expected_packet_type, packet_type_o);
         end
         // packet_payload_o
         if(expected_packet_payload !== packet_payload_o) begin
@@ -191,8 +211,22 @@ module tb_te_packet_emitter();
             $display("Wrong address to compress: %b!=%b", expected_addr_to_compress, addr_to_compress_o);
         end
 
+        // outputs for tb/testvectors.py compare
+        if (dump != 0) begin
+            $fdisplay(dump, "%b", {
+                packet_valid_o, packet_type_o, packet_payload_o,
+                payload_length_o, branch_map_flush_o, addr_to_compress_o
+            });
+        end
         // index increase
         i = i + 1;
+        // end of the testvectors, the dump is flushed
+        if (i == TV_LINES) begin
+            if (dump != 0) begin
+                $fclose(dump);
+            end
+            $finish;
+        end
     end
 
     always begin
@@ -0,0 +1,714 @@
+# Copyright (C) 2025 ETH Zurich and University of Bologna
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#      http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# SPDX-License-Identifier: Apache-2.0
+
+# testvectors for the tb_*.sv benches, from cycle accurate Python models of
+# the modules, and a comparator of the outputs dumped by the simulator
+#
+# a testvector line is what a bench loads with $readmemb: the inputs of a
+# cycle, "_", the outputs expected at the negative edge of that cycle, each
+# field as many bits as in the bench and in the bench order
+# the models assume the inputs of a line settle after the rising edge, so
+# the registers sample them at the next one
+#
+# usage (from the repository directory):
+#   python3 tb/testvectors.py generate te_branch_map -n 1000000 \
+#       -o branch_map.txt
+#   vsim ... -gTV_LINES=1000000 +tv=branch_map.txt +dump=branch_map.out
+#   python3 tb/testvectors.py compare te_branch_map \
+#       branch_map.txt branch_map.out
+#   python3 tb/testvectors.py expect te_branch_map \
+#       tb/testvectors/tv_te_branch_map.txt
+
+# imports
+import argparse
+import random
+import sys
+
+from itertools import islice
+
+TESTVECTORS_DIR = "tb/testvectors"
+
+# te_pkg
+PRIV_LEN = 2
+PAYLOAD_LEN = 248
+P_LEN = 5
+BRANCH_MAP_LEN = 31
+BRANCH_COUNT_LEN = 5
+IOPTIONS_LEN = 7
+TIME_LEN = 64
+
+# format_e, f_sync_subformat_e and it_packet_type_e
+F_OPT_EXT = 0
+F_DIFF_DELTA = 1
+F_ADDR_ONLY = 2
+F_SYNC = 3
+SF_START = 0
+SF_TRAP = 1
+SF_CONTEXT = 2
+SF_SUPPORT = 3
+F0SF0 = 0x0
+F1 = 0x4
+F2 = 0x8
+F3SF0 = 0xC
+F3SF1 = 0xD
+F3SF2 = 0xE
+F3SF3 = 0xF
+
+# bits of ioptions_s, delta_address_en is the most significant
+DELTA_ADDRESS_EN = 1 << 6
+FULL_ADDRESS_EN = 1 << 5
+
+
+def _clog2(value):
+    return max(value - 1, 0).bit_length()
+
+
+def _mask(bits):
+    return (1 << bits) - 1
+
+
+class BranchMapModel:
+    # te_branch_map with N ports
+    def __init__(self, n=2):
+        self.n = n
+        self.inputs = [("valid", n), ("branch_taken", n), ("flush", 1)]
+        self.outputs = [
+            ("map", BRANCH_MAP_LEN),
+            ("branches", BRANCH_COUNT_LEN),
+            ("is_full", 1),
+            ("is_empty", 1),
+        ]
+        # widths of the internal counters
+        self.status_len = n**3
+        self.to_serve_mask = _mask(max(_clog2(n**3), 1))
+        self.valid_left_mask = _mask(_clog2(n) + 1)
+        self.map_q = 0
+        self.count_q = 0
+        self.valid_left_q = 0
+        self.status_left_q = 0
+        self.valid_q = 0
+        self.taken_q = 0
+
+    def step(self, valid, branch_taken, flush):
+        outputs = (
+            self.map_q,
+            self.count_q,
+            int(self.count_q == BRANCH_MAP_LEN and not flush),
+            int(self.count_q == 0),
+        )
+
+        map_d = self.map_q
+        count_d = self.count_q
+        to_serve = self.valid_left_q
+        status_left = self.status_left_q
+        served = 0
+        if flush:
+            count_d = 0
+            map_d = 0
+        for i in range(self.n):
+            if self.valid_q >> i & 1:
+                bit = 1 << to_serve
+                if self.taken_q >> i & 1:
+                    status_left |= bit
+                else:
+                    status_left &= ~bit
+                to_serve = (to_serve + 1) & self.to_serve_mask
+        for i in range(to_serve):
+            if count_d < BRANCH_MAP_LEN:
+                bit = 1 << count_d
+                if status_left >> i & 1:
+                    map_d &= ~bit
+                else:
+                    map_d |= bit
+                count_d += 1
+                served = (served + 1) & self.to_serve_mask
+        status_left = (status_left >> served) & _mask(self.status_len)
+        valid_left = (to_serve - served) & self.valid_left_mask
+        if flush and not self.valid_q:
+            map_d = 0
+            count_d = 0
+        if served == to_serve:
+            valid_left = 0
+
+        self.map_q = map_d
+        self.count_q = count_d
+        self.valid_left_q = valid_left
+        self.status_left_q = status_left
+        self.valid_q = valid
+        self.taken_q = branch_taken
+        return outputs
+
+
+def priority_keep_bits(address, xlen):
+    # keep_bits_o of te_priority for an addr_to_compress, counts included:
+    # the leading zeros and ones are stored in $clog2(XLEN) bits
+    width = xlen + 1
+    address &= _mask(width)
+    if address == 0 or address == _mask(width):
+        return 1
+    zeros = width - address.bit_length()
+    ones = width - (address ^ _mask(width)).bit_length()
+    count_mask = _mask(_clog2(xlen))
+    zeros &= count_mask
+    ones &= count_mask
+    sign_extendable = zeros if zeros > ones else ones
+    return (width - sign_extendable + 1) & _mask(_clog2(xlen) + 1)
+
+
+class PacketEmitterModel:
+    # te_packet_emitter without implicit return support
+    # (CALL_COUNTER_SIZE == RETURN_STACK_SIZE == 0, as in te_pkg)
+    def __init__(self, xlen=64):
+        self.xlen = xlen
+        self.inputs = [
+            ("valid", 1),
+            ("packet_format", 2),
+            ("packet_subformat", 2),
+            ("lc_cause", xlen),
+            ("lc_tval", xlen),
+            ("lc_interrupt", 1),
+            ("tc_cause", xlen),
+            ("tc_tval", xlen),
+            ("tc_interrupt", 1),
+            ("nocontext", 1),
+            ("notime", 1),
+            ("tc_branch", 1),
+            ("tc_branch_taken", 1),
+            ("tc_priv", PRIV_LEN),
+            ("time", xlen),
+            ("tc_address", xlen),
+            ("lc_tc_mux", 1),
+            ("thaddr", 1),
+            ("tc_tvec", xlen),
+            ("lc_epc", xlen),
+            ("tc_ienable", 1),
+            ("encoder_mode", 1),
+            ("qual_status", 2),
+            ("ioptions", IOPTIONS_LEN),
+            ("lc_updiscon", 1),
+            ("branches", BRANCH_COUNT_LEN),
+            ("branch_map", BRANCH_MAP_LEN),
+            ("keep_bits", _clog2(xlen) + 1),
+            ("shallow_trace", 1),
+        ]
+        self.outputs = [
+            ("packet_valid", 1),
+            ("packet_type", 4),
+            ("packet_payload", PAYLOAD_LEN),
+            ("payload_length", P_LEN),
+            ("branch_map_flush", 1),
+            ("addr_to_compress", xlen + 1),
+        ]
+        self.latest_addr_q = 0
+        self.flush_q = 0
+
+    def _packet_type(self, i):
+        # (type, updates the latest address) of the packet of inputs i
+        if not i["valid"]:
+            return F0SF0, False
+        format = i["packet_format"]
+        if format == F_SYNC:
+            subformat = i["packet_subformat"]
+            return F3SF0 + subformat, subformat in (SF_START, SF_TRAP)
+        if format == F_ADDR_ONLY:
+            return F2, True
+        if format == F_DIFF_DELTA:
+            return F1, i["branches"] < BRANCH_MAP_LEN
+        return F0SF0, False
+
+    def addr_to_compress(self, i):
+        packet_type, update = self._packet_type(i)
+        xlen = self.xlen
+        diff = 0
+        address = 0
+        if i["valid"] and i["packet_format"] in (F_DIFF_DELTA, F_ADDR_ONLY):
+            if i["ioptions"] & DELTA_ADDRESS_EN:
+                diff = (i["tc_address"] - self.latest_addr_q) & _mask(xlen + 1)
+                address = diff
+            elif i["ioptions"] & FULL_ADDRESS_EN:
+                address = i["tc_address"]
+        latest = self.latest_addr_q
+        if update:
+            if packet_type in (F1, F2):
+                latest = i["tc_address"]
+                address = diff
+            elif packet_type == F3SF0:
+                latest = address = i["tc_address"]
+            elif packet_type == F3SF1:
+                latest = address = (
+                    i["tc_tvec"] if i["thaddr"] else i["lc_epc"]
+                )
+        return address, latest
+
+    def step(self, i):
+        xlen = self.xlen
+        packet_type, _ = self._packet_type(i)
+        address, latest = self.addr_to_compress(i)
+        address_off = ((i["keep_bits"] + 7) >> 3) & 0xF
+        address_len = address_off * 8 + 1
+        # the address field, and the fields that follow it, are written
+        # only for the sizes the RTL handles
+        sized = 1 <= address_off <= 8
+        field = address & _mask(address_len) if sized else 0
+
+        payload = 0
+        used = 0
+        flush = 0
+        if i["valid"]:
+            flush = i["shallow_trace"]
+            format = i["packet_format"]
+            payload = format
+            used = 2
+            branch = int(not (i["tc_branch"] and i["tc_branch_taken"]))
+            priv = i["tc_priv"]
+            time_and_context = (1 - i["notime"]) << 1 | (1 - i["nocontext"])
+            with_time = time_and_context == 0b10
+            plain = time_and_context == 0b00
+            if format == F_SYNC:
+                subformat = i["packet_subformat"]
+                payload |= subformat << 2
+                used += 2
+                if subformat in (SF_START, SF_TRAP):
+                    header = branch | priv << 1
+                    header_len = 1 + PRIV_LEN
+                    if with_time:
+                        header |= i["time"] << header_len
+                        header_len += xlen
+                if subformat == SF_START and (plain or with_time):
+                    used += header_len + address_len
+                    payload |= header << 4
+                    payload |= field << 4 + header_len
+                elif subformat == SF_TRAP and (plain or with_time):
+                    mux = i["lc_tc_mux"]
+                    cause = i["tc_cause"] if mux else i["lc_cause"]
+                    tval = i["tc_tval"] if mux else i["lc_tval"]
+                    interrupt = i["tc_interrupt"] if mux else i["lc_interrupt"]
+                    used += header_len + xlen + 2 + address_len + xlen
+                    header |= cause << header_len
+                    header_len += xlen
+                    header |= (interrupt | i["thaddr"] << 1) << header_len
+                    header_len += 2
+                    payload |= header << 4
+                    if sized:
+                        payload |= (field | tval << address_len) << (
+                            4 + header_len
+                        )
+                elif subformat == SF_CONTEXT and (plain or with_time):
+                    used += PRIV_LEN
+                    payload |= priv << 4
+                    if with_time:
+                        used += TIME_LEN
+                        payload |= i["time"] << 4 + PRIV_LEN
+                elif subformat == SF_SUPPORT:
+                    used += 7
+                    payload |= (
+                        i["tc_ienable"]
+                        | i["encoder_mode"] << 1
+                        | i["qual_status"] << 2
+                        | i["ioptions"] << 4
+                    ) << 4
+            elif format in (F_DIFF_DELTA, F_ADDR_ONLY):
+                notify = i["tc_address"] >> xlen - 1 & 1
+                updiscon = notify ^ i["lc_updiscon"]
+                flags = notify | updiscon << 1 | updiscon << 2
+                start = 2
+                if format == F_DIFF_DELTA:
+                    flush = 1
+                    branches = i["branches"]
+                    map_len = self._branch_map_len(branches)
+                    used += BRANCH_COUNT_LEN + map_len
+                    count = branches
+                    if map_len == BRANCH_MAP_LEN and not i["lc_updiscon"]:
+                        count = 0
+                    payload |= (
+                        count | (i["branch_map"] & _mask(map_len)) << 5
+                    ) << 2
+                    start += BRANCH_COUNT_LEN + map_len
+                if format == F_ADDR_ONLY or branches < BRANCH_MAP_LEN:
+                    used += 3 + address_len
+                    if sized:
+                        payload |= (field | flags << address_len) << start
+        used &= _mask(9)
+
+        outputs = (
+            int(i["valid"]),
+            packet_type,
+            payload & _mask(PAYLOAD_LEN),
+            ((used + 7) >> 3) & _mask(P_LEN),
+            self.flush_q,
+            address,
+        )
+        self.latest_addr_q = latest
+        self.flush_q = flush
+        return outputs
+
+    @staticmethod
+    def _branch_map_len(branches):
+        if branches == 1:
+            return 1
+        for length in (3, 7, 15):
+            if branches <= length:
+                return length
+        return BRANCH_MAP_LEN
+
+
+def _format_line(fields, values):
+    return "".join(
+        format(value & _mask(width), f"0{width}b")
+        for (_, width), value in zip(fields, values)
+    )
+
+
+# stimuli: generators of input dicts, or tuples for te_branch_map
+def _branch_map_directed(n):
+    none = (1 << n) - 1
+    # fill the map two branches at a time, overflow it, then flush
+    for taken in (0, none, 0b01, 0b10):
+        for _ in range(20):
+            yield none, taken, 0
+        yield 0, 0, 1
+        yield 0, 0, 0
+    # flush while branches arrive, one and two at a time
+    for valid in (0b01, 0b10, none):
+        for _ in range(16):
+            yield none, 0b01, 0
+        yield valid, 0b10, 1
+        yield 0, 0, 0
+        yield 0, 0, 1
+        yield 0, 0, 0
+    # idle cycles
+    for _ in range(4):
+        yield 0, 0, 0
+
+
+def _branch_map_random(n, rng):
+    all_valid = (1 << n) - 1
+    while True:
+        valid = rng.getrandbits(n) if rng.random() < 0.7 else all_valid
+        yield valid, rng.getrandbits(n), int(rng.random() < 0.03)
+
+
+def _emitter_base(model):
+    inputs = {name: 0 for name, _ in model.inputs}
+    inputs.update(
+        valid=1,
+        nocontext=1,
+        notime=1,
+        ioptions=DELTA_ADDRESS_EN,
+    )
+    return inputs
+
+
+def _with_keep_bits(model, inputs):
+    # keep_bits as te_priority computes them for the address to compress
+    address, _ = model.addr_to_compress(inputs)
+    inputs["keep_bits"] = priority_keep_bits(address, model.xlen)
+    return inputs
+
+
+def _emitter_addresses(xlen):
+    # addresses needing every compressed length, and the corner values
+    yield 0
+    yield _mask(xlen)
+    for bits in range(4, xlen, 4):
+        yield 1 << bits | 0x5A
+        yield _mask(xlen) ^ (1 << bits)
+
+
+def _emitter_directed(model):
+    xlen = model.xlen
+    for notime, nocontext in ((1, 1), (0, 1), (1, 0), (0, 0)):
+        for subformat in (SF_START, SF_TRAP, SF_CONTEXT, SF_SUPPORT):
+            for address in _emitter_addresses(xlen):
+                inputs = _emitter_base(model)
+                inputs.update(
+                    packet_format=F_SYNC,
+                    packet_subformat=subformat,
+                    notime=notime,
+                    nocontext=nocontext,
+                    tc_address=address,
+                    tc_tvec=address,
+                    lc_epc=address ^ 0xFF0,
+                    thaddr=address & 1,
+                    lc_tc_mux=address >> 1 & 1,
+                    lc_cause=0x5,
+                    tc_cause=0x8000000B,
+                    lc_tval=address,
+                    tc_tval=~address & _mask(xlen),
+                    tc_priv=3,
+                    time=address * 3 & _mask(xlen),
+                    tc_branch=1,
+                    tc_branch_taken=address >> 2 & 1,
+                    tc_ienable=1,
+                    qual_status=address & 3,
+                )
+                yield _with_keep_bits(model, inputs)
+    for ioptions in (DELTA_ADDRESS_EN, FULL_ADDRESS_EN):
+        for branches in [0, 1, 2, 3, 4, 7, 8, 15, 16, 30, 31]:
+            for lc_updiscon in (0, 1):
+                for address in _emitter_addresses(xlen):
+                    format = F_DIFF_DELTA if branches else F_ADDR_ONLY
+                    inputs = _emitter_base(model)
+                    inputs.update(
+                        packet_format=format,
+                        ioptions=ioptions,
+                        branches=branches,
+                        branch_map=0x55555555 & _mask(branches),
+                        lc_updiscon=lc_updiscon,
+                        tc_address=address,
+                        shallow_trace=address & 1,
+                    )
+                    yield _with_keep_bits(model, inputs)
+    # format 0, invalid cycles and keep_bits the RTL does not expect
+    for keep_bits in (0, 1, 64, 65, 66, _mask(_clog2(xlen) + 1)):
+        for format in (F_OPT_EXT, F_ADDR_ONLY):
+            inputs = _emitter_base(model)
+            inputs.update(
+                packet_format=format, keep_bits=keep_bits, tc_address=0x1000
+            )
+            yield inputs
+        inputs = _emitter_base(model)
+        inputs.update(valid=0, packet_format=F_SYNC, keep_bits=keep_bits)
+        yield inputs
+
+
+def _emitter_random(model, rng):
+    xlen = model.xlen
+    address = 0x80000000
+    while True:
+        inputs = _emitter_base(model)
+        # mostly small jumps, as in a program, sometimes anywhere
+        if rng.random() < 0.9:
+            address = (address + rng.randint(-4096, 4096) * 2) & _mask(xlen)
+        else:
+            address = rng.getrandbits(xlen)
+        format = rng.choice(
+            [F_DIFF_DELTA] * 4 + [F_ADDR_ONLY] * 3 + [F_SYNC] * 2 + [F_OPT_EXT]
+        )
+        branches = rng.randint(0, BRANCH_MAP_LEN)
+        inputs.update(
+            valid=int(rng.random() < 0.9),
+            packet_format=format,
+            packet_subformat=rng.randint(0, 3),
+            lc_cause=rng.getrandbits(xlen),
+            lc_tval=rng.getrandbits(xlen),
+            lc_interrupt=rng.getrandbits(1),
+            tc_cause=rng.getrandbits(xlen),
+            tc_tval=rng.getrandbits(xlen),
+            tc_interrupt=rng.getrandbits(1),
+            nocontext=int(rng.random() < 0.9),
+            notime=int(rng.random() < 0.8),
+            tc_branch=rng.getrandbits(1),
+            tc_branch_taken=rng.getrandbits(1),
+            tc_priv=rng.getrandbits(PRIV_LEN),
+            time=rng.getrandbits(xlen),
+            tc_address=address,
+            lc_tc_mux=rng.getrandbits(1),
+            thaddr=rng.getrandbits(1),
+            tc_tvec=rng.getrandbits(xlen),
+            lc_epc=(address - 4) & _mask(xlen),
+            tc_ienable=rng.getrandbits(1),
+            encoder_mode=0,
+            qual_status=rng.getrandbits(2),
+            ioptions=rng.choice([DELTA_ADDRESS_EN] * 3 + [FULL_ADDRESS_EN]),
+            lc_updiscon=rng.getrandbits(1),
+            branches=branches,
+            branch_map=rng.getrandbits(BRANCH_MAP_LEN),
+            shallow_trace=int(rng.random() < 0.1),
+        )
+        if rng.random() < 0.95:
+            yield _with_keep_bits(model, inputs)
+        else:
+            inputs["keep_bits"] = rng.getrandbits(_clog2(xlen) + 1)
+            yield inputs
+
+
+BENCHES = {
+    "te_branch_map": lambda args: BranchMapModel(args.ports),
+    "te_packet_emitter": lambda args: PacketEmitterModel(args.xlen),
+}
+
+
+def _stimuli(bench, model, args):
+    rng = random.Random(args.seed)
+    if bench == "te_branch_map":
+        directed = _branch_map_directed(model.n)
+        randomized = _branch_map_random(model.n, rng)
+    else:
+        directed = _emitter_directed(model)
+        randomized = _emitter_random(model, rng)
+    if args.mode == "directed":
+        stimuli = directed
+    elif args.mode == "random":
+        stimuli = randomized
+    else:
+        stimuli = (s for source in (directed, randomized) for s in source)
+    return islice(stimuli, args.lines)
+
+
+def _write_line(f, model, stimulus):
+    if isinstance(stimulus, dict):
+        inputs = [stimulus[name] for name, _ in model.inputs]
+        outputs = model.step(stimulus)
+    else:
+        inputs = stimulus
+        outputs = model.step(*stimulus)
+    f.write(
+        _format_line(model.inputs, inputs)
+        + "_"
+        + _format_line(model.outputs, outputs)
+        + "\n"
+    )
+
+
+def generate(args):
+    model = BENCHES[args.bench](args)
+    path = args.output or f"{TESTVECTORS_DIR}/tv_{args.bench}_generated.txt"
+    lines = 0
+    with open(path, "w") as f:
+        for stimulus in _stimuli(args.bench, model, args):
+            _write_line(f, model, stimulus)
+            lines += 1
+    print(f"{path}: {lines} lines")
+
+
+def expect(args):
+    # recomputes the expected outputs of a testvector file from its inputs,
+    # for the directed vectors written by hand
+    model = BENCHES[args.bench](args)
+    width = sum(w for _, w in model.inputs)
+    path = args.output or args.vectors
+    lines = 0
+    with open(args.vectors) as f:
+        vectors = f.read().splitlines()
+    with open(path, "w") as f:
+        for line in vectors:
+            bits = line.split("_", 1)[0].strip()
+            if len(bits) != width:
+                print(f"line {lines}: {len(bits)} input bits, not {width}")
+                return 1
+            values = [int(value, 2) for _, value in _split(model.inputs, bits)]
+            if isinstance(model, BranchMapModel):
+                stimulus = tuple(values)
+            else:
+                names = (name for name, _ in model.inputs)
+                stimulus = dict(zip(names, values))
+            _write_line(f, model, stimulus)
+            lines += 1
+    print(f"{path}: {lines} lines")
+    return 0
+
+
+def _split(fields, bits):
+    # field values of a line of bits, as strings to keep x and z
+    values = []
+    position = 0
+    for name, width in fields:
+        values.append((name, bits[position : position + width]))
+        position += width
+    return values
+
+
+def compare(args):
+    # streams the expected outputs and the dumped ones side by side, only
+    # the current lines are in memory
+    model = BENCHES[args.bench](args)
+    width = sum(w for _, w in model.outputs)
+    mismatches = 0
+    cycle = -1
+    with open(args.expected) as expected, open(args.dump) as dump:
+        for line in expected:
+            dumped = next(dump, None)
+            if dumped is None:
+                # the line read from the testvectors is not compared
+                left = line, None
+                break
+            cycle += 1
+            wanted = line.split("_", 1)[-1].replace("_", "").strip()
+            got = dumped.replace("_", "").strip().lower()
+            if wanted == got:
+                continue
+            mismatches += 1
+            if mismatches > args.max_errors:
+                continue
+            if len(got) != width:
+                print(f"cycle {cycle}: {len(got)} bits instead of {width}")
+                continue
+            for (name, a), (_, b) in zip(
+                _split(model.outputs, wanted), _split(model.outputs, got)
+            ):
+                if a != b:
+                    print(f"cycle {cycle}: {name} {b} instead of {a}")
+        else:
+            left = None, next(dump, None)
+        cycles = cycle + 1
+    print(f"{cycles} cycles compared, {mismatches} with wrong outputs")
+    if left[0] is not None:
+        print("the dump ends before the testvectors")
+    elif left[1] is not None:
+        print("the dump is longer than the testvectors")
+    return 1 if mismatches or left != (None, None) else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="testvectors for the tb_*.sv benches"
+    )
+    parser.add_argument("--xlen", type=int, choices=(32, 64), default=64)
+    parser.add_argument(
+        "--ports", type=int, default=2, help="N of te_branch_map"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    gen = commands.add_parser("generate", help="write a testvector file")
+    gen.add_argument("bench", choices=sorted(BENCHES))
+    gen.add_argument("-n", "--lines", type=int, default=10000)
+    gen.add_argument(
+        "--mode",
+        choices=("directed", "random", "both"),
+        default="both",
+        help="directed cases, random ones, or the former then the latter",
+    )
+    gen.add_argument("--seed", type=int, default=0)
+    gen.add_argument(
+        "-o", "--output", help="default tb/testvectors/tv_*_generated.txt"
+    )
+
+    exp = commands.add_parser(
+        "expect", help="recompute the outputs of a testvector file"
+    )
+    exp.add_argument("bench", choices=sorted(BENCHES))
+    exp.add_argument("vectors", help="testvector file, inputs are kept")
+    exp.add_argument("-o", "--output", help="default the testvector file")
+
+    cmp = commands.add_parser(
+        "compare", help="check the outputs dumped by a bench"
+    )
+    cmp.add_argument("bench", choices=sorted(BENCHES))
+    cmp.add_argument("expected", help="testvector file")
+    cmp.add_argument("dump", help="outputs dumped with +dump=FILE")
+    cmp.add_argument("--max-errors", type=int, default=20)
+
+    args = parser.parse_args()
+    if args.command == "generate":
+        generate(args)
+        return 0
+    if args.command == "expect":
+        return expect(args)
+    return compare(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())